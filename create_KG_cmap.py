@@ -1,19 +1,174 @@
 # -*- coding: utf-8 -*-
 """
 Created on Fri Jan 18 18:10:07 CET 2019
-Last modified, Fri Jan 18 18:10:07 CET 2019
+Last modified, Sun Oct 18 15:10:32 UTC 2026
 
 @author: Didier M. Roche a.k.a. dmr
 """
 
 # Changes from version 0.1 :
+# Changes from version 0.2 : Moved the code tables to module level, usable without matplotlib,
+#                             matplotlib imported once, on the first colormap request
+
+__version__ = "0.3"
+
+
+# Integer codes of the classes in Kottek et al., 2006
+KG_dict_2006 = {
+          "Af"  :  1,
+          "Am"  :  2,
+          "As"  :  3,
+          "Aw"  :  4,
+          "BWk" :  5,
+          "BWh" :  6,
+          "BSk" :  7,
+          "BSh" :  8,
+          "Cfa" :  9,
+          "Cfb" : 10,
+          "Cfc" : 11,
+          "Csa" : 12,
+          "Csb" : 13,
+          "Csc" : 14,
+          "Cwa" : 15,
+          "Cwb" : 16,
+          "Cwc" : 17,
+          "Dfa" : 18,
+          "Dfb" : 19,
+          "Dfc" : 20,
+          "Dfd" : 21,
+          "Dsa" : 22,
+          "Dsb" : 23,
+          "Dsc" : 24,
+          "Dsd" : 25,
+          "Dwa" : 26,
+          "Dwb" : 27,
+          "Dwc" : 28,
+          "Dwd" : 29,
+          "EF"  : 30,
+          "ET"  : 31
+          }
+
+# Integer codes of the classes in Peel et al., 2007
+KG_dict_2007 = {
+          "Af"  :  1,
+          "Am"  :  2,
+          "Aw"  :  3,
+          "BWk" :  4,
+          "BWh" :  5,
+          "BSk" :  6,
+          "BSh" :  7,
+          "Cfa" :  8,
+          "Cfb" :  9,
+          "Cfc" : 10,
+          "Csa" : 11,
+          "Csb" : 12,
+          "Csc" : 13,
+          "Cwa" : 14,
+          "Cwb" : 15,
+          "Cwc" : 16,
+          "Dfa" : 17,
+          "Dfb" : 18,
+          "Dfc" : 19,
+          "Dfd" : 20,
+          "Dsa" : 21,
+          "Dsb" : 22,
+          "Dsc" : 23,
+          "Dsd" : 24,
+          "Dwa" : 25,
+          "Dwb" : 26,
+          "Dwc" : 27,
+          "Dwd" : 28,
+          "EF"  : 29,
+          "ET"  : 30
+          }
+
+# Integer codes of the classes in Cannon, 2012
+KG_dict_2012 = {
+          "1WW" :  1,
+          "1WD" :  2,
+          "1DW" :  3,
+          "1DD" :  4,
+          "2Ww" :  5,
+          "2Wd" :  6,
+          "2Dh" :  7,
+          "2Dc" :  8,
+          "2Dw" :  9,
+          "2Dd" : 10,
+          "3hh" : 11,
+          "3hW" : 12,
+          "3hD" : 13,
+          "3cw" : 14,
+          "3cd" : 15,
+          "3Hw" : 16,
+          "3Hd" : 17,
+          "3CH" : 18,
+          "3CC" : 19,
+          "4Ww" : 20,
+          "4Wd" : 21,
+          "4HW" : 22,
+          "4HD" : 23,
+          "4Ch" : 24,
+          "4Cc" : 25,
+          "5hh" : 26,
+          "5hc" : 27,
+          "5hC" : 28,
+          "5cw" : 29,
+          "5cd" : 30
+          }
+
+# Integer codes of the classes in Belda et al., 2014
+KG_dict_2014 = {
+          "Ar"  :  1,
+          "Aw"  :  2,
+          "As"  :  3,
+          "BW"  :  4,
+          "BS"  :  5,
+          "Cs"  :  6,
+          "Cw"  :  7,
+          "Cr"  :  8,
+          "Do"  :  9,
+          "Dc"  : 10,
+          "Eo"  : 11,
+          "Ec"  : 12,
+          "Ft"  : 13,
+          "Fi"  : 14
+          }
+
+# Code tables of the classification types, as named in koeppen_geiger
+KG_schemes = {
+              "kottek"    : KG_dict_2006,
+              "peel"      : KG_dict_2007,
+              "cannon"    : KG_dict_2012,
+              "trewartha" : KG_dict_2014
+              }
 
-__version__ = "0.2"
+def get_KG_dict(typ_classification) :
+    # Dictionary label -> integer code for one classification type
+    try:
+        return KG_schemes[typ_classification]
+    except KeyError:
+        raise ValueError("Unknown classification type: %s" % typ_classification) from None
+#end def get_KG_dict
 
+def get_KG_labels(typ_classification) :
+    # Inverse of get_KG_dict, integer code -> label, for colorbars and exports only
+    return {code: label for label, code in get_KG_dict(typ_classification).items()}
+#end def get_KG_labels
+
+_ListedColormap = None
+
+def _get_ListedColormap() :
+    # matplotlib is imported on the first colormap request only, then reused
+    global _ListedColormap
+    if _ListedColormap is None:
+        from matplotlib.colors import ListedColormap
+        _ListedColormap = ListedColormap
+    #end if
+    return _ListedColormap
+#end def _get_ListedColormap
 
-def KG_cmap_2006() :
-    import matplotlib as mpl
 
+def KG_cmap_2006() :
     # Color scheme used by Kottek et al., 2006
 
     # Hex colors
@@ -55,47 +210,13 @@ def KG_cmap_2006() :
                    '#ffb4ff','#e6c8ff','#c8c8c8','#c8b4ff','#9a7fb3','#8859b3','#6f24b3','#6496ff',
                    '#64ffff']
 
-    KG_dict = {
-              "Af"  :  1,
-              "Am"  :  2,
-              "As"  :  3,
-              "Aw"  :  4,
-              "BWk" :  5,
-              "BWh" :  6,
-              "BSk" :  7,
-              "BSh" :  8,
-              "Cfa" :  9,
-              "Cfb" : 10,
-              "Cfc" : 11,
-              "Csa" : 12,
-              "Csb" : 13,
-              "Csc" : 14,
-              "Cwa" : 15,
-              "Cwb" : 16,
-              "Cwc" : 17,
-              "Dfa" : 18,
-              "Dfb" : 19,
-              "Dfc" : 20,
-              "Dfd" : 21,
-              "Dsa" : 22,
-              "Dsb" : 23,
-              "Dsc" : 24,
-              "Dsd" : 25,
-              "Dwa" : 26,
-              "Dwb" : 27,
-              "Dwc" : 28,
-              "Dwd" : 29,
-              "EF"  : 30,
-              "ET"  : 31
-              }
+    KG_dict = dict(KG_dict_2006)
 
 
-    return KG_dict, mpl.colors.ListedColormap(List_Colors)
+    return KG_dict, _get_ListedColormap()(List_Colors)
 #end def KG_cmap_2006
 
 def KG_cmap_2007() :
-    import matplotlib as mpl
-
     # Color scheme used by Peel et al., 2007
 
     # Hex colors
@@ -138,45 +259,12 @@ def KG_cmap_2007() :
                    '#b3afb0']
 
 
-    KG_dict = {
-              "Af"  :  1,
-              "Am"  :  2,
-              "Aw"  :  3,
-              "BWk" :  4,
-              "BWh" :  5,
-              "BSk" :  6,
-              "BSh" :  7,
-              "Cfa" :  8,
-              "Cfb" :  9,
-              "Cfc" : 10,
-              "Csa" : 11,
-              "Csb" : 12,
-              "Csc" : 13,
-              "Cwa" : 14,
-              "Cwb" : 15,
-              "Cwc" : 16,
-              "Dfa" : 17,
-              "Dfb" : 18,
-              "Dfc" : 19,
-              "Dfd" : 20,
-              "Dsa" : 21,
-              "Dsb" : 22,
-              "Dsc" : 23,
-              "Dsd" : 24,
-              "Dwa" : 25,
-              "Dwb" : 26,
-              "Dwc" : 27,
-              "Dwd" : 28,
-              "EF"  : 29,
-              "ET"  : 30
-              }
+    KG_dict = dict(KG_dict_2007)
 
-    return KG_dict, mpl.colors.ListedColormap(List_Colors)
+    return KG_dict, _get_ListedColormap()(List_Colors)
 #end def KG_cmap_2007
 
 def KG_cmap_2012() :
-    import matplotlib as mpl
-
     # Color scheme used by Cannon, 2012
 
     # Hex colors
@@ -222,45 +310,12 @@ def KG_cmap_2012() :
                    '#db4acd','#c53ed8','#b32de2','#9f20ed','#010088','#003fa7','#017ec1','#02bee3',
                    '#00fefc']
 
-    KG_dict = {
-              "1WW" :  1,
-              "1WD" :  2,
-              "1DW" :  3,
-              "1DD" :  4,
-              "2Ww" :  5,
-              "2Wd" :  6,
-              "2Dh" :  7,
-              "2Dc" :  8,
-              "2Dw" :  9,
-              "2Dd" : 10,
-              "3hh" : 11,
-              "3hW" : 12,
-              "3hD" : 13,
-              "3cw" : 14,
-              "3cd" : 15,
-              "3Hw" : 16,
-              "3Hd" : 17,
-              "3CH" : 18,
-              "3CC" : 19,
-              "4Ww" : 20,
-              "4Wd" : 21,
-              "4HW" : 22,
-              "4HD" : 23,
-              "4Ch" : 24,
-              "4Cc" : 25,
-              "5hh" : 26,
-              "5hc" : 27,
-              "5hC" : 28,
-              "5cw" : 29,
-              "5cd" : 30
-              }
+    KG_dict = dict(KG_dict_2012)
 
-    return KG_dict, mpl.colors.ListedColormap(List_Colors)
+    return KG_dict, _get_ListedColormap()(List_Colors)
 #end def KG_cmap_2012
 
 def KG_cmap_2014() :
-    import matplotlib as mpl
-
     # Color scheme used by Belda et al., 2014
 
     # Hex colors
@@ -282,24 +337,25 @@ def KG_cmap_2014() :
     List_Colors = ['#84070b','#cd1c0a','#b64f04','#ffde49','#f09137','#9fc301','#2c8a29','#009736',
                    '#00add7','#b2559c','#1451a1','#0c356b','#c0c0c0','#8c8c8c']
 
-    KG_dict = {
-              "Ar"  :  1,
-              "Aw"  :  2,
-              "As"  :  3,
-              "BW"  :  4,
-              "BS"  :  5,
-              "Cs"  :  6,
-              "Cw"  :  7,
-              "Cr"  :  8,
-              "Do"  :  9,
-              "Dc"  : 10,
-              "Eo"  : 11,
-              "Ec"  : 12,
-              "Ft"  : 13,
-              "Fi"  : 14
-              }
+    KG_dict = dict(KG_dict_2014)
 
 
-    return KG_dict, mpl.colors.ListedColormap(List_Colors, name="belda14", N=14)
+    return KG_dict, _get_ListedColormap()(List_Colors, name="belda14", N=14)
 #end def KG_cmap_2006
+
+def get_KG_cmap(typ_classification) :
+    # Colormap of one classification type, matplotlib is only imported here
+    match typ_classification:
+        case "kottek":
+            return KG_cmap_2006()[1]
+        case "peel":
+            return KG_cmap_2007()[1]
+        case "cannon":
+            return KG_cmap_2012()[1]
+        case "trewartha":
+            return KG_cmap_2014()[1]
+        case _:
+            raise ValueError("Unknown classification type: %s" % typ_classification)
+    #end match
+#end def get_KG_cmap
 # The End of All Things (op. cit.)
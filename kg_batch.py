@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+"""
+Created on Sun Oct 18 14:07:19 UTC 2026
+Last modified, Sun Oct 18 15:11:42 UTC 2026
+
+@author: agent <agent@local>
+
+Headless batch entry point: classifies the datasets described by profile files
+(see kg_io.read_profile) with one or several classification types, back to back
+in a single interpreter, and writes the class maps to disk.
+
+  python kg_batch.py profiles/CRU.json:trewartha,peel profiles/ERA.json:cannon -o results
+  python kg_batch.py --runs-file runs.txt --workers 16 --metrics metrics.json --progress
+"""
+
+# Changes from version 0.0 :
+# Changes from version 0.1 : Per-stage timers, counts and tile progress, exported as JSON
+# Changes from version 0.2 : Choice of the classification backend
+# Changes from version 0.3 : Optional per-run peak of the traced memory
+
+__version__ = "0.4"
+
+import argparse
+import os
+import sys
+import time
+
+
+def parse_run(run):
+    # "profile.json:scheme1,scheme2" -> ("profile.json", ["scheme1", "scheme2"])
+    profile_path, sep, schemes = run.rpartition(":")
+    if not sep or not profile_path or not schemes:
+        raise argparse.ArgumentTypeError("Expected PROFILE:SCHEME[,SCHEME...], got %s" % run)
+    # endif
+    import create_KG_cmap as CKG
+
+    schemes = schemes.split(",")
+    for typ_classification in schemes:
+        if typ_classification not in CKG.KG_schemes:
+            raise argparse.ArgumentTypeError("Unknown classification type: %s" % typ_classification)
+        # endif
+    # end for
+    return profile_path, schemes
+# end def parse_run
+
+def run_profile(profile, schemes, output_dir=".", workers=1, max_memory=2**30, plot=False, output_format="nc",
+                cache=None, progress=None, monitors=None, trace_memory=False):
+    """
+    Classify one dataset profile with each classification type of schemes.
+
+    The class maps are streamed tile by tile into files of output_format
+    (nc, zarr or tif, see kg_io.open_KG_output), or written whole for npz.
+    With a kg_cache.KGCache, maps and predictors are taken from / stored in the
+    cache, the whole grid being then held in memory.
+    Each run is timed by a kg_monitor.RunMonitor, appended to monitors if given;
+    progress is passed to the monitors (True reports the tiles on stderr), so is
+    trace_memory (peak of the memory allocated by each run, through tracemalloc).
+    Returns the list of the files written.
+    """
+    import koeppen_geiger as KG
+    import kg_io
+    import kg_monitor
+
+    load_start = time.perf_counter()
+    mon_TAS, mon_PRC, lats, lons, season = kg_io.open_profile(profile)
+    load_time = time.perf_counter() - load_start
+    season_start = time.perf_counter()
+    sum_strt = KG.get_sum_strt(season, lats)
+    season_time = time.perf_counter() - season_start
+    if cache is not None:
+        import kg_cache
+
+        input_key = kg_cache.hash_profile(profile, hash_file=cache.hash_file)
+    # endif
+    written = []
+    try:
+        for i_scheme, typ_classification in enumerate(schemes):
+            monitor = kg_monitor.RunMonitor("%s %s" % (profile["name"], typ_classification),
+                                            typ_classification=typ_classification, progress=progress,
+                                            trace_memory=trace_memory)
+            if i_scheme == 0:
+                # Opening the profile and its summer half-year are shared by the runs of all the schemes,
+                # counted once, in the first run, so that the metrics of the runs add up
+                monitor.add_time("load", load_time)
+                monitor.add_time("seasons", season_time)
+            # endif
+            mon_TAS.monitor = mon_PRC.monitor = monitor
+            base = os.path.join(output_dir, "%s_%s" % (profile["name"], typ_classification))
+            path = base + "." + output_format
+            keep_map = plot or output_format == "npz" or cache is not None
+            if keep_map:
+                out, close = None, None
+            else:
+                with monitor.stage("write"):
+                    out, close = kg_io.open_KG_output(path, lats, lons, typ_classification)
+                # end with
+            # endif
+            try:
+                if cache is not None:
+                    KG_map = cache.classify(mon_TAS, mon_PRC, typ_classification, sum_strt=sum_strt,
+                                            input_key=input_key, monitor=monitor)
+                elif workers > 1:
+                    KG_map = KG.classify_parallel(mon_TAS, mon_PRC, typ_classification, sum_strt=sum_strt,
+                                                  workers=workers, max_memory=max_memory, out=out, monitor=monitor)
+                else:
+                    tile_shape = kg_io.get_aligned_tile_shape(mon_TAS.shape[1:], mon_TAS.chunks,
+                                                              max_memory=max_memory)
+                    KG_map = KG.classify_tiled(mon_TAS, mon_PRC, typ_classification, sum_strt=sum_strt,
+                                               tile_shape=tile_shape, out=out, monitor=monitor)
+                # endif
+            finally:
+                if close is not None:
+                    with monitor.stage("write"):
+                        close()
+                    # end with
+                # endif
+            # end try
+            if keep_map:
+                with monitor.stage("write"):
+                    kg_io.write_KG_map(path, KG_map, lats, lons, typ_classification)
+                # end with
+            # endif
+            written.append(path)
+            if plot:
+                with monitor.stage("plot"):
+                    KG.plot_KG_map(KG_map, lons, lats, typ_classification, path=base + ".png")
+                # end with
+                written.append(base + ".png")
+            # endif
+            monitor.stop()
+            print(monitor.summary())
+            if monitors is not None:
+                monitors.append(monitor)
+            # endif
+        # end for
+    finally:
+        mon_TAS.monitor = mon_PRC.monitor = None
+        mon_TAS.close()
+        mon_PRC.close()
+    # end try
+    return written
+# end def run_profile
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Koeppen-Geiger classifications of dataset profiles")
+    parser.add_argument("runs", nargs="*", type=parse_run, metavar="PROFILE:SCHEME[,SCHEME...]",
+                        help="profile file and classification types (kottek, peel, cannon, trewartha)")
+    parser.add_argument("--runs-file", help="file with one PROFILE:SCHEME[,SCHEME...] per line")
+    parser.add_argument("-o", "--output-dir", default=".", help="directory of the results")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker threads")
+    parser.add_argument("--max-memory", type=float, default=1024.0, help="memory budget of a tile, in MB")
+    parser.add_argument("--format", default="nc", choices=["nc", "zarr", "tif", "npz"],
+                        help="output format: uint8 NetCDF, zarr store, cloud-optimized GeoTIFF or npz")
+    parser.add_argument("--plot", action="store_true", help="also save a PNG map of each result")
+    parser.add_argument("--cache", help="directory of the predictor / class map cache, no cache if not given")
+    parser.add_argument("--cache-size", type=float, default=4096.0, help="size limit of the cache, in MB")
+    parser.add_argument("--backend", default="numpy", choices=["numpy", "numba"],
+                        help="classification backend, numba compiles the scalar rules (kg_jit)")
+    parser.add_argument("--metrics", help="save the timers and counts of all the runs to this JSON file")
+    parser.add_argument("--progress", action="store_true", help="report the progress of the tiles on stderr")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="measure the peak memory allocated by each run (slower), reported in the metrics")
+    args = parser.parse_args(argv)
+
+    runs = list(args.runs)
+    if args.runs_file:
+        with open(args.runs_file) as runs_file:
+            lines = [line.strip() for line in runs_file]
+            runs += [parse_run(line) for line in lines if line and not line.startswith("#")]
+        # end with
+    # endif
+    if not runs:
+        parser.error("no PROFILE:SCHEME given")
+    # endif
+
+    if args.plot:
+        # No display on batch nodes
+        import matplotlib
+        matplotlib.use("Agg")
+    # endif
+    import kg_io
+
+    if args.backend != "numpy":
+        import koeppen_geiger as KG
+
+        KG.set_classification_backend(args.backend)
+    # endif
+
+    cache = None
+    if args.cache:
+        import kg_cache
+
+        cache = kg_cache.KGCache(args.cache, max_bytes=int(args.cache_size * 2**20))
+    # endif
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    monitors = []
+    try:
+        for profile_path, schemes in runs:
+            run_profile(kg_io.read_profile(profile_path), schemes, output_dir=args.output_dir, workers=args.workers,
+                        max_memory=int(args.max_memory * 2**20), plot=args.plot, output_format=args.format,
+                        cache=cache, progress=args.progress or None, monitors=monitors,
+                        trace_memory=args.trace_memory)
+        # end for
+    finally:
+        if args.metrics:
+            import kg_monitor
+
+            kg_monitor.save_metrics(args.metrics, monitors)
+        # endif
+    # end try
+    return 0
+# end def main
+
+if __name__ == "__main__":
+    sys.exit(main())
+# endif on main
+
+# The End of All Things (op. cit.)
@@ -0,0 +1,466 @@
+# -*- coding: utf-8 -*-
+
+"""
+Created on Sun Oct 18 14:14:40 UTC 2026
+Last modified, Sun Oct 18 15:29:41 UTC 2026
+
+@author: agent <agent@local>
+
+Benchmarks of the classification on a deterministic synthetic climatology.
+
+The synthetic monthly temperature and precipitation follow a latitudinal
+gradient of the annual mean temperature; along the longitudes the seasonal
+amplitude, the annual precipitation and its seasonality sweep their whole
+range, so that every class of the four classifications is present from 1 deg
+on (Trewartha's As excepted, it is not reachable). Values are computed on
+demand for the requested block, the 1 km grid never sits in memory as a whole.
+
+Timed: predictors and each classifier (NumPy, and compiled if numba is
+installed) on grids that fit in --max-memory, the output writers and the
+tiled / parallel engines end to end at every size. The .nc, .zarr and .tif
+writers receive the tiles of classify_tiled through kg_io.open_KG_output,
+their time is that of the writes and of close(); .npz holds a whole map and
+is timed on grids that fit only. Reported: cells per second and peak traced
+memory, traced in a second untimed call.
+
+--scaling times the thread mode of classify_parallel with 1, 2, 4, ... up to
+--workers threads against classify_tiled, on lazy inputs (computed under the
+input lock, as netCDF reads are) and on in-memory arrays when they fit.
+
+  python kg_bench.py --sizes 1,0.5,0.25
+  python kg_bench.py --sizes 1km --engines tiled,parallel --workers 16 --json bench.json
+  python kg_bench.py --sizes 0.25 --scaling --workers 8 --engines "" --writers ""
+  python kg_bench.py --baseline bench.json
+"""
+
+# Changes from version 0.0 :
+# Changes from version 0.1 : Scaling of the thread mode of classify_parallel
+# Changes from version 0.2 : Memory traced apart from the timed call, streaming writers timed at every size
+
+__version__ = "0.3"
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+
+_RESOLUTIONS = {"1km": 1.0 / 120, "5km": 1.0 / 24, "10km": 1.0 / 12}
+
+# Classes that no input can produce
+_UNREACHABLE = {"trewartha": ("As",)}
+
+def _frac(x):
+    return x - np.floor(x)
+# end def _frac
+
+class SyntheticVar:
+    """
+    Lazy (12, ny, nx) monthly stack of a synthetic climatology, as float32.
+
+    var is "tas" (C) or "prc" (mm/month). Indexing computes only the requested
+    block; the same cell always gets the same value, whatever the slicing.
+    Cells of the ocean fraction are NaN.
+    """
+
+    def __init__(self, var, ny, nx, seed=0, ocean=0.3):
+        self.var = var
+        self.shape = (12, ny, nx)
+        self.ndim = 3
+        self.ocean = ocean
+        self.lats = (90.0 - (np.arange(ny) + 0.5) * 180.0 / ny).astype(np.float32)
+        self.lons = (-180.0 + (np.arange(nx) + 0.5) * 360.0 / nx).astype(np.float32)
+
+        # Low-discrepancy sweeps along the longitudes: seasonal amplitude, annual precipitation, seasonality
+        cols = np.arange(nx)
+        self._amplitude = _frac(cols * 0.6180339887 + 0.1)
+        self._precip = _frac(cols * 0.7548776662 + 0.3)
+        self._seasonality = _frac(cols * 0.5698402910 + 0.7)
+
+        rng = np.random.default_rng(seed)
+        self._row_noise = rng.normal(0.0, 0.3, ny)
+        self._col_noise = rng.normal(0.0, 0.05, nx)
+    # end def __init__
+
+    def __len__(self):
+        return self.shape[0]
+    # end def __len__
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        # endif
+        if any(k is Ellipsis for k in key):
+            i_ell = key.index(Ellipsis)
+            key = key[:i_ell] + (slice(None),) * (4 - len(key)) + key[i_ell + 1:]
+        # endif
+        key = key + (slice(None),) * (3 - len(key))
+
+        months = np.arange(12)[key[0]]
+        rows = np.arange(self.shape[1])[key[1]]
+        cols = np.arange(self.shape[2])[key[2]]
+        squeeze = [axis for axis, idx in enumerate((months, rows, cols)) if np.ndim(idx) == 0]
+        months, rows, cols = np.atleast_1d(months), np.atleast_1d(rows), np.atleast_1d(cols)
+
+        lats = self.lats[rows].astype(np.float64)[:, None]
+        phi = np.abs(lats) / 90.0
+        # Summer peaks in July in the north, in January in the south
+        peak = np.where(lats < 0, 0.5, 6.5)
+        cosm = np.cos(2 * np.pi * (months[:, None, None] + 0.5 - peak) / 12)
+
+        if self.var == "tas":
+            T_mean = 29.0 - 64.0 * phi**1.4 + self._row_noise[rows][:, None]
+            A = 0.5 + 26.0 * self._amplitude[cols] * (0.3 + phi)
+            data = T_mean + A * cosm
+        else:
+            P_ann = np.exp(np.log(15.0) + np.log(400.0) * self._precip[cols]) * (1.0 + self._col_noise[cols])
+            k = (2.0 * self._seasonality[cols] - 1.0) * 0.98
+            data = P_ann / 12.0 * (1.0 + k * np.sign(cosm) * np.sqrt(np.abs(cosm)))
+        # endif
+
+        data = np.broadcast_to(data, (months.size, rows.size, cols.size)).astype(np.float32)
+        if self.ocean > 0:
+            ocean = _frac(rows[:, None] * 0.4142135624 + cols * 0.7320508076) < self.ocean
+            data[:, ocean] = np.nan
+        # endif
+        return data.squeeze(axis=tuple(squeeze)) if squeeze else data
+    # end def __getitem__
+# end class SyntheticVar
+
+def synthetic_climatology(ny, nx, seed=0, ocean=0.3):
+    """
+    Lazy synthetic monthly climatology on a regular (ny, nx) global grid.
+
+    Returns
+    -------
+    mon_TAS, mon_PRC : SyntheticVar of shape (12, ny, nx)
+    lats, lons : cell centres, north to south and west to east
+    """
+    mon_TAS = SyntheticVar("tas", ny, nx, seed=seed, ocean=ocean)
+    mon_PRC = SyntheticVar("prc", ny, nx, seed=seed, ocean=ocean)
+    return mon_TAS, mon_PRC, mon_TAS.lats, mon_TAS.lons
+# end def synthetic_climatology
+
+def parse_size(size):
+    # "1" (degrees) or "1km" -> (label, ny, nx) of a global grid
+    resolution = _RESOLUTIONS[size] if size in _RESOLUTIONS else float(size)
+    ny = int(round(180.0 / resolution))
+    label = size if size in _RESOLUTIONS else "%gdeg" % resolution
+    return label, ny, 2 * ny
+# end def parse_size
+
+def get_missing_classes(KG_map, typ_classification):
+    # Labels of the classification that do not appear in KG_map
+    import create_KG_cmap as CKG
+
+    present = set(np.unique(KG_map).tolist())
+    return [label for label, code in CKG.get_KG_dict(typ_classification).items()
+            if code not in present and label not in _UNREACHABLE.get(typ_classification, ())]
+# end def get_missing_classes
+
+def measure(function, *args, **kwargs):
+    # (result, seconds, peak traced memory in bytes) of function: one timed call, then one traced call,
+    # tracemalloc slowing down the allocations it traces. Tracing is left on or off as found
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    # endif
+    tracemalloc.reset_peak()
+    traced_start = tracemalloc.get_traced_memory()[0]
+    try:
+        function(*args, **kwargs)
+        peak = max(tracemalloc.get_traced_memory()[1] - traced_start, 0)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        # endif
+    # end try
+    return result, elapsed, peak
+# end def measure
+
+def fits_in_memory(shape, max_memory):
+    # Whether the whole (ny, nx) grid is a single tile of classify_tiled within max_memory
+    import koeppen_geiger as KG
+
+    rows, cols = next(KG.iter_tiles(shape, max_memory=max_memory))
+    return (rows.stop, cols.stop) == tuple(shape)
+# end def fits_in_memory
+
+def _format_record(entry, width):
+    # Report line of a benchmark record, names padded to width
+    return "%-8s %-*s %12d cells %9.3f s %14.0f cells/s %10.1f MB" % (
+        entry["size"], width, entry["benchmark"], entry["cells"], entry["seconds"], entry["cells_per_second"],
+        entry["peak_bytes"] / 2**20)
+# end def _format_record
+
+def write_tiled(path, mon_TAS, mon_PRC, lats, lons, typ_classification, sum_strt=3, max_memory=2**30):
+    """
+    classify_tiled into the streaming output of path (.nc, .zarr or .tif), replaced if it exists.
+
+    Returns the kg_monitor.RunMonitor of the run, its "write" stage timing the writes of the tiles and close().
+    """
+    import koeppen_geiger as KG
+    import kg_io
+    import kg_monitor
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+    # endif
+    monitor = kg_monitor.RunMonitor()
+    out, close = kg_io.open_KG_output(path, lats, lons, typ_classification)
+    try:
+        KG.classify_tiled(mon_TAS, mon_PRC, typ_classification, sum_strt=sum_strt, max_memory=max_memory, out=out,
+                          monitor=monitor)
+    finally:
+        with monitor.stage("write"):
+            close()
+        # end with
+    # end try
+    monitor.stop()
+    return monitor
+# end def write_tiled
+
+def bench_size(size, schemes, engines, writers, workers=1, max_memory=2**30, seed=0, report=print):
+    """
+    Benchmark records (dicts) of one grid size.
+
+    Stages (predictors, classifiers, .npz writer) run on the whole grid in memory,
+    only if it fits in max_memory; the streaming writers and the engines run tile
+    by tile within max_memory.
+    """
+    import koeppen_geiger as KG
+    import kg_io
+    import kg_jit
+
+    label, ny, nx = parse_size(size)
+    mon_TAS, mon_PRC, lats, lons = synthetic_climatology(ny, nx, seed=seed)
+    sum_strt = KG.get_sum_strt("hemisphere", lats)
+    in_memory = fits_in_memory((ny, nx), max_memory)
+    records = []
+    names = (["predictors"] + ["classify_%s_numba" % typ for typ in schemes] + ["write_" + ext for ext in writers]
+             + ["%s_%s" % (engine, typ) for engine in engines for typ in schemes])
+    width = max(len(name) for name in names)
+
+    def record(name, cells, elapsed, peak):
+        entry = {"size": label, "shape": [ny, nx], "benchmark": name, "cells": int(cells), "seconds": elapsed,
+                 "cells_per_second": cells / elapsed if elapsed > 0 else float("inf"), "peak_bytes": int(peak)}
+        records.append(entry)
+        report(_format_record(entry, width))
+    # end def record
+
+    KG_maps = {}
+    if in_memory:
+        index = KG.get_valid_index(KG.get_valid_mask(mon_TAS[:], mon_PRC[:]))
+        TAS, PRC = KG.gather_cells(mon_TAS[:], index), KG.gather_cells(mon_PRC[:], index)
+        cell_sum_strt = KG.get_cell_sum_strt(sum_strt, (ny, nx), index)
+
+        (ARGS, ARGS_valid), elapsed, peak = measure(KG.get_predictors, TAS, PRC, sum_strt=cell_sum_strt)
+        record("predictors", index.size, elapsed, peak)
+        del TAS, PRC
+
+        for typ_classification in schemes:
+            codes, elapsed, peak = measure(KG.get_kg_classification_Codes, ARGS, typ_classification, backend="numpy")
+            record("classify_" + typ_classification, index.size, elapsed, peak)
+            if kg_jit.has_numba():
+                # Untimed first call, compiling the rules
+                KG.get_kg_classification_Codes(ARGS[:, :1], typ_classification, backend="numba")
+                _, elapsed, peak = measure(KG.get_kg_classification_Codes, ARGS, typ_classification, backend="numba")
+                record("classify_%s_numba" % typ_classification, index.size, elapsed, peak)
+            # endif
+            codes[~ARGS_valid] = 0
+            KG_maps[typ_classification] = KG.scatter_cells(codes, index, (ny, nx))
+        # end for
+        del ARGS
+    else:
+        report("%-8s stages skipped, the whole grid does not fit in --max-memory" % label)
+    # endif
+
+    directory = tempfile.mkdtemp(prefix="kg_bench")
+    try:
+        typ_classification = schemes[0]
+        for extension in writers:
+            path = os.path.join(directory, "KG_%s.%s" % (typ_classification, extension))
+            warm_path = os.path.join(directory, "warm_up.%s" % extension)
+            if extension == "npz" and not in_memory:
+                report("%-8s %-*s skipped, a whole map does not fit in --max-memory" % (label, width, "write_npz"))
+                continue
+            # endif
+            try:
+                # Untimed first write of a small map, so that the lazy imports of the writer are not timed
+                kg_io.write_KG_map(warm_path, np.zeros((2, 2), dtype=np.uint8), lats[:2], lons[:2],
+                                   typ_classification)
+                if extension == "npz":
+                    _, elapsed, peak = measure(kg_io.write_KG_map, path, KG_maps[typ_classification], lats, lons,
+                                               typ_classification)
+                else:
+                    monitor, _, peak = measure(write_tiled, path, mon_TAS, mon_PRC, lats, lons, typ_classification,
+                                               sum_strt=sum_strt, max_memory=max_memory)
+                    elapsed = monitor.stages["write"][0]
+                # endif
+            except ImportError as error:
+                report("%-8s %-*s skipped (%s)" % (label, width, "write_" + extension, error))
+                continue
+            # end try
+            record("write_" + extension, ny * nx, elapsed, peak)
+        # end for
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    # end try
+    del KG_maps
+
+    for engine in engines:
+        for typ_classification in schemes:
+            if engine == "tiled":
+                KG_map, elapsed, peak = measure(KG.classify_tiled, mon_TAS, mon_PRC, typ_classification,
+                                                sum_strt=sum_strt, max_memory=max_memory)
+            else:
+                KG_map, elapsed, peak = measure(KG.classify_parallel, mon_TAS, mon_PRC, typ_classification,
+                                                sum_strt=sum_strt, workers=workers,
+                                                max_memory=max(max_memory // workers, 1))
+            # endif
+            record("%s_%s" % (engine, typ_classification), ny * nx, elapsed, peak)
+            missing = get_missing_classes(KG_map, typ_classification)
+            if missing:
+                report("%-8s %s classes not reached: %s" % (label, typ_classification, " ".join(missing)))
+            # endif
+        # end for
+    # end for
+    return records
+# end def bench_size
+
+def get_worker_counts(workers):
+    # 1, 2, 4, ... up to workers, workers included
+    counts = [1]
+    while counts[-1] * 2 < workers:
+        counts.append(counts[-1] * 2)
+    # end while
+    return counts + [workers] if workers > 1 else counts
+# end def get_worker_counts
+
+def bench_scaling(size, typ_classification, workers=1, max_memory=2**30, seed=0, report=print):
+    """
+    Benchmark records of the thread mode of classify_parallel for 1, 2, 4, ... workers,
+    with their speedup over classify_tiled on the same inputs. Inputs are the lazy
+    synthetic climatology, and in-memory arrays if the grid fits in max_memory.
+    """
+    import koeppen_geiger as KG
+
+    label, ny, nx = parse_size(size)
+    mon_TAS, mon_PRC, lats, lons = synthetic_climatology(ny, nx, seed=seed)
+    sum_strt = KG.get_sum_strt("hemisphere", lats)
+    inputs = [("lazy", mon_TAS, mon_PRC)]
+    if fits_in_memory((ny, nx), max_memory):
+        inputs.append(("memory", mon_TAS[:], mon_PRC[:]))
+    # endif
+    records = []
+    width = len("threads%d_memory_%s" % (workers, typ_classification))
+    for input_name, TAS, PRC in inputs:
+        tiled_time = measure(KG.classify_tiled, TAS, PRC, typ_classification, sum_strt=sum_strt,
+                             max_memory=max_memory)[1]
+        for n_workers in get_worker_counts(workers):
+            elapsed, peak = measure(KG.classify_parallel, TAS, PRC, typ_classification, sum_strt=sum_strt,
+                                    workers=n_workers, max_memory=max(max_memory // n_workers, 1))[1:]
+            name = "threads%d_%s_%s" % (n_workers, input_name, typ_classification)
+            entry = {"size": label, "shape": [ny, nx], "benchmark": name, "cells": ny * nx, "seconds": elapsed,
+                     "cells_per_second": ny * nx / elapsed if elapsed > 0 else float("inf"), "peak_bytes": int(peak),
+                     "speedup_over_tiled": tiled_time / elapsed if elapsed > 0 else float("inf")}
+            records.append(entry)
+            report("%s %6.2fx classify_tiled (%d cores)"
+                   % (_format_record(entry, width), entry["speedup_over_tiled"], os.cpu_count() or 1))
+        # end for
+    # end for
+    return records
+# end def bench_scaling
+
+def compare(records, baseline, tolerance=0.2):
+    # Benchmarks of records slower than in baseline by more than tolerance, as (record, baseline record)
+    reference = {(entry["size"], entry["benchmark"]): entry for entry in baseline}
+    slower = []
+    for entry in records:
+        before = reference.get((entry["size"], entry["benchmark"]))
+        if before is not None and entry["cells_per_second"] < before["cells_per_second"] * (1.0 - tolerance):
+            slower.append((entry, before))
+        # endif
+    # end for
+    return slower
+# end def compare
+
+def main(argv=None):
+    import create_KG_cmap as CKG
+
+    parser = argparse.ArgumentParser(description="Benchmarks of the Koeppen-Geiger classifications")
+    parser.add_argument("--sizes", default="1,0.5,0.25",
+                        help="grid resolutions, in degrees or 1km / 5km / 10km, comma separated")
+    parser.add_argument("--schemes", default=",".join(CKG.KG_schemes), help="classification types, comma separated")
+    parser.add_argument("--engines", default="tiled,parallel", help="tiled and / or parallel, comma separated")
+    parser.add_argument("--writers", default="npz,nc,zarr,tif", help="output formats timed, comma separated")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="workers of the parallel engine")
+    parser.add_argument("--max-memory", type=float, default=1024.0, help="memory budget, in MB")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic climatology")
+    parser.add_argument("--scaling", action="store_true",
+                        help="time the thread mode of classify_parallel for 1, 2, 4, ... --workers threads")
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--baseline", help="results of a previous run, to report regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    schemes = [typ for typ in args.schemes.split(",") if typ]
+    for typ_classification in schemes:
+        if typ_classification not in CKG.KG_schemes:
+            parser.error("Unknown classification type: %s" % typ_classification)
+        # endif
+    # end for
+    engines = [engine for engine in args.engines.split(",") if engine]
+    for engine in engines:
+        if engine not in ("tiled", "parallel"):
+            parser.error("Unknown engine: %s" % engine)
+        # endif
+    # end for
+
+    records = []
+    for size in args.sizes.split(","):
+        records += bench_size(size, schemes, engines, [w for w in args.writers.split(",") if w],
+                              workers=args.workers, max_memory=int(args.max_memory * 2**20), seed=args.seed)
+        if args.scaling:
+            records += bench_scaling(size, schemes[0], workers=args.workers,
+                                     max_memory=int(args.max_memory * 2**20), seed=args.seed)
+        # endif
+    # end for
+
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump({"version": __version__, "workers": args.workers, "records": records}, json_file, indent=1)
+        # end with
+    # endif
+
+    if args.baseline:
+        with open(args.baseline) as json_file:
+            baseline = json.load(json_file)["records"]
+        # end with
+        slower = compare(records, baseline, tolerance=args.tolerance)
+        for entry, before in slower:
+            print("Regression: %s %s %.0f cells/s, was %.0f" % (entry["size"], entry["benchmark"],
+                                                              entry["cells_per_second"], before["cells_per_second"]))
+        # end for
+        return 1 if slower else 0
+    # endif
+    return 0
+# end def main
+
+if __name__ == "__main__":
+    sys.exit(main())
+# endif
+
+# The End of All Things (op. cit.)
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+"""
+Created on Sun Oct 18 14:09:56 UTC 2026
+Last modified, Sun Oct 18 15:13:34 UTC 2026
+
+@author: agent <agent@local>
+
+Opt-in on-disk cache of predictor blocks and class maps.
+
+Entries are addressed by a hash of the inputs (array contents, or file
+checksums plus the reading options), the season mode, the classification
+type and the version of koeppen_geiger. A repeated run reads the class map
+back, a new classification type on already seen inputs starts from the
+cached predictors. The cache is bounded in size, least recently used
+entries are removed first. File checksums are kept in the cache directory
+and computed again only when the size or the modification time of a file
+changes; class maps are stored with the cell and class counts of their run.
+"""
+
+# Changes from version 0.0 :
+# Changes from version 0.1 : Stage timers and counts through a run monitor
+# Changes from version 0.2 : File checksums stored by (path, size, mtime), maps stored with their counts
+
+__version__ = "0.3"
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=20)
+# end def _new_hash
+
+def hash_arrays(*arrays):
+    # Content hash of arrays (or monthly stacks read month by month), shapes and dtypes included
+    import koeppen_geiger as KG
+
+    digest = _new_hash()
+    for array in arrays:
+        digest.update(repr(tuple(array.shape)).encode())
+        if isinstance(array, np.ndarray) and not np.ma.isMaskedArray(array):
+            digest.update(str(array.dtype).encode())
+            digest.update(np.ascontiguousarray(array).data)
+        else:
+            for month in range(array.shape[0]):
+                data, ok = KG._get_month(array, month)
+                digest.update(np.where(ok, data, np.nan).tobytes())
+            # end for
+        # endif
+    # end for
+    return digest.hexdigest()
+# end def hash_arrays
+
+def hash_file(path, block_size=2**22):
+    # Content hash of a file, read by blocks
+    digest = _new_hash()
+    with open(path, "rb") as data_file:
+        for block in iter(lambda: data_file.read(block_size), b""):
+            digest.update(block)
+        # end for
+    # end with
+    return digest.hexdigest()
+# end def hash_file
+
+def hash_profile(profile, hash_file=hash_file):
+    """
+    Hash of the inputs of a dataset profile: checksums of its files plus all its reading options.
+
+    hash_file gives the checksum of a path, KGCache.hash_file reuses the checksums
+    of the files already seen.
+    """
+    options = json.loads(json.dumps(profile))
+    options.pop("name", None)
+    for var in ("tas", "prc", "coords"):
+        if var in options:
+            options[var]["checksum"] = hash_file(options[var].pop("path"))
+        # endif
+    # end for
+    digest = _new_hash()
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()
+# end def hash_profile
+
+def hash_sum_strt(sum_strt):
+    # Season part of a cache key: the season mode or the hash of a per-row / per-cell sum_strt
+    if isinstance(sum_strt, str) or np.ndim(sum_strt) == 0:
+        return str(sum_strt)
+    # endif
+    return hash_arrays(np.asarray(sum_strt))
+# end def hash_sum_strt
+
+class KGCache:
+    """
+    Size-bounded cache directory of predictor blocks and class maps (.npz).
+
+    Parameters
+    ----------
+    directory : cache directory, created if needed
+    max_bytes : total size above which the least recently used entries are removed
+    """
+
+    CHECKSUMS = "checksums.json"
+
+    def __init__(self, directory, max_bytes=2**32):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+    # end def __init__
+
+    def _read_checksums(self):
+        try:
+            with open(os.path.join(self.directory, self.CHECKSUMS)) as checksums_file:
+                return json.load(checksums_file)
+            # end with
+        except (OSError, ValueError):
+            return {}
+        # end try
+    # end def _read_checksums
+
+    def hash_file(self, path):
+        # Checksum of a file, read again only if its size or modification time changed since the last one
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        checksums = self._read_checksums()
+        if path in checksums and checksums[path][:2] == stamp:
+            return checksums[path][2]
+        # endif
+        checksum = hash_file(path)
+        checksums[path] = stamp + [checksum]
+        checksums_path = os.path.join(self.directory, self.CHECKSUMS)
+        tmp_path = checksums_path + ".tmp%d" % os.getpid()
+        with open(tmp_path, "w") as checksums_file:
+            json.dump(checksums, checksums_file)
+        # end with
+        os.replace(tmp_path, checksums_path)
+        return checksum
+    # end def hash_file
+
+    @staticmethod
+    def make_key(*parts):
+        import koeppen_geiger as KG
+
+        digest = _new_hash()
+        digest.update("\0".join(map(str, parts + (KG.__version__,))).encode())
+        return digest.hexdigest()
+    # end def make_key
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+    # end def _path
+
+    def _hit(self, path):
+        # Mark an entry as recently used
+        if os.path.exists(path):
+            os.utime(path)
+            return True
+        # endif
+        return False
+    # end def _hit
+
+    def _store(self, path, write):
+        # Atomic write of one entry, then eviction down to max_bytes
+        tmp_path = path + ".tmp%d" % os.getpid()
+        with open(tmp_path, "wb") as entry_file:
+            write(entry_file)
+        # end with
+        os.replace(tmp_path, path)
+        self.evict()
+    # end def _store
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz") or name.endswith(".npy"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+            # endif
+        # end for
+        total = sum(entry[1] for entry in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # endif
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+        # end for
+    # end def evict
+
+    def get_predictors(self, key):
+        # ARGS of the valid cells, their flat index and the grid shape, or None
+        path = self._path(key, ".npz")
+        if not self._hit(path):
+            return None
+        # endif
+        with np.load(path) as entry:
+            return entry["ARGS"], entry["index"], tuple(entry["shape"])
+        # end with
+    # end def get_predictors
+
+    def put_predictors(self, key, ARGS, index, shape):
+        self._store(self._path(key, ".npz"),
+                    lambda entry_file: np.savez(entry_file, ARGS=ARGS, index=index, shape=np.array(shape)))
+    # end def put_predictors
+
+    def get_map(self, key):
+        # Class map and the counters of its run (see kg_monitor.RunMonitor.get_counters), or None
+        path = self._path(key, ".map.npz")
+        if not self._hit(path):
+            return None
+        # endif
+        with np.load(path) as entry:
+            cells_total, cells_valid = entry["cells"]
+            return entry["KG_map"], ({}, int(cells_total), int(cells_valid), entry["class_counts"])
+        # end with
+    # end def get_map
+
+    def put_map(self, key, KG_map, cells_valid, class_counts):
+        # class_counts: bincount of the codes of the valid cells, 0 (no class) included
+        self._store(self._path(key, ".map.npz"),
+                    lambda entry_file: np.savez(entry_file, KG_map=KG_map, cells=np.array([KG_map.size, cells_valid]),
+                                                class_counts=class_counts))
+    # end def put_map
+
+    def classify(self, mon_TAS, mon_PRC, typ_classification, sum_strt=3, input_key=None, monitor=None):
+        """
+        uint8 class map (0 where no class is defined) as koeppen_geiger.classify_grid,
+        through the cache.
+
+        input_key identifies the inputs, for instance hash_profile(profile); the
+        contents of mon_TAS and mon_PRC are hashed if None. monitor is a
+        kg_monitor.RunMonitor, as in koeppen_geiger.classify_grid.
+        """
+        import koeppen_geiger as KG
+
+        if input_key is None:
+            input_key = hash_arrays(mon_TAS, mon_PRC)
+        # endif
+        season_key = hash_sum_strt(sum_strt)
+        map_key = self.make_key("map", input_key, season_key, typ_classification)
+        with KG._stage(monitor, "load"):
+            cached = self.get_map(map_key)
+        # end with
+        if cached is not None:
+            KG_map, counters = cached
+            if monitor is not None:
+                monitor.merge(counters)
+            # endif
+            return KG_map
+        # endif
+
+        predictors_key = self.make_key("predictors", input_key, season_key)
+        with KG._stage(monitor, "load"):
+            cached = self.get_predictors(predictors_key)
+        # end with
+        if cached is None:
+            shape = mon_TAS.shape[1:]
+            with KG._stage(monitor, "gather"):
+                index = KG.get_valid_index(KG.get_valid_mask(mon_TAS, mon_PRC))
+                cells_TAS, cells_PRC = KG.gather_cells(mon_TAS, index), KG.gather_cells(mon_PRC, index)
+            # end with
+            with KG._stage(monitor, "seasons"):
+                sum_strt = KG.get_cell_sum_strt(sum_strt, shape, index)
+            # end with
+            with KG._stage(monitor, "predictors"):
+                ARGS, ARGS_valid = KG.get_predictors(cells_TAS, cells_PRC, sum_strt=sum_strt)
+            # end with
+            del cells_TAS, cells_PRC
+            ARGS, index = ARGS[:, ARGS_valid], index[ARGS_valid]
+            self.put_predictors(predictors_key, ARGS, index, shape)
+        else:
+            ARGS, index, shape = cached
+        # endif
+
+        with KG._stage(monitor, "classification"):
+            codes = KG.get_kg_classification_Codes(ARGS, typ_classification)
+        # end with
+        class_counts = np.bincount(codes, minlength=256)
+        if monitor is not None:
+            monitor.merge(({}, int(np.prod(shape)), index.size, class_counts))
+        # endif
+        KG_map = KG.scatter_cells(codes, index, shape).filled(0)
+        self.put_map(map_key, KG_map, index.size, class_counts)
+        return KG_map
+    # end def classify
+# end class KGCache
+
+# The End of All Things (op. cit.)
@@ -0,0 +1,494 @@
+# -*- coding: utf-8 -*-
+
+"""
+Created on Sun Oct 18 14:06:16 UTC 2026
+Last modified, Sun Oct 18 14:59:03 UTC 2026
+
+@author: agent <agent@local>
+
+Input / output utilities for the Koeppen-Geiger classifications.
+netCDF4 is only imported when a file is actually opened.
+"""
+
+# Changes from version 0.0 : Lazy netCDF input replacing lcm_utils.read_var_NC
+# Changes from version 0.1 : Declarative dataset profiles
+# Changes from version 0.2 : uint8 class map writers, NetCDF, zarr and cloud-optimized GeoTIFF
+# Changes from version 0.3 : Timing of the netCDF decoding through a run monitor
+
+__version__ = "0.4"
+
+import json
+import os
+
+import numpy as np
+
+
+def find_closest(array, value):
+    # Index of the element of array closest to value
+    return int(np.abs(np.asarray(array) - value).argmin())
+# end def find_closest
+
+def read_txt(path, cols=None):
+    # Whitespace separated columns of a text file, as an array of shape (cols, lines)
+    usecols = None if cols is None else range(cols)
+    return np.loadtxt(path, usecols=usecols, unpack=True, ndmin=2)
+# end def read_txt
+
+def _sub_index(base, key):
+    # Index of the underlying variable for key applied to the selection base (a range)
+    selected = base[key]
+    if isinstance(selected, range):
+        if selected.step > 0:
+            return slice(selected.start, selected.stop, selected.step)
+        # endif
+        return np.array(selected)
+    # endif
+    return selected
+# end def _sub_index
+
+class NCVar:
+    """
+    Lazy view of a (time, lat, lon) netCDF variable.
+
+    Nothing is read until the view is indexed, and then only the requested
+    months, rows and columns. Values are returned as float32 with the on-disk
+    scale_factor / add_offset applied, then the unit conversion
+    value * scale + offset, and NaN for missing values (_FillValue,
+    missing_value, fill_value, below valid_min).
+
+    Parameters
+    ----------
+    path : netCDF file
+    name : variable name
+    lat_name, lon_name : names of the coordinate variables, for lats / lons and lat_range
+    lat_range : (lat_a, lat_b), keep only the rows between the latitudes closest to lat_a and lat_b
+    months : time indices to keep, in order, all of them if None
+    fill_value : additional missing value, compared to the decoded data
+    valid_min : decoded values below valid_min are missing
+    scale, offset : unit conversion applied after decoding
+
+    The monitor attribute may hold a kg_monitor.RunMonitor timing the decoding
+    and unit conversion as the "convert" stage.
+    """
+
+    def __init__(self, path, name, lat_name=None, lon_name=None, lat_range=None, months=None,
+                 fill_value=None, valid_min=None, scale=1.0, offset=0.0):
+        self.path = path
+        self.name = name
+        self.lat_name = lat_name
+        self.lon_name = lon_name
+        self.lat_range = lat_range
+        self.months = months
+        self.fill_value = fill_value
+        self.valid_min = valid_min
+        self.scale = scale
+        self.offset = offset
+        self.monitor = None
+        self._dataset = None
+    # end def __init__
+
+    def _open(self):
+        if self._dataset is None:
+            import netCDF4
+
+            self._dataset = netCDF4.Dataset(self.path)
+            self._var = self._dataset.variables[self.name]
+            self._var.set_auto_maskandscale(False)
+            n_time, n_lat, n_lon = self._var.shape
+            self._times = range(n_time) if self.months is None else list(self.months)
+            if self._times == list(range(self._times[0], self._times[-1] + 1)):
+                self._times = range(self._times[0], self._times[-1] + 1)
+            # endif
+            if self.lat_range is None:
+                self._rows = range(n_lat)
+            else:
+                lats = self._dataset.variables[self.lat_name][:]
+                rows = sorted(find_closest(lats, lat) for lat in self.lat_range)
+                self._rows = range(rows[0], rows[1] + 1)
+            # endif
+            self._cols = range(n_lon)
+        # endif
+        return self._var
+    # end def _open
+
+    def close(self):
+        if self._dataset is not None:
+            self._dataset.close()
+            self._dataset = None
+        # endif
+    # end def close
+
+    def __enter__(self):
+        return self
+    # end def __enter__
+
+    def __exit__(self, *exc):
+        self.close()
+    # end def __exit__
+
+    @property
+    def shape(self):
+        self._open()
+        return len(self._times), len(self._rows), len(self._cols)
+    # end def shape
+
+    @property
+    def ndim(self):
+        return 3
+    # end def ndim
+
+    def __len__(self):
+        return self.shape[0]
+    # end def __len__
+
+    @property
+    def chunks(self):
+        # On-disk chunk shape (time, lat, lon), None for contiguous storage
+        chunking = self._open().chunking()
+        return None if chunking == "contiguous" else tuple(chunking)
+    # end def chunks
+
+    @property
+    def lats(self):
+        self._open()
+        return np.asarray(self._dataset.variables[self.lat_name][self._rows.start:self._rows.stop])
+    # end def lats
+
+    @property
+    def lons(self):
+        self._open()
+        return np.asarray(self._dataset.variables[self.lon_name][:])
+    # end def lons
+
+    def __getitem__(self, key):
+        var = self._open()
+        if not isinstance(key, tuple):
+            key = (key,)
+        # endif
+        if any(k is Ellipsis for k in key):
+            i_ell = key.index(Ellipsis)
+            key = key[:i_ell] + (slice(None),) * (4 - len(key)) + key[i_ell + 1:]
+        # endif
+        key = key + (slice(None),) * (3 - len(key))
+
+        i_time = np.asarray(self._times)[key[0]] if isinstance(self._times, list) else _sub_index(self._times, key[0])
+        raw = var[i_time, _sub_index(self._rows, key[1]), _sub_index(self._cols, key[2])]
+        raw = np.asarray(raw)
+        if self.monitor is None:
+            return self._decode(var, raw)
+        # endif
+        with self.monitor.stage("convert"):
+            return self._decode(var, raw)
+        # end with
+    # end def __getitem__
+
+    def _decode(self, var, raw):
+        # float32 values in the target units, NaN where missing
+        missing = np.zeros(raw.shape, dtype=bool)
+        for attr in ("_FillValue", "missing_value"):
+            if attr in var.ncattrs():
+                missing |= raw == getattr(var, attr)
+            # endif
+        # end for
+
+        data = raw.astype(np.float32)
+        if "scale_factor" in var.ncattrs():
+            data *= np.float32(var.scale_factor)
+        # endif
+        if "add_offset" in var.ncattrs():
+            data += np.float32(var.add_offset)
+        # endif
+        if self.fill_value is not None:
+            missing |= data == np.float32(self.fill_value)
+        # endif
+        if self.valid_min is not None:
+            missing |= data < self.valid_min
+        # endif
+        if self.scale != 1.0:
+            data *= np.float32(self.scale)
+        # endif
+        if self.offset != 0.0:
+            data += np.float32(self.offset)
+        # endif
+        data[missing] = np.nan
+        return data
+    # end def _decode
+# end class NCVar
+
+def get_aligned_tile_shape(shape, chunks, max_memory=2**30):
+    """
+    (rows, cols) tiles of a (ny, nx) grid within max_memory bytes, whole latitude
+    bands made of a whole number of on-disk chunks when possible.
+    """
+    import koeppen_geiger as KG
+
+    rows, cols = next(KG.iter_tiles(shape, max_memory=max_memory))
+    n_rows = rows.stop - rows.start
+    if chunks is not None and chunks[1] <= n_rows < shape[0] and cols.stop - cols.start == shape[1]:
+        n_rows -= n_rows % chunks[1]
+    # endif
+    return n_rows, cols.stop - cols.start
+# end def get_aligned_tile_shape
+
+# A dataset profile is a JSON file describing one pair of monthly inputs, e.g.
+#
+# {
+#   "name": "CRU",
+#   "tas": {"path": "test-data/cru_ts4.02.1951.2000.tmp.dat-ymonmean.nc", "var": "tmp", "lat": "lat", "lon": "lon"},
+#   "prc": {"path": "test-data/dataPrcpClim-ymonmean.nc", "var": "prcp", "lat": "Y"},
+#   "tas_lat_range": "prc",
+#   "season": "hemisphere"
+# }
+#
+# "tas" and "prc" take the NCVar options: "var", "lat", "lon", "fill_value", "valid_min",
+# "scale", "offset", "months" and "lat_range". Temperatures must come out in C and
+# precipitation in mm/month. "tas_lat_range": "prc" restricts the temperature to the
+# latitudes of the precipitation. Coordinates are taken from "tas", or from a text file:
+#   "coords": {"path": ..., "columns": 6, "lat_column": 3, "lon_column": 2, "nlon": 256}
+# "season" is a season mode of koeppen_geiger.get_sum_strt, "hemisphere" by default.
+
+def read_profile(path):
+    # Dataset profile from a JSON file, named after the file if it has no "name"
+    with open(path) as profile_file:
+        profile = json.load(profile_file)
+    # end with
+    profile.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    return profile
+# end def read_profile
+
+def _open_profile_var(options, lat_range=None):
+    return NCVar(options["path"], options["var"], lat_name=options.get("lat"), lon_name=options.get("lon"),
+                 lat_range=options.get("lat_range", lat_range), months=options.get("months"),
+                 fill_value=options.get("fill_value"), valid_min=options.get("valid_min"),
+                 scale=options.get("scale", 1.0), offset=options.get("offset", 0.0))
+# end def _open_profile_var
+
+def open_profile(profile):
+    """
+    Lazy inputs of a dataset profile.
+
+    Returns
+    -------
+    mon_TAS, mon_PRC : NCVar views, in C and mm/month
+    lats, lons : coordinates of the rows and columns of the grid
+    season : season mode of the profile
+    """
+    mon_PRC = _open_profile_var(profile["prc"])
+    lat_range = None
+    if profile.get("tas_lat_range") == "prc":
+        lats_PRC = mon_PRC.lats
+        lat_range = (lats_PRC[0], lats_PRC[-1])
+    # endif
+    mon_TAS = _open_profile_var(profile["tas"], lat_range=lat_range)
+
+    if "coords" in profile:
+        coords = profile["coords"]
+        data_array = read_txt(coords["path"], cols=coords.get("columns"))
+        lats = data_array[coords["lat_column"], ::coords["nlon"]]
+        lons = data_array[coords["lon_column"], :coords["nlon"]]
+    else:
+        lats = mon_TAS.lats
+        lons = mon_TAS.lons
+    # endif
+    return mon_TAS, mon_PRC, lats, lons, profile.get("season", "hemisphere")
+# end def open_profile
+
+def write_KG_npz(path, KG_map, lats, lons, typ_classification):
+    # uint8 class map with its coordinates and labels, compressed
+    import create_KG_cmap as CKG
+
+    labels = CKG.get_KG_labels(typ_classification)
+    np.savez_compressed(path, KG_map=np.ma.filled(KG_map, 0).astype(np.uint8), lats=np.asarray(lats),
+                        lons=np.asarray(lons), typ_classification=typ_classification,
+                        codes=np.array(sorted(labels), dtype=np.uint8),
+                        labels=np.array([labels[code] for code in sorted(labels)]))
+# end def write_KG_npz
+
+def _get_flags(typ_classification):
+    # flag_values / flag_meanings of a classification type, from its code table
+    import create_KG_cmap as CKG
+
+    labels = CKG.get_KG_labels(typ_classification)
+    codes = sorted(labels)
+    return np.array(codes, dtype=np.uint8), " ".join(labels[code] for code in codes)
+# end def _get_flags
+
+def create_KG_netcdf(path, lats, lons, typ_classification, n_maps=None, complevel=4, chunks=None):
+    """
+    New NetCDF file with a compressed uint8 variable "KG" of shape (lat, lon),
+    or (map, lat, lon) for a stack of n_maps, to be filled tile by tile (for
+    instance as the out argument of koeppen_geiger.classify_tiled).
+
+    flag_values and flag_meanings come from the code table of typ_classification,
+    0 is the fill value. Returns the open netCDF4.Dataset, to be closed by the caller.
+    """
+    import netCDF4
+
+    dataset = netCDF4.Dataset(path, "w", format="NETCDF4")
+    dataset.createDimension("lat", len(lats))
+    dataset.createDimension("lon", len(lons))
+    dims = ("lat", "lon")
+    if n_maps is not None:
+        dataset.createDimension("map", n_maps)
+        dims = ("map",) + dims
+    # endif
+    dataset.createVariable("lat", "f8", ("lat",))[:] = np.asarray(lats)
+    dataset.createVariable("lon", "f8", ("lon",))[:] = np.asarray(lons)
+    dataset["lat"].units = "degrees_north"
+    dataset["lon"].units = "degrees_east"
+    if chunks is None:
+        chunks = (1,) * (len(dims) - 2) + (min(len(lats), 256), min(len(lons), 256))
+    # endif
+    var = dataset.createVariable("KG", "u1", dims, zlib=True, complevel=complevel, shuffle=True,
+                                 chunksizes=chunks, fill_value=np.uint8(0))
+    var.flag_values, var.flag_meanings = _get_flags(typ_classification)
+    var.long_name = "Koeppen-Geiger class (%s)" % typ_classification
+    dataset.classification = typ_classification
+    return dataset
+# end def create_KG_netcdf
+
+def create_KG_zarr(path, lats, lons, typ_classification, n_maps=None, chunks=None):
+    """
+    New zarr store with a chunked, compressed uint8 array "KG" of shape (lat, lon),
+    or (map, lat, lon) for a stack of n_maps, plus "lat" and "lon". Returns the
+    "KG" array, to be filled tile by tile or map by map.
+    """
+    import zarr
+
+    shape = (len(lats), len(lons))
+    if n_maps is not None:
+        shape = (n_maps,) + shape
+    # endif
+    if chunks is None:
+        chunks = (1,) * (len(shape) - 2) + (min(shape[-2], 512), min(shape[-1], 512))
+    # endif
+    group = zarr.open_group(path, mode="w")
+    create = getattr(group, "create_array", None) or group.create_dataset  # zarr 3 / zarr 2
+    create("lat", shape=(len(lats),), dtype="f8")[:] = np.asarray(lats)
+    create("lon", shape=(len(lons),), dtype="f8")[:] = np.asarray(lons)
+    KG = create("KG", shape=shape, chunks=chunks, dtype="u1", fill_value=0)
+    flag_values, flag_meanings = _get_flags(typ_classification)
+    KG.attrs.update(classification=typ_classification, flag_values=flag_values.tolist(),
+                    flag_meanings=flag_meanings, _FillValue=0)
+    return KG
+# end def create_KG_zarr
+
+class KGGeoTIFF:
+    """
+    Cloud-optimized GeoTIFF of a regular lat / lon class map, written tile by tile.
+
+    Tiles are assigned with writer[rows, cols] = codes (so the writer can be the
+    out argument of koeppen_geiger.classify_tiled) into an internally tiled,
+    deflate-compressed GeoTIFF. close() builds the overviews (mode resampling)
+    and rewrites the file with the COG layout. Needs rasterio.
+    """
+
+    def __init__(self, path, lats, lons, typ_classification, blocksize=512):
+        import rasterio
+        from rasterio.transform import from_origin
+
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        self.path = path
+        self.shape = (lats.size, lons.size)
+        self.typ_classification = typ_classification
+        # GeoTIFF rows go from north to south, ascending latitudes are flipped
+        self._flip = lats.size > 1 and lats[1] > lats[0]
+        dlat = abs(lats[-1] - lats[0]) / max(lats.size - 1, 1)
+        dlon = abs(lons[-1] - lons[0]) / max(lons.size - 1, 1)
+        transform = from_origin(float(lons.min() - dlon / 2), float(lats.max() + dlat / 2), float(dlon), float(dlat))
+        self._tmp_path = path + ".tmp.tif"
+        self._dst = rasterio.open(self._tmp_path, "w", driver="GTiff", width=lons.size, height=lats.size, count=1,
+                                  dtype="uint8", crs="EPSG:4326", transform=transform, nodata=0, tiled=True,
+                                  blockxsize=blocksize, blockysize=blocksize, compress="deflate")
+    # end def __init__
+
+    def __setitem__(self, key, codes):
+        from rasterio.windows import Window
+
+        rows, cols = (range(n)[k] for k, n in zip(key, self.shape))
+        codes = np.asarray(codes, dtype=np.uint8).reshape(len(rows), len(cols))
+        row_off = rows.start
+        if self._flip:
+            codes = codes[::-1]
+            row_off = self.shape[0] - rows.stop
+        # endif
+        self._dst.write(codes, 1, window=Window(cols.start, row_off, len(cols), len(rows)))
+    # end def __setitem__
+
+    def close(self):
+        import rasterio
+        import rasterio.shutil
+        from rasterio.enums import Resampling
+
+        if self._dst is None:
+            return
+        # endif
+        factors = [2 ** level for level in range(1, 12) if min(self.shape) // 2 ** level >= 256] or [2]
+        self._dst.build_overviews(factors, Resampling.mode)
+        self._dst.update_tags(ns="rio_overview", resampling="mode")
+        flag_values, flag_meanings = _get_flags(self.typ_classification)
+        self._dst.update_tags(classification=self.typ_classification, flag_meanings=flag_meanings)
+        self._dst.close()
+        self._dst = None
+        rasterio.shutil.copy(self._tmp_path, self.path, driver="COG", compress="DEFLATE")
+        os.remove(self._tmp_path)
+    # end def close
+
+    def __enter__(self):
+        return self
+    # end def __enter__
+
+    def __exit__(self, *exc):
+        self.close()
+    # end def __exit__
+# end class KGGeoTIFF
+
+def open_KG_output(path, lats, lons, typ_classification, n_maps=None):
+    """
+    Streaming output of class maps, chosen by the extension of path:
+    .nc NetCDF, .zarr zarr store, .tif cloud-optimized GeoTIFF (single map only).
+
+    Returns out, close: out receives the uint8 codes by slices, close() finishes the file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    match extension:
+        case ".nc":
+            dataset = create_KG_netcdf(path, lats, lons, typ_classification, n_maps=n_maps)
+            return dataset["KG"], dataset.close
+        case ".zarr":
+            return create_KG_zarr(path, lats, lons, typ_classification, n_maps=n_maps), lambda: None
+        case ".tif" | ".tiff":
+            if n_maps is not None:
+                raise ValueError("GeoTIFF output holds a single map, use .nc or .zarr for stacks")
+            # endif
+            writer = KGGeoTIFF(path, lats, lons, typ_classification)
+            return writer, writer.close
+        case _:
+            raise ValueError("Unknown class map format: %s" % path)
+    #end match
+# end def open_KG_output
+
+def write_KG_map(path, KG_map, lats, lons, typ_classification):
+    # Whole class map (or (map, lat, lon) stack) to .npz, .nc, .zarr or .tif according to the extension of path
+    if os.path.splitext(path)[1].lower() == ".npz":
+        write_KG_npz(path, KG_map, lats, lons, typ_classification)
+        return
+    # endif
+    KG_map = np.ma.filled(KG_map, 0).astype(np.uint8)
+    out, close = open_KG_output(path, lats, lons, typ_classification,
+                                n_maps=KG_map.shape[0] if KG_map.ndim == 3 else None)
+    try:
+        if KG_map.ndim == 3:
+            for i_map in range(KG_map.shape[0]):
+                out[i_map] = KG_map[i_map]
+            # end for
+        else:
+            out[0:KG_map.shape[0], 0:KG_map.shape[1]] = KG_map
+        # endif
+    finally:
+        close()
+    # end try
+# end def write_KG_map
+
+# The End of All Things (op. cit.)
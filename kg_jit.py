@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+
+"""
+Created on Sun Oct 18 14:22:53 UTC 2026
+Last modified, Sun Oct 18 15:26:20 UTC 2026
+
+@author: agent <agent@local>
+
+Optional compiled backend of the scalar classification rules.
+
+The per-cell rule functions of koeppen_geiger (get_kg_classification,
+get_second_letter, get_third_letter, get_Arid_Climates, ...,
+get_kg_classification_Cannon and get_kg_classification_Trewartha) stay the
+single source of truth: their source is compiled as is by numba into a loop
+over the predictor columns, releasing the GIL, that returns uint8 codes.
+
+Two mechanical rewrites are applied to the source before compiling:
+- the numeric constants of the arithmetic and the comparisons are turned into
+  float32, so that the compiled code rounds as the NumPy array classifiers do on
+  float32 predictors (numba would compute in float64);
+- the labels are packed into integers, one byte per letter, and their
+  concatenations into shifts, so that no string is built per cell.
+The compiled loop transposes ARGS block by block, _BLOCK_CELLS cells at a
+time, into a small (cells, 13) buffer that stays in cache, and evaluates the
+rules on the contiguous row of each cell, without copying the whole of ARGS. The first use of a classification type compares
+the compiled codes with the NumPy array classifiers on the threshold-edge
+predictors of edge_predictors (also used by kg_verify) and raises a
+RuntimeError if they differ, so a rewrite gone wrong cannot pass silently.
+
+The interpreted functions round the same way on float32 predictors only with
+NumPy >= 2, where a np.float32 mixed with a Python float stays float32 (NEP 50);
+NumPy 1.x computes them in float64. FLOAT32_SCALARS tells which rounding applies,
+kg_verify compares the compiled rules with the interpreted ones only when it is True.
+
+Without numba, classify_codes falls back to the NumPy array classifiers of
+koeppen_geiger, which give the same codes. All the drivers of koeppen_geiger
+use the compiled rules after koeppen_geiger.set_classification_backend("numba").
+"""
+
+# Changes from version 0.0 :
+# Changes from version 0.1 : Compiled rules checked against the array classifiers on first use,
+#                             float32 rounding of the interpreted rules exposed as FLOAT32_SCALARS
+# Changes from version 0.2 : Contiguous predictors of each cell in the compiled loop, edge_predictors moved here
+
+__version__ = "0.3"
+
+import ast
+import inspect
+import threading
+import zlib
+
+import numpy as np
+
+
+# Scalar rules, each after the rules it calls
+_RULES = ("get_Equatorial_Climates_Kottek", "get_Equatorial_Climates_Peel", "get_Arid_Climates",
+          "get_second_letter", "get_third_letter", "get_Second_Third_Letter", "get_Polar_Climates",
+          "get_kg_classification", "get_kg_classification_Trewartha", "get_kg_classification_Cannon")
+
+_compiled = {}
+_compile_lock = threading.Lock()
+
+# NumPy >= 2 (NEP 50): the interpreted rules on np.float32 predictors compute in float32, as the compiled ones
+FLOAT32_SCALARS = (np.float32(1.0) * 1.1).dtype == np.float32
+
+# Threshold-edge predictor cells on which the compiled rules are checked before their first use
+_CHECK_CELLS = 20000
+
+# Cells transposed at a time by the compiled loop, 208 kB of predictors
+_BLOCK_CELLS = 4096
+
+def has_numba():
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        return False
+    # end try
+    return True
+# end def has_numba
+
+class _Float32Constants(ast.NodeTransformer):
+    # Constant-only sub-expressions are folded as Python does, numeric constants
+    # used in arithmetic or comparisons are then wrapped in _f32()
+
+    def _fold(self, node):
+        try:
+            return ast.copy_location(ast.Constant(ast.literal_eval(node)), node)
+        except ValueError:
+            return node
+        # end try
+    # end def _fold
+
+    def _wrap(self, node):
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            call = ast.Call(func=ast.Name(id="_f32", ctx=ast.Load()), args=[node], keywords=[])
+            return ast.copy_location(call, node)
+        # endif
+        return node
+    # end def _wrap
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        return self._fold(node) if isinstance(node.operand, ast.Constant) else node
+    # end def visit_UnaryOp
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.left, ast.Constant) and isinstance(node.right, ast.Constant):
+            return self._fold(node)
+        # endif
+        node.left, node.right = self._wrap(node.left), self._wrap(node.right)
+        return node
+    # end def visit_BinOp
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        node.left = self._wrap(node.left)
+        node.comparators = [self._wrap(comparator) for comparator in node.comparators]
+        return node
+    # end def visit_Compare
+# end class _Float32Constants
+
+def pack_label(label):
+    # Label as an integer, one byte per letter: "Cfa" -> 0x436661, "" -> 0. Longer strings than
+    # fit in an int64 are only options compared for equality (vers="trewartha"), they get a negative id
+    if len(label) > 7:
+        return -1 - zlib.crc32(label.encode())
+    # endif
+    return int.from_bytes(label.encode("ascii"), "big")
+# end def pack_label
+
+def _cat(head, tail):
+    # Packed label of the concatenation of two packed labels
+    shift = 0
+    rest = tail
+    while rest > 0:
+        rest >>= 8
+        shift += 8
+    # end while
+    return (head << shift) | tail
+# end def _cat
+
+class _PackedLabels(ast.NodeTransformer):
+    # String constants become packed labels and the concatenations of labels calls to _cat.
+    # Labels are told apart from numbers by a small inference: string constants, calls to
+    # the rules, parameters with a string default and names assigned any of those.
+
+    def __init__(self, rules):
+        self.rules = set(rules)
+        self.labels = set()
+    # end def __init__
+
+    def is_label(self, node):
+        match node:
+            case ast.Constant(value=str()):
+                return True
+            case ast.Call(func=ast.Name(id=name)):
+                return name in self.rules
+            case ast.Name(id=name):
+                return name in self.labels
+            case ast.BinOp(op=ast.Add()):
+                return self.is_label(node.left) or self.is_label(node.right)
+        #end match
+        return False
+    # end def is_label
+
+    def infer(self, function):
+        arguments = function.args
+        for arg, default in zip(arguments.args[len(arguments.args) - len(arguments.defaults):], arguments.defaults):
+            if self.is_label(default):
+                self.labels.add(arg.arg)
+            # endif
+        # end for
+        changed = True
+        while changed:
+            changed = False
+            for node in ast.walk(function):
+                if isinstance(node, ast.Assign) and self.is_label(node.value):
+                    targets = [target.id for target in node.targets if isinstance(target, ast.Name)]
+                elif isinstance(node, ast.AugAssign) and isinstance(node.op, ast.Add) and self.is_label(node.value):
+                    targets = [node.target.id]
+                else:
+                    continue
+                # endif
+                for target in targets:
+                    if target not in self.labels:
+                        self.labels.add(target)
+                        changed = True
+                    # endif
+                # end for
+            # end for
+        # end while
+    # end def infer
+
+    def visit_FunctionDef(self, node):
+        self.infer(node)
+        # No docstrings in the compiled rules
+        if node.body and isinstance(node.body[0], ast.Expr) and isinstance(node.body[0].value, ast.Constant):
+            node.body = node.body[1:] or [ast.Pass()]
+        # endif
+        self.generic_visit(node)
+        return node
+    # end def visit_FunctionDef
+
+    def visit_BinOp(self, node):
+        is_label = self.is_label(node)
+        self.generic_visit(node)
+        if is_label:
+            call = ast.Call(func=ast.Name(id="_cat", ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+            return ast.copy_location(call, node)
+        # endif
+        return node
+    # end def visit_BinOp
+
+    def visit_AugAssign(self, node):
+        if isinstance(node.op, ast.Add) and isinstance(node.target, ast.Name) and node.target.id in self.labels:
+            value = self.visit(node.value)
+            load = ast.Name(id=node.target.id, ctx=ast.Load())
+            call = ast.Call(func=ast.Name(id="_cat", ctx=ast.Load()), args=[load, value], keywords=[])
+            return ast.copy_location(ast.Assign(targets=[node.target], value=call), node)
+        # endif
+        self.generic_visit(node)
+        return node
+    # end def visit_AugAssign
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, str):
+            return ast.copy_location(ast.Constant(pack_label(node.value)), node)
+        # endif
+        return node
+    # end def visit_Constant
+# end class _PackedLabels
+
+def _compile_rules():
+    # numba versions of the scalar rules, compiled from the source of koeppen_geiger
+    import numba
+
+    import koeppen_geiger as KG
+
+    namespace = {"_f32": np.float32, "_cat": numba.njit(nogil=True)(_cat)}
+    for name in _RULES:
+        try:
+            tree = ast.parse(inspect.getsource(getattr(KG, name)))
+            tree = _Float32Constants().visit(tree)
+            tree = ast.fix_missing_locations(_PackedLabels(_RULES).visit(tree))
+            exec(compile(tree, "<kg_jit %s>" % name, "exec"), namespace)
+        except Exception as error:
+            raise RuntimeError("Cannot rewrite %s of koeppen_geiger for numba, use the numpy backend" % name) from error
+        # end try
+        namespace[name] = numba.njit(nogil=True)(namespace[name])
+    # end for
+    return namespace
+# end def _compile_rules
+
+# Threshold values of the scalar classifiers, per predictor row of ARGS
+_EDGES = {
+    0: (18.0, -3.0, -38.0, -10.0, 0.0, 14.0, 16.0),           # T_min
+    1: (10.0, 0.0, 22.0, 30.0, 5.0, 13.0, 16.0),              # T_max
+    3: (18.0, 12.0, 22.0, -2.0, 5.0, -9.0),                   # T_ann
+    4: (60.0, 70.0, 30.0, 50.0, 0.0),                         # P_min
+    5: (2800.0, 3700.0, 2000.0, 1400.0, 2200.0, 600.0, 1000.0, 500.0, 0.0),  # P_ann
+    6: (60.0, 40.0, 30.0, 0.0),                               # P_smin
+    7: (590.0, 60.0),                                         # P_smax
+    8: (60.0, 40.0, 0.0),                                     # P_wmin
+    9: (110.0, 230.0, 170.0),                                 # P_wmax
+    10: (0.0, 20.0, 50.0),                                    # P_th
+}
+
+def edge_predictors(n, seed=0):
+    """
+    float32 predictor block ARGS (13, n) of random values, a third of each row set
+    exactly on a threshold of the scalar classifiers, and some cells on the
+    thresholds relating two predictors (P_ann = 10*P_th, 5*P_th, 25*(100-P_min),
+    P_wmax = 3*P_smin, P_smax = 10*P_wmin, P_smin = P_wmin, ...).
+    """
+    rng = np.random.default_rng(seed)
+    ARGS = np.empty((13, n), dtype=np.float32)
+    ARGS[0] = rng.uniform(-50.0, 35.0, n)
+    ARGS[1] = ARGS[0] + rng.uniform(0.0, 50.0, n)
+    ARGS[2] = rng.integers(0, 13, n)
+    ARGS[3] = (ARGS[0] + ARGS[1]) / 2
+    ARGS[4] = rng.uniform(0.0, 150.0, n)
+    ARGS[5] = rng.uniform(0.0, 5000.0, n)
+    ARGS[6] = rng.uniform(0.0, 300.0, n)
+    ARGS[7] = ARGS[6] + rng.uniform(0.0, 700.0, n)
+    ARGS[8] = rng.uniform(0.0, 300.0, n)
+    ARGS[9] = ARGS[8] + rng.uniform(0.0, 400.0, n)
+    ARGS[10] = rng.uniform(-20.0, 80.0, n)
+    ARGS[11] = rng.uniform(0.0, 100.0, n)
+    ARGS[12] = rng.integers(0, 13, n)
+
+    for row, values in _EDGES.items():
+        sel = rng.random(n) < 0.3
+        ARGS[row, sel] = rng.choice(values, sel.sum())
+    # end for
+
+    T_ann, P_min, P_ann, P_smin, P_smax, P_wmin, P_wmax, P_th, P_wpro = ARGS[[3, 4, 5, 6, 7, 8, 9, 10, 11]]
+    relations = (
+        (5, 10 * P_th), (5, 5 * P_th), (5, 25.0 * (100.0 - P_min)),
+        (5, 10 * (2.3 * T_ann - 0.64 * P_wpro + 41)), (5, 5 * (2.3 * T_ann - 0.64 * P_wpro + 41)),
+        (9, 3.0 * P_smin), (9, 3.0 * P_min), (7, 10.0 * P_wmin), (8, P_smin),
+    )
+    for row, value in relations:
+        sel = rng.random(n) < 0.05
+        ARGS[row, sel] = value[sel]
+    # end for
+    return ARGS
+# end def edge_predictors
+
+def _check_kernel(typ_classification, kernel, table):
+    # Compiled codes against the NumPy array classifiers on threshold-edge predictors, RuntimeError if they differ
+    import koeppen_geiger as KG
+
+    ARGS = edge_predictors(_CHECK_CELLS, seed=0)
+    out = np.empty(ARGS.shape[1], dtype=np.uint8)
+    try:
+        kernel(ARGS, table[0], table[1], out)
+    except Exception as error:
+        raise RuntimeError("numba cannot compile the %s rules of koeppen_geiger, use the numpy backend"
+                           % typ_classification) from error
+    # end try
+    bad = np.count_nonzero(out != KG.get_kg_classification_Codes(ARGS, typ_classification, backend="numpy"))
+    if bad:
+        raise RuntimeError("Compiled %s rules differ from the array classifiers on %d of %d cells, use the numpy backend"
+                           % (typ_classification, bad, out.size))
+    # endif
+# end def _check_kernel
+
+def _get_kernel(typ_classification):
+    # Compiled loop over the cells for one classification type, with its sorted packed labels and codes
+    with _compile_lock:
+        if typ_classification in _compiled:
+            return _compiled[typ_classification]
+        # endif
+        import numba
+
+        import create_KG_cmap as CKG
+
+        if "rules" not in _compiled:
+            _compiled["rules"] = _compile_rules()
+        # endif
+        rules = _compiled["rules"]
+        match typ_classification:
+            case "kottek" | "peel":
+                rule = rules["get_kg_classification"]
+                vers = pack_label(typ_classification)
+            case "cannon":
+                rule = rules["get_kg_classification_Cannon"]
+                vers = None
+            case "trewartha":
+                rule = rules["get_kg_classification_Trewartha"]
+                vers = None
+            case _:
+                raise ValueError("Unknown classification type: %s" % typ_classification)
+        #end match
+
+        KG_dict = CKG.get_KG_dict(typ_classification)
+        labels = np.array(sorted(pack_label(label) for label in KG_dict), dtype=np.int64)
+        codes = np.array([KG_dict[label] for label in sorted(KG_dict, key=pack_label)], dtype=np.uint8)
+        table = (labels, codes)
+
+        @numba.njit(nogil=True, inline="always")
+        def lookup(label, labels, codes):
+            # Code of a packed label, 0 if it is not in the table
+            i_label = np.searchsorted(labels, label)
+            if i_label < labels.size and labels[i_label] == label:
+                return codes[i_label]
+            # endif
+            return np.uint8(0)
+        # enddef lookup
+
+        @numba.njit(nogil=True, inline="always")
+        def transpose_block(ARGS, first, block):
+            # Predictors of the cells first, first+1, ... as the contiguous rows of block, number of cells copied
+            n_cells = min(block.shape[0], ARGS.shape[1] - first)
+            for i_arg in range(ARGS.shape[0]):
+                for cell in range(n_cells):
+                    block[cell, i_arg] = ARGS[i_arg, first + cell]
+                # end for
+            # end for
+            return n_cells
+        # enddef transpose_block
+
+        if vers is None:
+            @numba.njit(nogil=True)
+            def kernel(ARGS, labels, codes, out):
+                block = np.empty((_BLOCK_CELLS, ARGS.shape[0]), dtype=np.float32)
+                for first in range(0, out.shape[0], _BLOCK_CELLS):
+                    for cell in range(transpose_block(ARGS, first, block)):
+                        out[first + cell] = lookup(rule(block[cell]), labels, codes)
+                    # end for
+                # end for
+            # enddef kernel
+        else:
+            @numba.njit(nogil=True)
+            def kernel(ARGS, labels, codes, out):
+                block = np.empty((_BLOCK_CELLS, ARGS.shape[0]), dtype=np.float32)
+                for first in range(0, out.shape[0], _BLOCK_CELLS):
+                    for cell in range(transpose_block(ARGS, first, block)):
+                        out[first + cell] = lookup(rule(block[cell], vers), labels, codes)
+                    # end for
+                # end for
+            # enddef kernel
+        # endif
+        _check_kernel(typ_classification, kernel, table)
+        _compiled[typ_classification] = (kernel, table)
+        return _compiled[typ_classification]
+    # end with
+# end def _get_kernel
+
+def classify_codes(arguments, typ_classification, backend=None):
+    """
+    uint8 class codes of all cells, as koeppen_geiger.get_kg_classification_Codes.
+
+    Parameters
+    ----------
+    arguments : predictors, shape (13, ...) in the order of ARGS, converted to float32
+    typ_classification : "kottek", "peel", "cannon" or "trewartha"
+    backend : "numba" for the compiled scalar rules, "numpy" for the array classifiers,
+              None for numba when it is installed and numpy otherwise.
+              The first numba call of a classification type compiles it (a few seconds).
+    """
+    import koeppen_geiger as KG
+
+    if backend is None:
+        backend = "numba" if has_numba() else "numpy"
+    # endif
+    if backend == "numpy":
+        return KG.get_kg_classification_Codes(arguments, typ_classification, backend="numpy")
+    elif backend != "numba":
+        raise ValueError("Unknown backend: %s" % backend)
+    # endif
+
+    kernel, table = _get_kernel(typ_classification)
+    shape = arguments.shape[1:]
+    ARGS = np.ascontiguousarray(np.reshape(arguments, (arguments.shape[0], -1)), dtype=np.float32)
+    out = np.empty(ARGS.shape[1], dtype=np.uint8)
+    kernel(ARGS, table[0], table[1], out)
+    return out.reshape(shape)
+# end def classify_codes
+
+# The End of All Things (op. cit.)
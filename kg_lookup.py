@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+
+"""
+Created on Sun Oct 18 14:26:13 UTC 2026
+Last modified, Sun Oct 18 15:27:43 UTC 2026
+
+@author: agent <agent@local>
+
+Point lookup of a computed class map: climate class of (lat, lon) coordinates.
+
+The grid is described by its latitude and longitude axes (cell centres, as
+lats / lons of koeppen_geiger or kg_io.open_profile). A regularly spaced
+axis is indexed by arithmetic, in O(1) per query; an irregular axis (the
+subgrid Europe profile, whose axes are read from its coordinate table) by a
+binary search over the midpoints between the centres, precomputed once.
+Queries are vectorized and fall on the nearest cell centre; queries more than
+half a cell outside the grid get code 0, as cells without class.
+
+Curvilinear grids (rotated pole, tripolar, ...) are given by 2-D latitudes and
+longitudes of the cell centres, of the shape of the map. Their centres are
+binned once on a regular grid of cubes over the unit sphere, cubes as large as
+the largest cell; a query is compared with the centres of the 27 cubes around
+it only, and falls on the nearest centre along the sphere. It is outside the
+grid when it is farther from that centre than half the distance to its most
+distant neighbouring centre.
+
+  lookup = KGLookup(KG_map, lats, lons, "kottek")
+  lookup.save("KG_kottek_lookup.npz")
+  lookup = KGLookup.load("KG_kottek_lookup.npz")
+  lookup.labels([48.85, -33.9], [2.35, 18.4])
+
+save writes the precomputed indices along with the map (midpoints of the
+irregular axes, binned centres of the curvilinear grids), that load restores
+as they are.
+"""
+
+# Changes from version 0.0 :
+# Changes from version 0.1 : Curvilinear grids, 2-D coordinates of the cell centres
+# Changes from version 0.2 : Indices of the axes or cells saved with the map, not rebuilt by load
+
+__version__ = "0.3"
+
+import numpy as np
+
+
+def _to_arrays(index, names, prefix):
+    # Attributes of an index as arrays of an .npz, under prefix
+    return {prefix + name: np.asarray(getattr(index, name)) for name in names}
+# end def _to_arrays
+
+def _from_arrays(cls, data, prefix):
+    # Index of the arrays of _to_arrays, without running __init__
+    index = object.__new__(cls)
+    for key in data.files:
+        if key.startswith(prefix):
+            value = data[key]
+            setattr(index, key[len(prefix):], value.item() if value.ndim == 0 else value)
+        # endif
+    # end for
+    return index
+# end def _from_arrays
+
+class _Axis:
+    # Index of the nearest centre along one axis, arithmetic if regular, binary search otherwise
+
+    def __init__(self, centers, periodic=None):
+        self.centers = np.asarray(centers, dtype=np.float64).reshape(-1)
+        n = self.centers.size
+        steps = np.diff(self.centers)
+        self.regular = n == 1 or np.allclose(steps, steps[0], rtol=1e-6, atol=0.0)
+        if self.regular:
+            self.start = self.centers[0]
+            self.step = steps[0] if n > 1 else 1.0
+        else:
+            if not (np.all(steps > 0) or np.all(steps < 0)):
+                raise ValueError("Axis coordinates are not monotonic")
+            # endif
+            self.order = np.argsort(self.centers)
+            centers = self.centers[self.order]
+            self.edges = (centers[1:] + centers[:-1]) / 2
+        # endif
+        # Extent of the grid: half a cell beyond the first and last centres
+        ordered = np.sort(self.centers)
+        if n > 1:
+            self.lower = ordered[0] - (ordered[1] - ordered[0]) / 2
+            self.upper = ordered[-1] + (ordered[-1] - ordered[-2]) / 2
+        else:
+            self.lower, self.upper = ordered[0] - 0.5, ordered[0] + 0.5
+        # endif
+        # Longitudes wrap around when the axis covers the globe
+        self.periodic = (self.upper - self.lower >= 360.0 - 1e-6) if periodic is None else periodic
+    # end def __init__
+
+    def to_arrays(self, prefix):
+        names = ("centers", "regular", "lower", "upper", "periodic")
+        return _to_arrays(self, names + (("start", "step") if self.regular else ("order", "edges")), prefix)
+    # end def to_arrays
+
+    def index(self, values):
+        # Indices of the nearest centres and whether values fall within the grid
+        values = np.asarray(values, dtype=np.float64)
+        if self.periodic:
+            values = (values - self.lower) % 360.0 + self.lower
+        # endif
+        inside = (values >= self.lower) & (values <= self.upper)
+        if self.regular:
+            index = np.rint((values - self.start) / self.step)
+            index = np.clip(np.nan_to_num(index), 0, self.centers.size - 1).astype(np.intp)
+        else:
+            index = self.order[np.searchsorted(self.edges, values)]
+        # endif
+        return index, inside
+    # end def index
+# end class _Axis
+
+def _to_unit_vectors(lats, lons):
+    # (..., 3) points of the unit sphere of coordinates in degrees
+    lats, lons = np.radians(lats), np.radians(lons)
+    return np.stack([np.cos(lats) * np.cos(lons), np.cos(lats) * np.sin(lons), np.sin(lats)], axis=-1)
+# end def _to_unit_vectors
+
+class _CellIndex:
+    # Nearest centre of a curvilinear grid, by a regular binning of the centres on the unit sphere
+
+    def __init__(self, lats, lons):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        points = _to_unit_vectors(self.lats, self.lons)
+        # Radius of a cell: half the largest chord to its 8 neighbours
+        radius = np.zeros(self.shape)
+        for rows, cols, rows_next, cols_next in (
+                (np.s_[:], np.s_[:-1], np.s_[:], np.s_[1:]), (np.s_[:-1], np.s_[:], np.s_[1:], np.s_[:]),
+                (np.s_[:-1], np.s_[:-1], np.s_[1:], np.s_[1:]), (np.s_[:-1], np.s_[1:], np.s_[1:], np.s_[:-1])):
+            half = np.linalg.norm(points[rows, cols] - points[rows_next, cols_next], axis=-1) / 2
+            radius[rows, cols] = np.fmax(radius[rows, cols], half)
+            radius[rows_next, cols_next] = np.fmax(radius[rows_next, cols_next], half)
+        # end for
+        valid = np.isfinite(points).all(axis=-1).reshape(-1)
+        self.points = points.reshape(-1, 3)
+        # Tolerance for queries on the boundary of a cell
+        self.radius = radius.reshape(-1) * (1 + 1e-9) + 1e-12
+        self.size = max(float(np.max(self.radius[valid], initial=0.0)), 2e-6)
+        self.n_bins = int(np.ceil(2.0 / self.size)) + 3
+        cells = np.flatnonzero(valid)
+        keys = self._get_keys(self._get_bins(self.points[cells]))
+        order = np.argsort(keys, kind="stable")
+        self.keys, self.cells = keys[order], cells[order]
+    # end def __init__
+
+    @property
+    def shape(self):
+        return self.lats.shape
+    # end def shape
+
+    def to_arrays(self, prefix):
+        return _to_arrays(self, ("lats", "lons", "points", "radius", "size", "n_bins", "keys", "cells"), prefix)
+    # end def to_arrays
+
+    def _get_bins(self, points):
+        # Cube of each point, one cube of margin on each side
+        return np.floor((points + 1.0) / self.size).astype(np.int64) + 1
+    # end def _get_bins
+
+    def _get_keys(self, bins):
+        return (bins[..., 0] * self.n_bins + bins[..., 1]) * self.n_bins + bins[..., 2]
+    # end def _get_keys
+
+    def index(self, lats, lons):
+        # Rows and columns of the nearest centres and whether the coordinates fall within the grid
+        shape = lats.shape
+        points = _to_unit_vectors(lats.reshape(-1), lons.reshape(-1))
+        finite = np.isfinite(points).all(axis=-1)
+        points[~finite] = 0.0
+        bins = self._get_bins(points)
+        nearest = np.zeros(points.shape[0], dtype=np.intp)
+        distance = np.full(points.shape[0], np.inf)
+        for offset in np.ndindex(3, 3, 3):
+            keys = self._get_keys(bins + np.array(offset) - 1)
+            first = np.searchsorted(self.keys, keys, side="left")
+            counts = np.searchsorted(self.keys, keys, side="right") - first
+            if not counts.any():
+                continue
+            # endif
+            # Candidate centres of all the queries, query by query
+            queries = np.repeat(np.arange(points.shape[0]), counts)
+            ends = np.cumsum(counts)
+            candidates = self.cells[np.arange(ends[-1]) - np.repeat(ends - counts - first, counts)]
+            chord = np.linalg.norm(points[queries] - self.points[candidates], axis=-1)
+            with_candidates = np.flatnonzero(counts)
+            closest = np.full(points.shape[0], np.inf)
+            closest[with_candidates] = np.minimum.reduceat(chord, (ends - counts)[with_candidates])
+            is_closest = chord == closest[queries]
+            # First closest candidate of each query, the queries being in order
+            closest_queries, first = np.unique(queries[is_closest], return_index=True)
+            first_closest = np.zeros(points.shape[0], dtype=np.intp)
+            first_closest[closest_queries] = candidates[is_closest][first]
+            better = closest < distance
+            nearest[better], distance[better] = first_closest[better], closest[better]
+        # end for
+        inside = finite & (distance <= self.radius[nearest])
+        rows, cols = np.unravel_index(nearest, self.shape)
+        return rows.reshape(shape), cols.reshape(shape), inside.reshape(shape)
+    # end def index
+# end class _CellIndex
+
+class KGLookup:
+    """
+    Class of coordinates looked up in a class map.
+
+    Parameters
+    ----------
+    KG_map : (ny, nx) class map, uint8 codes or masked array (masked cells have no class)
+    lats : latitudes of the rows (ny,), ascending or descending, regular or not,
+           or of the cell centres (ny, nx) of a curvilinear grid
+    lons : longitudes of the columns (nx,), in either the 0-360 or the -180-180 convention,
+           or of the cell centres (ny, nx) of a curvilinear grid
+    typ_classification : classification type of the map, for labels()
+    """
+
+    def __init__(self, KG_map, lats, lons, typ_classification=None):
+        KG_map = np.ma.filled(KG_map, 0) if np.ma.isMaskedArray(KG_map) else KG_map
+        self.KG_map = np.ascontiguousarray(KG_map, dtype=np.uint8)
+        self.typ_classification = typ_classification
+        self._labels = None
+        lats, lons = np.asarray(lats), np.asarray(lons)
+        if lats.ndim == lons.ndim == 2 and lats.shape == lons.shape == self.KG_map.shape:
+            self._cells = _CellIndex(lats, lons)
+            return
+        # endif
+        if lats.ndim != 1 or lons.ndim != 1:
+            raise ValueError("lats and lons are either the 1-D axes of the rows and columns or the 2-D coordinates "
+                             "of the cells of the class map %s, got shapes %s and %s"
+                             % (self.KG_map.shape, lats.shape, lons.shape))
+        # endif
+        if self.KG_map.shape != (lats.size, lons.size):
+            raise ValueError("Class map of shape %s for %d latitudes and %d longitudes"
+                             % (self.KG_map.shape, lats.size, lons.size))
+        # endif
+        self._cells = None
+        self._lat_axis = _Axis(lats, periodic=False)
+        self._lon_axis = _Axis(lons)
+    # end def __init__
+
+    @property
+    def lats(self):
+        return self._lat_axis.centers if self._cells is None else self._cells.lats
+    # end def lats
+
+    @property
+    def lons(self):
+        return self._lon_axis.centers if self._cells is None else self._cells.lons
+    # end def lons
+
+    def index(self, lats, lons):
+        """
+        Row and column of the cells of the coordinates, and whether they fall within the grid.
+        Longitudes are taken modulo 360.
+        """
+        lats, lons = np.broadcast_arrays(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64))
+        if self._cells is not None:
+            return self._cells.index(lats, lons)
+        # endif
+        rows, in_lat = self._lat_axis.index(lats)
+        if not self._lon_axis.periodic:
+            # Longitude the closest to the centre of the grid, modulo 360
+            centre = (self._lon_axis.lower + self._lon_axis.upper) / 2
+            lons = (lons - centre + 180.0) % 360.0 - 180.0 + centre
+        # endif
+        cols, in_lon = self._lon_axis.index(lons)
+        return rows, cols, in_lat & in_lon
+    # end def index
+
+    def lookup(self, lats, lons):
+        # uint8 codes of the coordinates, 0 outside the grid or in cells without class
+        rows, cols, inside = self.index(lats, lons)
+        return np.where(inside, self.KG_map[rows, cols], np.uint8(0))
+    # end def lookup
+
+    def labels(self, lats, lons):
+        # Labels of the coordinates, "" outside the grid or in cells without class
+        if self._labels is None:
+            import create_KG_cmap as CKG
+
+            if self.typ_classification is None:
+                raise ValueError("No classification type given for the labels")
+            # endif
+            self._labels = np.full(256, "", dtype=object)
+            for code, label in CKG.get_KG_labels(self.typ_classification).items():
+                self._labels[code] = label
+            # end for
+        # endif
+        return self._labels[self.lookup(lats, lons)]
+    # end def labels
+
+    def save(self, path):
+        # Uncompressed .npz of the map and its indices, read back by load without rebuilding them
+        if self._cells is None:
+            arrays = {**self._lat_axis.to_arrays("lat_axis."), **self._lon_axis.to_arrays("lon_axis.")}
+        else:
+            arrays = self._cells.to_arrays("cells.")
+        # endif
+        np.savez(path, KG_map=self.KG_map, typ_classification=np.array(self.typ_classification or ""), **arrays)
+    # end def save
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            typ_classification = str(data["typ_classification"]) or None
+            if "lats" in data.files:
+                # File of version 0.2, the map and its axes only
+                return cls(data["KG_map"], data["lats"], data["lons"], typ_classification=typ_classification)
+            # endif
+            lookup = object.__new__(cls)
+            lookup.KG_map = data["KG_map"]
+            lookup.typ_classification = typ_classification
+            lookup._labels = None
+            if "cells.points" in data.files:
+                lookup._cells = _from_arrays(_CellIndex, data, "cells.")
+            else:
+                lookup._cells = None
+                lookup._lat_axis = _from_arrays(_Axis, data, "lat_axis.")
+                lookup._lon_axis = _from_arrays(_Axis, data, "lon_axis.")
+            # endif
+        # end with
+        return lookup
+    # end def load
+# end class KGLookup
+
+# The End of All Things (op. cit.)
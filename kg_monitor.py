@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+"""
+Created on Sun Oct 18 14:18:59 UTC 2026
+Last modified, Sun Oct 18 15:13:34 UTC 2026
+
+@author: agent <agent@local>
+
+Instrumentation of a classification run: per-stage timers, cell and class
+counts, memory and per-tile progress, exportable as JSON.
+
+A RunMonitor is passed as monitor= to the drivers of koeppen_geiger
+(classify_grid, classify_tiled, classify_parallel) and to
+kg_cache.KGCache.classify, or set as the monitor attribute of a kg_io.NCVar.
+Stages are:
+
+  load           : reading the monthly data of a tile, unit conversion included
+  convert        : decoding and unit conversion of the netCDF data (part of load)
+  gather         : valid cells of a tile gathered into dense arrays
+  seasons        : summer half-year of the cells
+  predictors     : one-pass computation of ARGS
+  classification : predictors to class codes
+  write          : storing the codes in the output, flushing it to disk
+  plot           : map of the result
+
+Timers of the parallel driver add up the time of all the workers.
+
+Memory: process_peak_rss_bytes is the peak resident memory of the whole
+process up to the report, not of the run, so it never decreases from one run
+to the next. With trace_memory, a run also reports traced_peak_bytes, the
+peak of the memory allocated through Python and NumPy during the run only
+(tracemalloc, which slows allocations down).
+"""
+
+# Changes from version 0.0 :
+# Changes from version 0.1 : Peak RSS reported as the process peak, optional per-run tracemalloc peak
+
+__version__ = "0.2"
+
+import contextlib
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def _get_peak_rss():
+    # Peak resident memory of the process since its start in bytes, None where unknown
+    try:
+        import resource
+    except ImportError:
+        return None
+    # end try
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+# end def _get_peak_rss
+
+class RunMonitor:
+    """
+    Timers and counters of one classification run, safe to share between threads.
+
+    Parameters
+    ----------
+    name : name of the run in the reports
+    typ_classification : classification type, to report class counts by label
+    progress : reports the progress every interval seconds and at the last tile;
+               True prints to stderr, a callable receives the message, None is silent
+    interval : minimum delay between two progress reports, in seconds
+    trace_memory : also measure the peak of the memory allocated during the run with
+                   tracemalloc, from the creation of the monitor to stop()
+    """
+
+    def __init__(self, name="", typ_classification=None, progress=None, interval=10.0, trace_memory=False):
+        self.name = name
+        self.typ_classification = typ_classification
+        self.progress = progress
+        self.interval = interval
+        self.stages = {}
+        self.cells_total = 0
+        self.cells_valid = 0
+        self.class_counts = np.zeros(256, dtype=np.int64)
+        self.tiles_total = None
+        self.tiles_done = 0
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._stop = None
+        self._last_report = self._start
+        self.traced_peak = None
+        self._started_tracing = False
+        if trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            # endif
+            tracemalloc.reset_peak()
+            self._traced_start = tracemalloc.get_traced_memory()[0]
+        # endif
+        self.trace_memory = trace_memory
+    # end def __init__
+
+    def _get_traced_peak(self):
+        # Peak of the traced memory above its level at the start of the run
+        if self.traced_peak is not None or not self.trace_memory or not tracemalloc.is_tracing():
+            return self.traced_peak
+        # endif
+        return max(tracemalloc.get_traced_memory()[1] - self._traced_start, 0)
+    # end def _get_traced_peak
+
+    def stop(self):
+        # End of the run, the wall time and the traced memory of the reports stop here
+        self._stop = time.perf_counter()
+        if self.trace_memory:
+            self.traced_peak = self._get_traced_peak()
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+            # endif
+        # endif
+    # end def stop
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+        # end try
+    # end def stage
+
+    def add_time(self, name, seconds, calls=1):
+        # Time of a stage measured elsewhere
+        with self._lock:
+            total_seconds, total_calls = self.stages.get(name, (0.0, 0))
+            self.stages[name] = (total_seconds + seconds, total_calls + calls)
+        # end with
+    # end def add_time
+
+    def add_cells(self, total, valid):
+        with self._lock:
+            self.cells_total += int(total)
+            self.cells_valid += int(valid)
+        # end with
+    # end def add_cells
+
+    def add_classes(self, codes):
+        # Count the class codes of the valid cells of a tile, 0 (no class) included
+        counts = np.bincount(np.asarray(codes, dtype=np.uint8).reshape(-1), minlength=256)
+        with self._lock:
+            self.class_counts += counts
+        # end with
+    # end def add_classes
+
+    def get_counters(self):
+        # Stage timers and counts, picklable, to be merged into the monitor of the parent process
+        return dict(self.stages), self.cells_total, self.cells_valid, self.class_counts
+    # end def get_counters
+
+    def merge(self, counters):
+        stages, cells_total, cells_valid, class_counts = counters
+        for name, (seconds, calls) in stages.items():
+            self.add_time(name, seconds, calls)
+        # end for
+        with self._lock:
+            self.cells_total += cells_total
+            self.cells_valid += cells_valid
+            self.class_counts += class_counts
+        # end with
+    # end def merge
+
+    def set_tiles(self, n_tiles):
+        self.tiles_total = n_tiles
+    # end def set_tiles
+
+    def tile_done(self):
+        with self._lock:
+            self.tiles_done += 1
+            now = time.perf_counter()
+            last = self.tiles_done == self.tiles_total
+            if not self.progress or (now - self._last_report < self.interval and not last):
+                return
+            # endif
+            self._last_report = now
+            message = "%s: tile %d/%s, %d cells, %.0f cells/s" % (self.name, self.tiles_done,
+                      self.tiles_total or "?", self.cells_total, self.cells_total / (now - self._start))
+        # end with
+        if callable(self.progress):
+            self.progress(message)
+        else:
+            print(message, file=sys.stderr, flush=True)
+        # endif
+    # end def tile_done
+
+    def to_dict(self):
+        wall = (self._stop or time.perf_counter()) - self._start
+        classes = {}
+        if self.typ_classification is not None:
+            import create_KG_cmap as CKG
+
+            labels = CKG.get_KG_labels(self.typ_classification)
+            classes = {labels.get(code, str(code)): int(self.class_counts[code])
+                       for code in np.flatnonzero(self.class_counts) if code != 0}
+        # endif
+        return {
+            "name": self.name,
+            "classification": self.typ_classification,
+            "wall_seconds": wall,
+            "stages": {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.stages.items()},
+            "cells": {"total": self.cells_total, "valid": self.cells_valid,
+                      "masked": self.cells_total - self.cells_valid,
+                      "unclassified": int(self.class_counts[0])},
+            "classes": classes,
+            "tiles": self.tiles_done,
+            "cells_per_second": self.cells_total / wall if wall > 0 else None,
+            "process_peak_rss_bytes": _get_peak_rss(),
+            "traced_peak_bytes": self._get_traced_peak(),
+        }
+    # end def to_dict
+
+    def summary(self):
+        # One line per stage, for the logs
+        metrics = self.to_dict()
+        lines = ["%s: %d cells (%d valid) in %.2f s, %.0f cells/s" % (self.name, metrics["cells"]["total"],
+                 metrics["cells"]["valid"], metrics["wall_seconds"], metrics["cells_per_second"] or 0.0)]
+        for name, stage in metrics["stages"].items():
+            lines.append("  %-14s %9.3f s %8d calls" % (name, stage["seconds"], stage["calls"]))
+        # end for
+        return "\n".join(lines)
+    # end def summary
+# end class RunMonitor
+
+def save_metrics(path, monitors):
+    # JSON file of the metrics of a list of RunMonitor
+    with open(path, "w") as json_file:
+        json.dump([monitor.to_dict() for monitor in monitors], json_file, indent=1)
+    # end with
+# end def save_metrics
+
+# The End of All Things (op. cit.)
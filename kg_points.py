@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+
+"""
+Created on Sun Oct 18 14:24:48 UTC 2026
+Last modified, Sun Oct 18 15:12:06 UTC 2026
+
+@author: agent <agent@local>
+
+Classification of station / point records, streamed in batches.
+
+Each record holds a latitude and the twelve monthly temperatures (C) and
+precipitation (mm/month). Records are read in batches of batch_size records
+from CSV (parsed by pyarrow if installed, by the csv module otherwise),
+Parquet (pyarrow) or NumPy (.npy structured arrays, memory mapped), classified
+with the summer half-year of their own latitude, and the classes are appended
+to a CSV or Parquet output batch by batch, so memory follows the batch size
+and not the number of records.
+
+  python kg_points.py stations.csv -o stations_KG.parquet --schemes kottek,trewartha
+
+Record layout (names configurable): lat, tas_1 ... tas_12, prc_1 ... prc_12;
+for .npy, fields lat, tas and prc of shape (12,) work too. All other columns
+are copied to the output, followed by one label column per classification
+(empty where a record has missing months or no valid latitude).
+"""
+
+# Changes from version 0.0 :
+# Changes from version 0.1 : Batches of exactly batch_size records with pyarrow,
+#                             records without a valid latitude left unclassified
+
+__version__ = "0.2"
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+
+class PointColumns:
+    """
+    Names of the columns of the records.
+
+    Parameters
+    ----------
+    lat : latitude column
+    tas, prc : patterns of the monthly columns, formatted with the month 1 to 12
+    """
+
+    def __init__(self, lat="lat", tas="tas_%d", prc="prc_%d"):
+        self.lat = lat
+        self.tas = [tas % month for month in range(1, 13)]
+        self.prc = [prc % month for month in range(1, 13)]
+    # end def __init__
+
+    def used(self):
+        return [self.lat] + self.tas + self.prc
+    # end def used
+# end class PointColumns
+
+def _to_float(values, dtype=np.float32):
+    # Float array of a column of numbers or strings, NaN for empty or unreadable fields
+    values = np.asarray(values)
+    if values.dtype.kind not in "USO":
+        return values.astype(dtype)
+    # endif
+    values = values.astype(str)
+    values[np.char.str_len(np.char.strip(values)) == 0] = "nan"
+    try:
+        return values.astype(dtype)
+    except ValueError:
+        out = np.empty(values.size, dtype=dtype)
+        for i_value, value in enumerate(values):
+            try:
+                out[i_value] = float(value)
+            except ValueError:
+                out[i_value] = np.nan
+            # end try
+        # end for
+        return out
+    # end try
+# end def _to_float
+
+def _make_batch(columns, get_column, keep_names):
+    # Batch dictionary: lat (n,) float64 and its column name, tas and prc (12, n) float32, keep {name: column}
+    return {"lat": _to_float(get_column(columns.lat), dtype=np.float64), "lat_name": columns.lat,
+            "tas": np.stack([_to_float(get_column(name)) for name in columns.tas]),
+            "prc": np.stack([_to_float(get_column(name)) for name in columns.prc]),
+            "keep": {name: get_column(name) for name in keep_names}}
+# end def _make_batch
+
+def _get_arrow_column(table, name):
+    return table.column(name).to_numpy(zero_copy_only=False)
+# end def _get_arrow_column
+
+def _rebatch(record_batches, batch_size):
+    # pyarrow tables of exactly batch_size records from record batches of any size, the last one shorter
+    import pyarrow as pa
+
+    pending, n_pending = [], 0
+    for record_batch in record_batches:
+        pending.append(record_batch)
+        n_pending += record_batch.num_rows
+        while n_pending >= batch_size:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, batch_size)
+            rest = table.slice(batch_size)
+            pending, n_pending = rest.to_batches(), rest.num_rows
+        # end while
+    # end for
+    if n_pending:
+        yield pa.Table.from_batches(pending)
+    # endif
+# end def _rebatch
+
+def iter_csv(path, batch_size=100000, columns=None, delimiter=","):
+    """
+    Batches of batch_size records (the last one shorter) of a CSV file with a
+    header line. The streaming reader of pyarrow is used when it is installed,
+    the csv module otherwise.
+    """
+    columns = columns or PointColumns()
+    try:
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        pa_csv = None
+    # end try
+
+    if pa_csv is not None:
+        # Block size from a rough estimate of the length of a record
+        reader = pa_csv.open_csv(path, read_options=pa_csv.ReadOptions(block_size=max(batch_size * 256, 2**20)),
+                                 parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+                                 convert_options=pa_csv.ConvertOptions(
+                                     column_types=dict({name: "float32" for name in columns.tas + columns.prc},
+                                                       **{columns.lat: "float64"})))
+        names = reader.schema.names
+        missing = [name for name in columns.used() if name not in names]
+        if missing:
+            raise ValueError("Columns missing from %s: %s" % (path, ", ".join(missing)))
+        # endif
+        keep_names = [name for name in names if name not in set(columns.used())]
+        for table in _rebatch(reader, batch_size):
+            yield _make_batch(columns, lambda name: _get_arrow_column(table, name), keep_names)
+        # end for
+        return
+    # endif
+
+    with open(path, newline="") as csv_file:
+        reader = csv.reader(csv_file, delimiter=delimiter)
+        header = next(reader)
+        position = {name: i_col for i_col, name in enumerate(header)}
+        missing = [name for name in columns.used() if name not in position]
+        if missing:
+            raise ValueError("Columns missing from %s: %s" % (path, ", ".join(missing)))
+        # endif
+        keep_names = [name for name in header if name not in set(columns.used())]
+        while True:
+            rows = [row for _, row in zip(range(batch_size), reader)]
+            if not rows:
+                break
+            # endif
+            fields = list(zip(*rows))
+            yield _make_batch(columns, lambda name: fields[position[name]], keep_names)
+        # end while
+    # end with
+# end def iter_csv
+
+def iter_parquet(path, batch_size=100000, columns=None):
+    # Batches of batch_size records of a Parquet file, read by pyarrow one record batch at a time
+    import pyarrow.parquet as pq
+
+    columns = columns or PointColumns()
+    parquet_file = pq.ParquetFile(path)
+    names = parquet_file.schema_arrow.names
+    missing = [name for name in columns.used() if name not in names]
+    if missing:
+        raise ValueError("Columns missing from %s: %s" % (path, ", ".join(missing)))
+    # endif
+    keep_names = [name for name in names if name not in set(columns.used())]
+    for table in _rebatch(parquet_file.iter_batches(batch_size=batch_size), batch_size):
+        yield _make_batch(columns, lambda name: _get_arrow_column(table, name), keep_names)
+    # end for
+# end def iter_parquet
+
+def iter_arrays(records, batch_size=100000, columns=None):
+    """
+    Batches of a NumPy structured array (or memmap) of records, with either the
+    columns of PointColumns or fields lat, tas and prc of shape (12,).
+    """
+    columns = columns or PointColumns()
+    names = records.dtype.names
+    stacked = all(name in names for name in ("tas", "prc")) and records.dtype["tas"].shape == (12,)
+    used = [columns.lat, "tas", "prc"] if stacked else columns.used()
+    keep_names = [name for name in names if name not in set(used)]
+    for start in range(0, records.shape[0], batch_size):
+        chunk = records[start:start + batch_size]
+        if stacked:
+            yield {"lat": _to_float(chunk[columns.lat], dtype=np.float64), "lat_name": columns.lat,
+                   "tas": np.ascontiguousarray(chunk["tas"].T, dtype=np.float32),
+                   "prc": np.ascontiguousarray(chunk["prc"].T, dtype=np.float32),
+                   "keep": {name: np.asarray(chunk[name]) for name in keep_names}}
+        else:
+            yield _make_batch(columns, lambda name: np.asarray(chunk[name]), keep_names)
+        # endif
+    # end for
+# end def iter_arrays
+
+def iter_records(path, batch_size=100000, columns=None):
+    # Batches of a .csv, .parquet or .npy file of records
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".csv", ".txt"):
+        return iter_csv(path, batch_size=batch_size, columns=columns)
+    elif extension in (".parquet", ".pq"):
+        return iter_parquet(path, batch_size=batch_size, columns=columns)
+    elif extension == ".npy":
+        return iter_arrays(np.load(path, mmap_mode="r"), batch_size=batch_size, columns=columns)
+    # endif
+    raise ValueError("Unknown input format: %s" % path)
+# end def iter_records
+
+def classify_points(mon_TAS, mon_PRC, lats, schemes, season="hemisphere", monitor=None):
+    """
+    uint8 class codes of point records.
+
+    Parameters
+    ----------
+    mon_TAS, mon_PRC : monthly data of shape (12, n), in C and mm/month
+    lats : latitude of each record, giving its summer half-year
+    schemes : classification types
+    season : "hemisphere" (from each latitude), "north" or "dynamic", as in koeppen_geiger.get_sum_strt
+
+    Returns
+    -------
+    {typ_classification: uint8 array (n,)}, 0 for records with missing months,
+    without a finite latitude (whatever the season mode) or with no class
+    """
+    import koeppen_geiger as KG
+
+    lats = np.asarray(lats, dtype=np.float64)
+    with KG._stage(monitor, "seasons"):
+        sum_strt = KG.get_summer_start(lats).reshape(-1) if season == "hemisphere" else KG.get_sum_strt(season)
+    # end with
+    with KG._stage(monitor, "predictors"):
+        ARGS, ARGS_valid = KG.get_predictors(mon_TAS, mon_PRC, sum_strt=sum_strt)
+        ARGS_valid &= np.isfinite(lats)
+    # end with
+    codes = {}
+    for typ_classification in schemes:
+        with KG._stage(monitor, "classification"):
+            codes[typ_classification] = KG.get_kg_classification_Codes(ARGS, typ_classification)
+            codes[typ_classification][~ARGS_valid] = 0
+        # end with
+    # end for
+    if monitor is not None:
+        monitor.add_cells(ARGS_valid.size, np.count_nonzero(ARGS_valid))
+        if len(schemes) == 1:
+            monitor.add_classes(codes[schemes[0]][ARGS_valid])
+        # endif
+    # endif
+    return codes
+# end def classify_points
+
+def _get_label_table(typ_classification):
+    # Label of each code as an object array indexed by code, "" for 0
+    import create_KG_cmap as CKG
+
+    table = np.full(256, "", dtype=object)
+    for code, label in CKG.get_KG_labels(typ_classification).items():
+        table[code] = label
+    # end for
+    return table
+# end def _get_label_table
+
+class CSVPointWriter:
+    # Appends the classified records to a CSV file, batch by batch
+
+    def __init__(self, path, delimiter=","):
+        self._file = open(path, "w", newline="")
+        self._writer = csv.writer(self._file, delimiter=delimiter)
+        self._header = False
+    # end def __init__
+
+    def write(self, columns):
+        if not self._header:
+            self._writer.writerow(list(columns))
+            self._header = True
+        # endif
+        self._writer.writerows(zip(*columns.values()))
+    # end def write
+
+    def close(self):
+        self._file.close()
+    # end def close
+# end class CSVPointWriter
+
+class ParquetPointWriter:
+    # Appends the classified records to a Parquet file, one row group per batch
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+    # end def __init__
+
+    def write(self, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({name: pa.array(np.asarray(column)) for name, column in columns.items()})
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        # endif
+        self._writer.write_table(table.cast(self._writer.schema))
+    # end def write
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        # endif
+    # end def close
+# end class ParquetPointWriter
+
+def open_point_writer(path):
+    # Incremental writer of classified records, CSV or Parquet from the extension of path
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".csv", ".txt"):
+        return CSVPointWriter(path)
+    elif extension in (".parquet", ".pq"):
+        return ParquetPointWriter(path)
+    # endif
+    raise ValueError("Unknown output format: %s" % path)
+# end def open_point_writer
+
+def stream_points(batches, schemes, output, season="hemisphere", monitor=None):
+    """
+    Classify batches of records (from iter_records, iter_csv, ...) and append
+    them to output (a path, or a writer with write(columns) and close()).
+
+    The output holds the kept columns of the records, the latitude under its
+    input name and one label column per classification, named after it; a
+    ValueError is raised when an input column has the name of a classification.
+    Returns the number of records.
+    """
+    import koeppen_geiger as KG
+
+    writer = open_point_writer(output) if isinstance(output, str) else output
+    label_tables = {typ_classification: _get_label_table(typ_classification) for typ_classification in schemes}
+    n_records = 0
+    try:
+        batches = iter(batches)
+        while True:
+            with KG._stage(monitor, "load"):
+                batch = next(batches, None)
+            # end with
+            if batch is None:
+                break
+            # endif
+            codes = classify_points(batch["tas"], batch["prc"], batch["lat"], schemes, season=season, monitor=monitor)
+            columns = dict(batch["keep"])
+            columns[batch.get("lat_name", "lat")] = batch["lat"]
+            for typ_classification in schemes:
+                if typ_classification in columns:
+                    raise ValueError("Input column %s has the name of a classification, rename it"
+                                     % typ_classification)
+                # endif
+                columns[typ_classification] = label_tables[typ_classification][codes[typ_classification]]
+            # end for
+            with KG._stage(monitor, "write"):
+                writer.write(columns)
+            # end with
+            n_records += batch["lat"].size
+            if monitor is not None:
+                monitor.tile_done()
+            # endif
+        # end while
+    finally:
+        if isinstance(output, str):
+            writer.close()
+        # endif
+    # end try
+    return n_records
+# end def stream_points
+
+def main(argv=None):
+    import create_KG_cmap as CKG
+
+    parser = argparse.ArgumentParser(description="Koeppen-Geiger classifications of station / point records")
+    parser.add_argument("input", help="records, .csv, .parquet or .npy")
+    parser.add_argument("-o", "--output", required=True, help="classified records, .csv or .parquet")
+    parser.add_argument("--schemes", default="kottek", help="classification types, comma separated")
+    parser.add_argument("--batch-size", type=int, default=100000, help="records classified together")
+    parser.add_argument("--season", default="hemisphere", choices=["hemisphere", "north", "dynamic"],
+                        help="summer half-year from the latitude of each record, april-september, or warmest months")
+    parser.add_argument("--lat", default="lat", help="latitude column")
+    parser.add_argument("--tas", default="tas_%d", help="pattern of the temperature columns, with the month 1-12")
+    parser.add_argument("--prc", default="prc_%d", help="pattern of the precipitation columns, with the month 1-12")
+    parser.add_argument("--progress", action="store_true", help="report the progress of the batches on stderr")
+    args = parser.parse_args(argv)
+
+    schemes = [typ for typ in args.schemes.split(",") if typ]
+    for typ_classification in schemes:
+        if typ_classification not in CKG.KG_schemes:
+            parser.error("Unknown classification type: %s" % typ_classification)
+        # endif
+    # end for
+
+    import kg_monitor
+
+    monitor = kg_monitor.RunMonitor(os.path.basename(args.input), progress=args.progress or None)
+    batches = iter_records(args.input, batch_size=args.batch_size,
+                           columns=PointColumns(lat=args.lat, tas=args.tas, prc=args.prc))
+    stream_points(batches, schemes, args.output, season=args.season, monitor=monitor)
+    monitor.stop()
+    print(monitor.summary())
+    return 0
+# end def main
+
+if __name__ == "__main__":
+    sys.exit(main())
+# endif
+
+# The End of All Things (op. cit.)
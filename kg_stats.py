@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+
+"""
+Created on Sun Oct 18 14:27:03 UTC 2026
+Last modified, Sun Oct 18 15:00:39 UTC 2026
+
+@author: agent <agent@local>
+
+Statistics of class maps: transitions between two maps or along a stack of
+maps, and area of each class per region.
+
+Maps are (ny, nx) uint8 codes (masked arrays are filled with 0). Code 0, no
+class (ocean, missing data), is kept as row and column 0 of the matrices, so
+that cells gaining or losing a class (changes of the land-sea mask between a
+pre-industrial and a 6k map, for instance) are counted as well. A matrix of a
+classification type is then (N+1, N+1) for its N classes, element [a, b]
+counting the cells of class a in the first map and b in the second.
+All counts come from a single bincount over the paired codes a * (N+1) + b,
+weighted by cos(latitude) to get relative areas when lats are given.
+
+ZonalStats gives the area of each class in each region of a label raster of
+the same grid (countries, basins), in km2: the region of the cells and their
+area are computed once, each class map then costs a single weighted bincount.
+"""
+
+# Changes from version 0.0 :
+# Changes from version 0.1 : Area of the classes per region (ZonalStats)
+
+__version__ = "0.2"
+
+import numpy as np
+
+
+def get_n_codes(typ_classification=None):
+    # Number of codes of a classification type, 0 (no class) included, 256 for any uint8 code
+    if typ_classification is None:
+        return 256
+    # endif
+    import create_KG_cmap as CKG
+
+    return max(CKG.get_KG_dict(typ_classification).values()) + 1
+# end def get_n_codes
+
+def _get_codes(KG_map):
+    # Flat uint8 codes of a class map, 0 in the masked cells
+    KG_map = np.ma.filled(KG_map, 0) if np.ma.isMaskedArray(KG_map) else np.asarray(KG_map)
+    return KG_map.astype(np.uint8, copy=False).reshape(-1)
+# end def _get_codes
+
+def get_lat_weights(lats, shape):
+    # Flat cos(latitude) weights of the cells of a (ny, nx) grid
+    weights = np.cos(np.deg2rad(np.asarray(lats, dtype=np.float64))).reshape(-1, 1)
+    return np.broadcast_to(weights, shape).reshape(-1)
+# end def get_lat_weights
+
+def _get_transitions(codes_from, codes_to, n_codes, weights):
+    if codes_from.size != codes_to.size:
+        raise ValueError("Class maps of %d and %d cells" % (codes_from.size, codes_to.size))
+    # endif
+    if max(codes_from.max(initial=0), codes_to.max(initial=0)) >= n_codes:
+        raise ValueError("Class codes beyond the %d codes of the classification" % n_codes)
+    # endif
+    pairs = codes_from.astype(np.intp) * n_codes + codes_to
+    return np.bincount(pairs, weights=weights, minlength=n_codes * n_codes).reshape(n_codes, n_codes)
+# end def _get_transitions
+
+def transition_matrix(KG_from, KG_to, typ_classification=None, lats=None):
+    """
+    Transitions between two class maps of the same grid.
+
+    Parameters
+    ----------
+    KG_from, KG_to : (ny, nx) class maps
+    typ_classification : classification type of the maps, sets the size of the matrix
+    lats : latitudes of the rows, to weight the cells by cos(latitude)
+
+    Returns
+    -------
+    (N+1, N+1) matrix, [a, b] the number of cells (int64) or their cos(latitude) weighted
+    area (float64) going from code a to code b, 256 x 256 without typ_classification
+    """
+    n_codes = get_n_codes(typ_classification)
+    weights = None if lats is None else get_lat_weights(lats, np.shape(KG_from))
+    return _get_transitions(_get_codes(KG_from), _get_codes(KG_to), n_codes, weights)
+# end def transition_matrix
+
+def changed_cells(KG_from, KG_to):
+    # (ny, nx) mask of the cells whose code differs between two class maps
+    return (_get_codes(KG_from) != _get_codes(KG_to)).reshape(np.shape(KG_from))
+# end def changed_cells
+
+def transition_series(KG_stack, typ_classification=None, lats=None, pairs=None):
+    """
+    Transitions along a stack of class maps, such as the windows of koeppen_geiger.classify_windows.
+
+    Parameters
+    ----------
+    KG_stack : (windows, ny, nx) class maps, or anything returning (ny, nx) maps
+               when indexed by window (zarr or NetCDF stack from kg_io.open_KG_output)
+    typ_classification, lats : as in transition_matrix
+    pairs : list of (window_from, window_to), consecutive windows (i, i+1) by default
+
+    Returns
+    -------
+    (len(pairs), N+1, N+1) transition matrices, each map read once for consecutive pairs
+    """
+    if pairs is None:
+        pairs = [(window, window + 1) for window in range(len(KG_stack) - 1)]
+    # endif
+    n_codes = get_n_codes(typ_classification)
+    weights = None if lats is None else get_lat_weights(lats, np.shape(KG_stack)[1:])
+    out = np.zeros((len(pairs), n_codes, n_codes), dtype=np.int64 if weights is None else np.float64)
+    maps = {}
+    for i_pair, (window_from, window_to) in enumerate(pairs):
+        # Only the maps of the current pair are kept
+        maps = {window: maps[window] if window in maps else _get_codes(KG_stack[window])
+                for window in (window_from, window_to)}
+        out[i_pair] = _get_transitions(maps[window_from], maps[window_to], n_codes, weights)
+    # end for
+    return out
+# end def transition_series
+
+def get_transition_labels(matrix, typ_classification):
+    # Non-zero transitions of a matrix by label, {("Cfb", "Cfa"): count}, "" for no class
+    import create_KG_cmap as CKG
+
+    labels = CKG.get_KG_labels(typ_classification)
+    return {(labels.get(code_from, ""), labels.get(code_to, "")): matrix[code_from, code_to].item()
+            for code_from, code_to in zip(*np.nonzero(matrix))}
+# end def get_transition_labels
+
+EARTH_RADIUS = 6371.0088  # mean radius, km
+
+def _get_edges(centers):
+    # Edges of the cells of an axis, half-way between the centres
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1)
+    if centers.size == 1:
+        return np.array([centers[0] - 0.5, centers[0] + 0.5])
+    # endif
+    middles = (centers[1:] + centers[:-1]) / 2
+    return np.concatenate(([2 * centers[0] - middles[0]], middles, [2 * centers[-1] - middles[-1]]))
+# end def _get_edges
+
+def get_cell_areas(lats, lons, radius=EARTH_RADIUS):
+    """
+    Areas of the cells of a lat / lon grid on the sphere, in km2 for the default radius.
+    Cells extend half-way to their neighbours, the first and last ones symmetrically,
+    latitudes being clipped to the poles. Returns a (ny, nx) float64 array.
+    """
+    sin_edges = np.sin(np.deg2rad(np.clip(_get_edges(lats), -90.0, 90.0)))
+    lon_widths = np.deg2rad(np.abs(np.diff(_get_edges(lons))))
+    return radius ** 2 * np.abs(np.diff(sin_edges))[:, None] * lon_widths[None, :]
+# end def get_cell_areas
+
+def rasterize_regions(shapes, lats, lons):
+    """
+    Label raster of polygons on a regular lat / lon grid, as read from a shapefile or GeoJSON.
+
+    shapes are (geometry, region) pairs, GeoJSON-like geometries in lat / lon and integer
+    regions; cells are labelled by the polygon covering their centre, -1 outside all.
+    Needs rasterio.
+    """
+    from rasterio.features import rasterize
+    from rasterio.transform import from_origin
+
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    # Same georeferencing as kg_io.KGGeoTIFF, rows from north to south
+    dlat = abs(lats[-1] - lats[0]) / max(lats.size - 1, 1)
+    dlon = abs(lons[-1] - lons[0]) / max(lons.size - 1, 1)
+    transform = from_origin(float(lons.min() - dlon / 2), float(lats.max() + dlat / 2), float(dlon), float(dlat))
+    regions = rasterize(shapes, out_shape=(lats.size, lons.size), transform=transform, fill=-1, dtype="int32")
+    if lats.size > 1 and lats[1] > lats[0]:
+        regions = regions[::-1]
+    # endif
+    return regions
+# end def rasterize_regions
+
+class ZonalStats:
+    """
+    Area of each class per region, for any number of class maps of one grid.
+
+    Parameters
+    ----------
+    regions : (ny, nx) integer label raster, regions 0 to n_regions-1, cells
+              outside all regions negative or masked
+    lats, lons : axes of the grid, for the cell areas
+    typ_classification : classification type of the maps, sets the number of codes
+    region_names : names of the regions, for to_dict
+    cell_areas : (ny, nx) areas of the cells, computed from lats / lons by default
+    """
+
+    def __init__(self, regions, lats, lons, typ_classification=None, region_names=None, cell_areas=None):
+        regions = np.ma.filled(regions, -1) if np.ma.isMaskedArray(regions) else np.asarray(regions)
+        if regions.shape != (np.size(lats), np.size(lons)):
+            raise ValueError("Region raster of shape %s for %d latitudes and %d longitudes"
+                             % (regions.shape, np.size(lats), np.size(lons)))
+        # endif
+        self.shape = regions.shape
+        self.typ_classification = typ_classification
+        self.n_codes = get_n_codes(typ_classification)
+        regions = regions.reshape(-1).astype(np.intp)
+        self.n_regions = int(regions.max(initial=-1)) + 1
+        self.region_names = region_names
+        if cell_areas is None:
+            cell_areas = get_cell_areas(lats, lons)
+        # endif
+        # Cached: cells of the regions, their key base region * n_codes and their area
+        self._index = np.flatnonzero(regions >= 0)
+        if self._index.size == regions.size:
+            self._index = None
+            self._base = regions * self.n_codes
+            self._areas = np.asarray(cell_areas, dtype=np.float64).reshape(-1)
+        else:
+            self._base = regions[self._index] * self.n_codes
+            self._areas = np.asarray(cell_areas, dtype=np.float64).reshape(-1)[self._index]
+        # endif
+    # end def __init__
+
+    def areas(self, KG_map):
+        # (n_regions, n_codes) area of each code in each region, column 0 for the cells without class
+        codes = _get_codes(KG_map)
+        if codes.size != self.shape[0] * self.shape[1]:
+            raise ValueError("Class map of %d cells for a grid of shape %s" % (codes.size, self.shape))
+        # endif
+        if self._index is not None:
+            codes = codes[self._index]
+        # endif
+        if codes.max(initial=0) >= self.n_codes:
+            raise ValueError("Class codes beyond the %d codes of the classification" % self.n_codes)
+        # endif
+        keys = self._base + codes
+        n_keys = self.n_regions * self.n_codes
+        return np.bincount(keys, weights=self._areas, minlength=n_keys).reshape(self.n_regions, self.n_codes)
+    # end def areas
+
+    def fractions(self, KG_map):
+        # (n_regions, n_codes) fraction of the classified area of each region, 0 in column 0, NaN without land
+        areas = self.areas(KG_map)
+        areas[:, 0] = 0.0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return areas / areas.sum(axis=1, keepdims=True)
+        # end with
+    # end def fractions
+
+    def to_dict(self, KG_map, fractions=True):
+        # {region: {label: fraction or area}} of the classes present in each region
+        import create_KG_cmap as CKG
+
+        if self.typ_classification is None:
+            raise ValueError("No classification type given for the labels")
+        # endif
+        labels = CKG.get_KG_labels(self.typ_classification)
+        values = self.fractions(KG_map) if fractions else self.areas(KG_map)
+        names = self.region_names if self.region_names is not None else range(self.n_regions)
+        return {name: {labels[code]: float(values[region, code]) for code in np.flatnonzero(values[region] > 0)
+                       if code in labels}
+                for region, name in enumerate(names)}
+    # end def to_dict
+
+    def save(self, path):
+        # Uncompressed .npz of the cached region index and cell areas, read back by load
+        regions = np.full(self.shape[0] * self.shape[1], -1, dtype=np.int32)
+        areas = np.zeros(regions.size, dtype=np.float64)
+        index = slice(None) if self._index is None else self._index
+        regions[index] = self._base // self.n_codes
+        areas[index] = self._areas
+        np.savez(path, regions=regions.reshape(self.shape), cell_areas=areas.reshape(self.shape),
+                 typ_classification=np.array(self.typ_classification or ""),
+                 region_names=np.array(self.region_names if self.region_names is not None else [], dtype=str))
+    # end def save
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            regions = data["regions"]
+            region_names = [str(name) for name in data["region_names"]] or None
+            typ_classification = str(data["typ_classification"]) or None
+            return cls(regions, np.zeros(regions.shape[0]), np.zeros(regions.shape[1]), typ_classification,
+                       region_names=region_names, cell_areas=data["cell_areas"])
+        # end with
+    # end def load
+# end class ZonalStats
+
+# The End of All Things (op. cit.)
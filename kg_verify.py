@@ -0,0 +1,573 @@
+# -*- coding: utf-8 -*-
+
+"""
+Created on Sun Oct 18 14:16:23 UTC 2026
+Last modified, Sun Oct 18 15:26:20 UTC 2026
+
+@author: agent <agent@local>
+
+Verification checks of the classification library, run on every change:
+
+  python kg_verify.py
+  python kg_verify.py --full
+  python kg_verify.py --cells 1000000 --grid 720x1440 --seed 3
+
+The default run samples smaller inputs and takes seconds; --full is the whole
+sweep (200000 predictor cells, a 360x720 grid, a pool of 20000 climates),
+about a minute and a half on one core.
+
+Checks the import cost of the core and the one-pass predictors against the
+masked-array statistics of the original script, then the equivalence of the
+array classifiers, of the compiled rules of kg_jit (if numba is installed) and
+of all the grid engines with the scalar reference functions
+(get_kg_classification, get_kg_classification_Cannon and
+get_kg_classification_Trewartha) on random and threshold-edge inputs.
+The cells of all the engine grids of a run are drawn from one pool of distinct
+climates. The scalar functions are evaluated once per distinct predictor column
+for the whole run (ScalarReference) and looked up for every engine and classifier.
+The scalar functions round as the array classifiers on float32 predictors with
+NumPy >= 2 only (kg_jit.FLOAT32_SCALARS), the classifier checks fail otherwise.
+Exits with a non-zero status if any check fails.
+"""
+
+# Changes from version 0.0 :
+# Changes from version 0.1 : Differential equivalence with the scalar classifiers
+# Changes from version 0.2 : Compiled rules of kg_jit checked too
+# Changes from version 0.3 : Predictors against the masked-array statistics, windows with several strides,
+#                             distinct ensemble members, dynamic summer, grids drawn from a pool of climates
+# Changes from version 0.4 : Float32 rounding of the scalar functions checked, compiled rules against the array ones
+# Changes from version 0.5 : Scalar codes looked up for the whole run, one pool of climates, tiles sized to the grid
+
+__version__ = "0.6"
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import numpy.ma as ma
+
+from kg_jit import edge_predictors
+
+# Cold import of the classification core, in seconds, NumPy included
+IMPORT_BUDGET = 0.5
+
+# Modules the classification core must not pull in at import time
+HEAVY_MODULES = ("matplotlib", "cartopy", "netCDF4", "progressbar", "lcm_utils", "concurrent.futures")
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure_import(module="koeppen_geiger", repeat=3):
+    """
+    Cold import time of module in fresh interpreters (best of repeat) and the
+    heavy modules it loaded.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [here, env.get("PYTHONPATH")]))
+    best = None
+    for _ in range(repeat):
+        probe = subprocess.run([sys.executable, "-c", _IMPORT_PROBE.format(module=module)], cwd=here, env=env,
+                               capture_output=True, text=True, check=True)
+        result = json.loads(probe.stdout.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+        # endif
+    # end for
+    loaded = [name for name in HEAVY_MODULES if name in best["modules"]]
+    return best["seconds"], loaded
+# end def measure_import
+
+def check_import(module="koeppen_geiger", budget=IMPORT_BUDGET):
+    # True if module imports within budget seconds without loading any heavy module
+    seconds, loaded = measure_import(module)
+    print("import %s: %.3f s (budget %.3f s)%s" % (module, seconds, budget,
+          ", loaded " + ", ".join(loaded) if loaded else ""))
+    return seconds <= budget and not loaded
+# end def check_import
+
+# Monthly values hitting the thresholds once turned into predictors
+_MONTH_EDGES = {
+    "tas": (18.0, -3.0, -38.0, -10.0, 0.0, 10.0, 22.0, 14.0, 16.0, 30.0, 5.0, 13.0),
+    "prc": (60.0, 30.0, 40.0, 70.0, 50.0, 0.0, 590.0, 110.0, 230.0, 170.0),
+}
+
+def _get_scalar_reference(typ_classification):
+    import koeppen_geiger as KG
+
+    match typ_classification:
+        case "kottek" | "peel":
+            return lambda arguments: KG.get_kg_classification(arguments, vers=typ_classification)
+        case "cannon":
+            return KG.get_kg_classification_Cannon
+        case "trewartha":
+            return KG.get_kg_classification_Trewartha
+    #end match
+    raise ValueError("Unknown classification type: %s" % typ_classification)
+# end def _get_scalar_reference
+
+def _edge_climates(n, rng):
+    # float64 monthly stacks (12, n) of random climates, some months on thresholds
+    shape = (12, n)
+    mean = rng.uniform(-45.0, 30.0, n)
+    mon_TAS = mean + rng.uniform(0.0, 25.0, n) * rng.uniform(-1.0, 1.0, shape)
+    mon_PRC = rng.uniform(0.0, 1.0, shape) ** 2 * rng.uniform(0.0, 700.0, n)
+    for mon_var, name in ((mon_TAS, "tas"), (mon_PRC, "prc")):
+        sel = rng.random(shape) < 0.2
+        mon_var[sel] = rng.choice(_MONTH_EDGES[name], sel.sum())
+    # end for
+    # On a 1/1024 grid: sums over months or years are exact in float32 and float64 alike
+    return np.round(mon_TAS * 1024.0) / 1024.0, np.round(mon_PRC * 1024.0) / 1024.0
+# end def _edge_climates
+
+def _set_missing(mon_var, rng, rate=0.002):
+    mon_var[rng.random(mon_var.shape) < rate] = np.nan
+    return mon_var
+# end def _set_missing
+
+def edge_pool(n, seed=0):
+    # n distinct climates, float64 monthly stacks (12, n), to draw the cells of several grids from
+    return _edge_climates(n, np.random.default_rng(seed))
+# end def edge_pool
+
+def _get_pool(pool, rng):
+    # Climates of pool, drawn here if pool is a number of climates
+    return _edge_climates(pool, rng) if isinstance(pool, (int, np.integer)) else pool
+# end def _get_pool
+
+def edge_climatology(ny, nx, seed=0, pool=None):
+    """
+    float32 monthly stacks (12, ny, nx) of random values, some months on thresholds, a few missing.
+
+    With pool, a number of climates or the climates of edge_pool, the cells are drawn
+    from pool distinct climates, so a grid has at most that many distinct predictor
+    columns per summer start (missing months aside).
+    """
+    rng = np.random.default_rng(seed)
+    if pool is None:
+        climates = _edge_climates(ny * nx, rng)
+    else:
+        climates = _get_pool(pool, rng)
+        cells = rng.integers(0, climates[0].shape[1], ny * nx)
+        climates = [climate[:, cells] for climate in climates]
+    # endif
+    return tuple(_set_missing(climate.reshape(12, ny, nx).astype(np.float32), rng) for climate in climates)
+# end def edge_climatology
+
+def edge_years(years, ny, nx, seed=0, pool=None):
+    """
+    float32 monthly stacks (years, 12, ny, nx): climates as in edge_climatology, each
+    year shifted by a multiple of 1/4 (C, or mm/month times 4), a few values missing.
+    """
+    rng = np.random.default_rng(seed)
+    mon_TAS, mon_PRC = _edge_climates(ny * nx, rng) if pool is None else _get_pool(pool, rng)
+    n_climates = mon_TAS.shape[1]
+    cells = np.arange(ny * nx) if pool is None else rng.integers(0, n_climates, ny * nx)
+    # Half of the years keep the climate unchanged, so window means stay on the thresholds
+    shifts = rng.choice((0.0, 0.0, 0.0, 0.25, -0.5, 1.5), (years, 1, n_climates))
+    years_TAS = (mon_TAS + shifts)[..., cells]
+    years_PRC = np.maximum(mon_PRC + 4.0 * shifts, 0.0)[..., cells]
+    return tuple(_set_missing(var.reshape(years, 12, ny, nx).astype(np.float32), rng, rate=0.0005)
+                 for var in (years_TAS, years_PRC))
+# end def edge_years
+
+def baseline_predictors(mon_TAS, mon_PRC, sum_strt=3):
+    """
+    Masked float64 predictor block (13, n) of monthly stacks (12, n), rows as in
+    koeppen_geiger.ARGS_names, from the masked-array statistics of the original
+    script (up to version 0.80): each statistic over the months present, the summer
+    half-year being the six months from sum_strt (an integer or one value per cell).
+    """
+    mon_TAS = ma.masked_invalid(np.asarray(mon_TAS, dtype=np.float64))
+    mon_PRC = ma.masked_invalid(np.asarray(mon_PRC, dtype=np.float64))
+    summer = (np.arange(12)[:, np.newaxis] - np.asarray(sum_strt)) % 12 < 6
+    summer = np.broadcast_to(summer, mon_PRC.shape)
+    summer_PRC = ma.masked_where(~summer, mon_PRC)
+    winter_PRC = ma.masked_where(summer, mon_PRC)
+
+    T_ann = ma.mean(mon_TAS, axis=0)
+    P_ann = ma.sum(mon_PRC, axis=0)
+    P_wpro = ma.sum(winter_PRC, axis=0) / P_ann
+    P_spro = ma.sum(summer_PRC, axis=0) / P_ann
+    var_1 = ma.where(P_wpro >= 2. / 3., 2. * T_ann, 0.0)
+    var_2 = ma.where(P_spro >= 2. / 3., 2. * T_ann + 28.0, 0.0)
+    P_th = ma.where((var_1 + var_2) <= 0.0, 2 * T_ann + 14.0, var_1 + var_2)
+    return ma.stack([
+        ma.min(mon_TAS, axis=0), ma.max(mon_TAS, axis=0),
+        ma.sum(ma.getmaskarray(ma.masked_greater_equal(mon_TAS, 10.0)), axis=0), T_ann,
+        ma.min(mon_PRC, axis=0), P_ann,
+        ma.min(summer_PRC, axis=0), ma.max(summer_PRC, axis=0), ma.min(winter_PRC, axis=0), ma.max(winter_PRC, axis=0),
+        P_th, P_wpro, ma.sum(ma.getmaskarray(ma.masked_less_equal(mon_PRC, 60.0)), axis=0),
+    ])
+# end def baseline_predictors
+
+def summer_start_reference(mon_TAS):
+    # Start of the warmest six consecutive months of each cell from the twelve direct 6-month sums, earliest of ties
+    months = np.arange(6)
+    sums = [np.sum(mon_TAS[(start + months) % 12], axis=0, dtype=np.float64) for start in range(12)]
+    return np.argmax(sums, axis=0)
+# end def summer_start_reference
+
+def _hash_columns(bits):
+    # uint64 key of each row of bits (n, 13), equal rows having equal keys
+    keys = np.zeros(bits.shape[0], dtype=np.uint64)
+    for column in bits.T:
+        keys = keys * np.uint64(0x9E3779B97F4A7C15) + column
+        keys ^= keys >> np.uint64(29)
+    # end for
+    return keys
+# end def _hash_columns
+
+class ScalarReference:
+    """
+    uint8 codes of the scalar reference function of a classification type.
+
+    Each distinct predictor column is evaluated once by the scalar function and
+    kept in a table sorted by a hash of its bits; the columns of later calls are
+    looked up in the table, so a run evaluates the scalar function once per
+    distinct column of all its checks. Columns sharing a key with a different
+    column are evaluated directly.
+    """
+
+    def __init__(self, typ_classification):
+        import create_KG_cmap as CKG
+
+        self.typ_classification = typ_classification
+        self._KG_dict = CKG.get_KG_dict(typ_classification)
+        self._function = _get_scalar_reference(typ_classification)
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._bits = np.empty((0, 13), dtype=np.uint32)
+        self._codes = np.empty(0, dtype=np.uint8)
+        self.evaluated = 0
+    # end def __init__
+
+    def _evaluate(self, cells):
+        self.evaluated += len(cells)
+        return np.array([self._KG_dict.get(self._function(arguments), 0) for arguments in cells], dtype=np.uint8)
+    # end def _evaluate
+
+    def codes(self, ARGS):
+        # Codes of the columns of ARGS (13, n)
+        cells = np.ascontiguousarray(ARGS.T, dtype=np.float32)
+        bits = cells.view(np.uint32)
+        keys = _hash_columns(bits)
+        slots = np.minimum(np.searchsorted(self._keys, keys), max(self._keys.size - 1, 0))
+        new = np.ones(keys.size, dtype=bool) if self._keys.size == 0 else self._keys[slots] != keys
+        if new.any():
+            new_keys, first = np.unique(keys[new], return_index=True)
+            new_cells = np.flatnonzero(new)[first]
+            keys_all = np.concatenate((self._keys, new_keys))
+            order = np.argsort(keys_all, kind="stable")
+            self._keys = keys_all[order]
+            self._bits = np.concatenate((self._bits, bits[new_cells]))[order]
+            self._codes = np.concatenate((self._codes, self._evaluate(cells[new_cells])))[order]
+            slots = np.searchsorted(self._keys, keys)
+        # endif
+        codes = self._codes[slots]
+        collided = np.flatnonzero((self._bits[slots] != bits).any(axis=1))
+        codes[collided] = self._evaluate(cells[collided])
+        return codes
+    # end def codes
+# end class ScalarReference
+
+def scalar_codes(ARGS, typ_classification):
+    # uint8 codes of the scalar reference function on each cell of ARGS (13, n), each distinct cell evaluated once
+    return ScalarReference(typ_classification).codes(ARGS)
+# end def scalar_codes
+
+def reference_codes(mon_TAS, mon_PRC, reference, sum_strt=3):
+    """
+    uint8 codes of the scalar reference function on the cells of monthly stacks
+    (12, ...), 0 where a month is missing, and the predictor block ARGS (13, cells)
+    they come from. reference is a ScalarReference or a classification type,
+    sum_strt an integer or one value per cell.
+    """
+    import koeppen_geiger as KG
+
+    if isinstance(reference, str):
+        reference = ScalarReference(reference)
+    # endif
+    ARGS, valid = KG.get_predictors(mon_TAS.reshape(12, -1), mon_PRC.reshape(12, -1), sum_strt=sum_strt)
+    codes = np.zeros(valid.size, dtype=np.uint8)
+    codes[valid] = reference.codes(ARGS[:, valid])
+    return codes, ARGS
+# end def reference_codes
+
+def report_disagreements(name, typ_classification, ARGS, expected, got, limit=10):
+    # Print the cells where got differs from expected with their predictors, True if there are none
+    import create_KG_cmap as CKG
+    import koeppen_geiger as KG
+
+    labels = CKG.get_KG_labels(typ_classification)
+    bad = np.flatnonzero(expected != got)
+    if bad.size == 0:
+        return True
+    # endif
+    print("%s %s: %d disagreeing cells out of %d" % (name, typ_classification, bad.size, expected.size))
+    for cell in bad[:limit]:
+        inputs = " ".join("%s=%r" % (arg, float(ARGS[i_arg, cell])) for i_arg, arg in enumerate(KG.ARGS_names))
+        print("  cell %d: scalar %s, got %s, %s" % (cell, labels.get(int(expected[cell]), "-"),
+                                                    labels.get(int(got[cell]), "-"), inputs))
+    # end for
+    return False
+# end def report_disagreements
+
+def check_predictors(n=200000, seed=0):
+    """
+    One-pass predictors of get_predictors against baseline_predictors on the cells
+    with all their months, for summers starting in april, in october and per cell.
+    P_th is not compared where a seasonal fraction is within 1e-6 of 2/3.
+    """
+    import koeppen_geiger as KG
+
+    start = time.perf_counter()
+    mon_TAS, mon_PRC = (var.reshape(12, n) for var in edge_climatology(1, n, seed=seed))
+    complete = np.isfinite(mon_TAS).all(axis=0) & np.isfinite(mon_PRC).all(axis=0)
+    ok = True
+    for sum_strt in (3, 9, np.random.default_rng(seed).integers(0, 12, n)):
+        ARGS, valid = KG.get_predictors(mon_TAS, mon_PRC, sum_strt=sum_strt)
+        reference = baseline_predictors(mon_TAS, mon_PRC, sum_strt=sum_strt)
+        season = sum_strt if np.ndim(sum_strt) == 0 else "per cell"
+        if not np.array_equal(valid, complete):
+            print("predictors, summer %s: %d cells valid without all their months" % (season, (valid != complete).sum()))
+            ok = False
+        # endif
+        P_wpro = reference[KG.ARGS_names.index("P_wpro")]
+        on_edge = (abs(P_wpro - 2. / 3.) < 1e-6) | (abs(P_wpro - 1. / 3.) < 1e-6)
+        for i_arg, arg in enumerate(KG.ARGS_names):
+            cells = complete & ~ma.getmaskarray(reference[i_arg])
+            if arg == "P_th":
+                cells &= ~ma.filled(on_edge, True)
+            # endif
+            bad = ~np.isclose(ARGS[i_arg, cells], reference[i_arg].data[cells], rtol=1e-5, atol=1e-3)
+            if bad.any():
+                print("predictors, summer %s: %s differs on %d cells, first %r instead of %r" % (season, arg,
+                      bad.sum(), float(ARGS[i_arg, cells][bad][0]), float(reference[i_arg].data[cells][bad][0])))
+                ok = False
+            # endif
+        # end for
+    # end for
+    elapsed = time.perf_counter() - start
+    print("predictors: %d cells, 3 summers, %.0f cells/s%s" % (n, 3 * n / elapsed, "" if ok else ", FAILED"))
+    return ok
+# end def check_predictors
+
+def check_classifiers(typ_classification, n=200000, seed=0, reference=None):
+    """
+    Array classifiers, and the compiled rules if numba is installed, against the
+    scalar function, and the compiled rules against the array classifiers.
+    reference is the ScalarReference of the run, a new one if None.
+    """
+    import koeppen_geiger as KG
+    import kg_jit
+
+    ARGS = edge_predictors(n, seed=seed)
+    compile_time = 0.0
+    compiled = compile_ok = kg_jit.has_numba()
+    if compiled:
+        # Untimed first call, compiling the rules and checking them on the edge predictors
+        start = time.perf_counter()
+        try:
+            kg_jit.classify_codes(ARGS[:, :1], typ_classification, backend="numba")
+        except RuntimeError as error:
+            print("kg_jit.classify_codes %s: %s" % (typ_classification, error))
+            compiled = False
+        # end try
+        compile_ok = compiled
+        compile_time = time.perf_counter() - start
+    # endif
+    start = time.perf_counter()
+    reference = reference or ScalarReference(typ_classification)
+    array_codes = KG.get_kg_classification_Codes(ARGS, typ_classification, backend="numpy")
+    ok = kg_jit.FLOAT32_SCALARS
+    if ok:
+        expected = reference.codes(ARGS)
+        ok = report_disagreements("get_kg_classification_Codes", typ_classification, ARGS, expected, array_codes)
+    else:
+        print("classifier %s: the scalar functions compute in float64 with NumPy %s, NumPy >= 2 is needed"
+              % (typ_classification, np.__version__))
+    # endif
+    ok &= compile_ok or not kg_jit.has_numba()
+    if compiled:
+        compiled_codes = kg_jit.classify_codes(ARGS, typ_classification, backend="numba")
+        ok &= report_disagreements("kg_jit.classify_codes (array classifiers)", typ_classification, ARGS,
+                                   array_codes, compiled_codes)
+        if kg_jit.FLOAT32_SCALARS:
+            ok &= report_disagreements("kg_jit.classify_codes", typ_classification, ARGS, expected, compiled_codes)
+        # endif
+    # endif
+    elapsed = time.perf_counter() - start
+    print("classifier %s: %d cells, %.0f cells/s%s%s" % (typ_classification, n, n / elapsed,
+          ", rules compiled in %.1f s" % compile_time if compile_time else "", "" if ok else ", FAILED"))
+    return ok
+# end def check_classifiers
+
+def _get_grid_engines(mon_TAS, mon_PRC, typ_classification, sum_strt, tile_shape=None):
+    # (name, function) of the engines classifying a single (12, ny, nx) climatology
+    import koeppen_geiger as KG
+
+    ny, nx = mon_TAS.shape[1:]
+    if tile_shape is None:
+        # About 15 tiles, the last row and column of tiles narrower
+        tile_shape = (ny // 5 + 1, nx // 3 + 1)
+    # endif
+    engines = [
+        ("classify_grid", lambda: KG.classify_grid(mon_TAS, mon_PRC, typ_classification, sum_strt=sum_strt)[0].filled(0)),
+        ("classify_tiled", lambda: KG.classify_tiled(mon_TAS, mon_PRC, typ_classification, sum_strt=sum_strt,
+                                                      tile_shape=tile_shape)),
+        ("classify_parallel", lambda: KG.classify_parallel(mon_TAS, mon_PRC, typ_classification, sum_strt=sum_strt,
+                                                            workers=3, tile_shape=tile_shape)),
+        ("classify_windows", lambda: KG.classify_windows(mon_TAS[np.newaxis], mon_PRC[np.newaxis], typ_classification,
+                                                          window=1, sum_strt=sum_strt)[0]),
+        ("classify_ensemble", lambda: KG.classify_ensemble(mon_TAS[np.newaxis], mon_PRC[np.newaxis],
+                                                            typ_classification, sum_strt=sum_strt)[0]),
+    ]
+    if "fork" in multiprocessing.get_all_start_methods():
+        engines.append(("classify_parallel processes",
+                        lambda: KG.classify_parallel(mon_TAS, mon_PRC, typ_classification, sum_strt=sum_strt,
+                                                     workers=2, tile_shape=(ny // 4 + 1, nx), processes=True)))
+    # endif
+    return engines
+# end def _get_grid_engines
+
+def check_engines(typ_classification, ny=200, nx=300, seed=0, pool=None, years=6, window=3, reference=None):
+    """
+    Grid engines against the scalar function applied to the predictors of each cell:
+
+      classify_grid, classify_tiled, classify_parallel with threads and processes,
+      classify_windows and classify_ensemble on one climatology, with the summer
+      of each hemisphere and the dynamic summer (the reference start being taken
+      from the direct 6-month sums);
+      classify_windows on years of data, window years with strides 1 to window+1;
+      classify_ensemble on three distinct members, two at a time.
+
+    With pool, a number of climates or the climates of edge_pool, the cells of all the grids
+    are drawn from the same pool of distinct climates (see edge_climatology). reference is
+    the ScalarReference of the run, a new one if None.
+    """
+    import koeppen_geiger as KG
+
+    start = time.perf_counter()
+    reference = reference or ScalarReference(typ_classification)
+    if pool is not None:
+        pool = _get_pool(pool, np.random.default_rng(seed))
+    # endif
+    evaluated = reference.evaluated
+    shape = (ny, nx)
+    lats = np.linspace(89.0, -89.0, ny)
+    hemisphere = KG.get_sum_strt("hemisphere", lats)
+    cell_hemisphere = KG.get_cell_sum_strt(hemisphere, shape).reshape(-1)
+    ok, n_checked = True, 0
+
+    def check(name, expected, ARGS, got):
+        nonlocal ok, n_checked
+        ok &= report_disagreements(name, typ_classification, ARGS, expected, np.asarray(got).reshape(-1))
+        n_checked += expected.size
+    # end def check
+
+    mon_TAS, mon_PRC = edge_climatology(ny, nx, seed=seed, pool=pool)
+    for season, sum_strt, cell_sum_strt in (("hemisphere", hemisphere, cell_hemisphere),
+                                            ("dynamic", "dynamic", summer_start_reference(mon_TAS.reshape(12, -1)))):
+        expected, ARGS = reference_codes(mon_TAS, mon_PRC, reference, cell_sum_strt)
+        for name, engine in _get_grid_engines(mon_TAS, mon_PRC, typ_classification, sum_strt):
+            check("%s, %s summer" % (name, season), expected, ARGS, engine())
+        # end for
+    # end for
+
+    # Windows classify the cells valid in the first year only
+    years_TAS, years_PRC = edge_years(years, ny, nx, seed=seed, pool=pool)
+    first_valid = KG.get_valid_mask(years_TAS[0], years_PRC[0]).reshape(-1)
+    for stride in range(1, window + 2):
+        got = KG.classify_windows(years_TAS, years_PRC, typ_classification, window=window, stride=stride,
+                                  sum_strt=hemisphere)
+        firsts = range(0, years - window + 1, stride)
+        if len(got) != len(firsts):
+            print("classify_windows stride %d: %d windows instead of %d" % (stride, len(got), len(firsts)))
+            ok = False
+        # endif
+        for i_win, first in enumerate(firsts[:len(got)]):
+            clim_TAS, clim_PRC = [(np.sum(var[first:first + window], axis=0, dtype=np.float64) / window).astype(np.float32)
+                                  for var in (years_TAS, years_PRC)]
+            expected, ARGS = reference_codes(clim_TAS, clim_PRC, reference, cell_hemisphere)
+            expected[~first_valid] = 0
+            check("classify_windows, window %d stride %d, years %d-%d" % (window, stride, first, first + window - 1),
+                  expected, ARGS, got[i_win])
+        # end for
+    # end for
+
+    # Members classify the cells valid in the first member only
+    members = [edge_climatology(ny, nx, seed=seed + member + 1, pool=pool) for member in range(3)]
+    got = KG.classify_ensemble(np.stack([member[0] for member in members]), np.stack([member[1] for member in members]),
+                               typ_classification, sum_strt=hemisphere, member_chunk=2)
+    first_valid = KG.get_valid_mask(*members[0]).reshape(-1)
+    for i_member, (member_TAS, member_PRC) in enumerate(members):
+        expected, ARGS = reference_codes(member_TAS, member_PRC, reference, cell_hemisphere)
+        expected[~first_valid] = 0
+        check("classify_ensemble, member %d" % i_member, expected, ARGS, got[i_member])
+    # end for
+
+    elapsed = time.perf_counter() - start
+    print("engines %s: %d cells checked on a %dx%d grid, %d scalar evaluations, %.0f cells/s%s"
+          % (typ_classification, n_checked, ny, nx, reference.evaluated - evaluated, n_checked / elapsed,
+             "" if ok else ", FAILED"))
+    return ok
+# end def check_engines
+
+# Input sizes of the default, sampled run and of the whole sweep
+_SIZES = {
+    "sampled": {"cells": 20000, "grid": "120x240", "pool": 5000},
+    "full": {"cells": 200000, "grid": "360x720", "pool": 20000},
+}
+
+def main(argv=None):
+    import create_KG_cmap as CKG
+
+    parser = argparse.ArgumentParser(description="Verification checks of the Koeppen-Geiger classifications")
+    parser.add_argument("--full", action="store_true",
+                        help="whole sweep, %(cells)d cells, a %(grid)s grid and a pool of %(pool)d climates by default"
+                        % _SIZES["full"])
+    parser.add_argument("--cells", type=int, help="random predictor cells per classification")
+    parser.add_argument("--grid", help="NYxNX grid of the engine checks")
+    parser.add_argument("--pool", type=int,
+                        help="distinct climates the cells of the grids are drawn from, 0 for all cells distinct")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random inputs")
+    parser.add_argument("--schemes", default=",".join(CKG.KG_schemes), help="classification types, comma separated")
+    args = parser.parse_args(argv)
+    for name, value in _SIZES["full" if args.full else "sampled"].items():
+        if getattr(args, name) is None:
+            setattr(args, name, value)
+        # endif
+    # end for
+    ny, nx = (int(n) for n in args.grid.split("x"))
+
+    start = time.perf_counter()
+    checks = [check_import("koeppen_geiger"), check_import("create_KG_cmap"),
+              check_predictors(n=args.cells, seed=args.seed)]
+    # One pool of climates for all the grids of the run, one table of scalar codes per classification
+    pool = edge_pool(args.pool, seed=args.seed) if args.pool else None
+    for typ_classification in args.schemes.split(","):
+        reference = ScalarReference(typ_classification)
+        checks.append(check_classifiers(typ_classification, n=args.cells, seed=args.seed, reference=reference))
+        checks.append(check_engines(typ_classification, ny=ny, nx=nx, seed=args.seed, pool=pool,
+                                    reference=reference))
+    # end for
+    print("%d checks in %.1f s%s" % (len(checks), time.perf_counter() - start, "" if all(checks) else ", FAILED"))
+    return 0 if all(checks) else 1
+# end def main
+
+if __name__ == "__main__":
+    sys.exit(main())
+# endif on main
+
+# The End of All Things (op. cit.)
@@ -2,7 +2,7 @@
 
 """
 Created on Fri Jan 18 18:10:07 CET 2019
-Last modified, Fri Feb 18 16:23:56 CET 2022
+Last modified, Sun Oct 18 15:13:34 UTC 2026
 
  Copyright 2019-2022 Didier M. Roche <didier.roche@lsce.ipsl.fr>
 
@@ -23,34 +23,22 @@ Last modified, Fri Feb 18 16:23:56 CET 2022
 """
 
 # STD imports
+import contextlib
+import os
+import sys
+import threading
 import time
 
 # Array imports
-from typing import Any, Union, Iterable
-
 import numpy as np
 from numpy import ma
 
-# Plotting imports
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-
-# Regional utilities imports
-import sys
-path_to_module = "/tertiaire/backup/014_lsce3027-2020-06-25/Soft-Devel/scripts/python"
-
-sys.path.append(path_to_module)
-path_to_module = "/tertiaire/backup/014_lsce3027-2020-06-25/Soft-Devel/scripts/python/python-progressbar"
-sys.path.append(path_to_module)
-
-import progressbar as PB
-import lcm_utils as lu
-
 # Local utilities imports
-from numpy.core._multiarray_umath import ndarray
-
 import create_KG_cmap as CKG
 
+# Plotting (matplotlib, cartopy), the thread pool and the netCDF input layer (kg_io)
+# are imported on first use only, importing this module needs nothing but NumPy
+
 # Changes from version 0.0 : Created the base code from the paper of Kottek et al., Meteorologische Zeitschrift, Vol. 15, No. 3, 259-263 (June 2006)
 # Changes from version 0.1 : Added the colorbar for reproducing the figures of Peel et al., Hydrol. Earth Syst. Sci., 11, 1633-1644, 2007
 # Changes from version 0.2 : Added the second version of KG classifications, according to Peel et al., 2007
@@ -64,8 +52,13 @@ import create_KG_cmap as CKG
 # Changes from version 0.64: cleaned up the code, removing unnecessary bits
 # Changes from version 0.65: refactored part of the code, added Trewartha, automatic labelling of the bioclimatic zones
 # Changes from version 0.75: refactored part of the code, added match/case for the different classifications
+# Changes from version 0.80: whole-array classifications returning uint8 codes, labels only for plotting
+# Changes from version 0.81: one-pass predictors, summer / winter now swapped south of the equator
+# Changes from version 0.82: tiled / parallel / ensemble / windowed drivers, netCDF profiles, NumPy-only import
+# Changes from version 0.90: stage timers, counts and tile progress of the drivers through a run monitor
+# Changes from version 0.91: optional numba backend of the classifications (kg_jit)
 
-__version__ = "0.80"
+__version__ = "0.92"
 
 
 # I will assume I have the necessary variables computed somewhere else
@@ -80,8 +73,13 @@ __version__ = "0.80"
 # ~ P_smax		highest monthly precipitation for the summer half-year	(mm/month)
 # ~ P_wmin		lowest monthly precipitation for the winter half-year	(mm/month)
 # ~ P_wmax		highest monthly precipitation for the winter half-year	(mm/month)
-# ~ P_wpro      
-# ~ P_dry
+# ~ P_th			dryness threshold of the arid climates				(mm/year)
+# ~ P_wpro		fraction of the annual precipitation falling in the winter half-year
+# ~ P_dry		number of months with precipitation <= 60 mm
+
+# Rows of the ARGS predictor block passed to the classifications
+ARGS_names = ("T_min", "T_max", "T_mon", "T_ann", "P_min", "P_ann", "P_smin", "P_smax", "P_wmin", "P_wmax",
+              "P_th", "P_wpro", "P_dry")
 
 def get_Equatorial_Climates_Kottek(P_min,P_ann,P_smin,P_wmin,classification="") :
 
@@ -212,6 +210,77 @@ def get_kg_classification(arguments, vers="peel"):
     return kg_classification
 # enddef get_kg_classification
 
+def _get_codes_table(KG_dict, prefix, suffixes):
+    # uint8 codes of the labels prefix+suffix, 0 for labels absent from KG_dict
+    return np.array([KG_dict.get(prefix + suffix, 0) for suffix in suffixes], dtype=np.uint8)
+# enddef _get_codes_table
+
+def get_kg_classification_Array(arguments, KG_dict=None, vers="peel"):
+    """
+    Whole-array version of get_kg_classification, all cells at once.
+
+    Parameters
+    ----------
+    arguments : array of shape (11 or more, ...) with the predictors in the order of ARGS
+    KG_dict : dictionary label -> integer code, defaults to the code table of vers
+    vers : "kottek" or "peel"
+
+    Returns
+    -------
+    uint8 array of shape arguments.shape[1:] with the codes of KG_dict,
+    0 where get_kg_classification returns a label absent from KG_dict.
+    """
+    if KG_dict is None:
+        KG_dict = CKG.get_KG_dict(vers)
+    # endif
+    T_min = arguments[0]
+    T_max = arguments[1]
+    T_mon = arguments[2]
+    T_ann = arguments[3]
+    P_min = arguments[4]
+    P_ann = arguments[5]
+    P_smin= arguments[6]
+    P_smax= arguments[7]
+    P_wmin= arguments[8]
+    P_wmax= arguments[9]
+    P_th  = arguments[10]
+
+    # First letter, same order as the if / elif chain of get_kg_classification
+    is_E = T_max < 10.0
+    is_B = P_ann < 10 * P_th
+    is_A = T_min >= 18.0
+    is_C = (T_min > -3.0) & (T_min < 18.0)
+    is_D = (T_min <= -3.0) & (T_max >= 10.0)
+
+    # get_Polar_Climates
+    codes_E = _get_codes_table(KG_dict, "E", ["T", "F"])[np.where(T_max >= 0.0, 0, 1)]
+
+    # get_Arid_Climates
+    indx_B = np.where(P_ann > 5 * P_th, 0, 2) + np.where(T_ann >= 18.0, 0, 1)
+    codes_B = _get_codes_table(KG_dict, "B", ["Sh", "Sk", "Wh", "Wk"])[indx_B]
+
+    # get_Equatorial_Climates_Kottek / _Peel
+    if vers == "kottek":
+        codes_A = np.select([P_min > 60.0, P_ann >= 25.0 * (100.0 - P_min), P_smin <= 60.0, P_wmin <= 60.0],
+                            _get_codes_table(KG_dict, "A", ["f", "m", "s", "w"]), np.uint8(KG_dict.get("A", 0)))
+    else:
+        codes_A = np.select([P_min > 60.0, P_ann >= 25.0 * (100.0 - P_min), P_min <= 60.0],
+                            _get_codes_table(KG_dict, "A", ["f", "m", "w"]), np.uint8(KG_dict.get("A", 0)))
+    # endif
+
+    # get_Second_Third_Letter, shared by the C and D climates
+    indx_2nd = np.select([(P_smin < P_wmin) & (P_wmax > 3.0 * P_smin) & (P_smin < 40.0),
+                          (P_wmin < P_smin) & (P_smax > 10.0 * P_wmin)], [0, 1], 2)
+    indx_3rd = np.select([T_max >= 22.0, T_mon >= 4, T_min > -38.0], [0, 1, 2], 3)
+    indx_CD = 4 * indx_2nd + indx_3rd
+    letters_CD = [second + third for second in "swf" for third in "abcd"]
+    codes_C = _get_codes_table(KG_dict, "C", letters_CD)[indx_CD]
+    codes_D = _get_codes_table(KG_dict, "D", letters_CD)[indx_CD]
+
+    return np.select([is_E, is_B, is_A, is_C, is_D], [codes_E, codes_B, codes_A, codes_C, codes_D],
+                     np.uint8(KG_dict.get("F", 0)))
+# enddef get_kg_classification_Array
+
 def get_kg_classification_Trewartha(arguments, vers="trewartha"):
     T_min = arguments[0]
     T_max = arguments[1]
@@ -273,6 +342,63 @@ def get_kg_classification_Trewartha(arguments, vers="trewartha"):
 
 # enddef get_kg_classification_Trewartha
 
+def get_kg_classification_Trewartha_Array(arguments, KG_dict=None):
+    """
+    Whole-array version of get_kg_classification_Trewartha.
+
+    The aridity threshold A is computed once as an array expression, the
+    if / elif cascade is then resolved with np.select (first match wins).
+
+    Parameters
+    ----------
+    arguments : array of shape (13, ...) with the predictors in the order of ARGS
+    KG_dict : dictionary label -> integer code, defaults to the Trewartha code table
+
+    Returns
+    -------
+    uint8 array of shape arguments.shape[1:] with the codes of KG_dict.
+    """
+    if KG_dict is None:
+        KG_dict = CKG.get_KG_dict("trewartha")
+    # endif
+    T_min = arguments[0]
+    T_max = arguments[1]
+    T_mon = arguments[2]
+    T_ann = arguments[3]
+    P_min = arguments[4]
+    P_ann = arguments[5]
+    P_smin = arguments[6]
+    P_smax = arguments[7]
+    P_wmin = arguments[8]
+    P_wmax = arguments[9]
+    P_wpro = arguments[11]
+    P_dry = arguments[12]
+
+    def leaf(label):
+        return np.uint8(KG_dict.get(label, 0))
+    # enddef leaf
+
+    A = 2.3*T_ann-0.64*P_wpro+41
+    humid = P_ann/10.0 > A
+
+    conditions = [T_max < 0.0,
+                  T_max < 10.0,
+                  T_mon <= 3,
+                  T_mon <= 7,
+                  (T_min > 18.0) & humid,
+                  (T_mon >= 8.0) & humid]
+    choices = [leaf("Fi"),
+               leaf("Ft"),
+               np.where(T_min <= -10.0, leaf("Ec"), leaf("Eo")),
+               np.where(T_min <= 0.0, leaf("Dc"), leaf("Do")),
+               np.where(P_dry < 3, leaf("Ar"), leaf("Aw")),
+               np.select([(P_smin < 30.0) & (P_min < 1. / 3. * P_wmax), P_smax > 10.0 * P_wmin],
+                         [leaf("Cs"), leaf("Cw")], leaf("Cr"))]
+    arid = np.where(P_ann/10.0 <= 0.5 * A, leaf("BW"), leaf("BS"))
+
+    return np.select(conditions, choices, arid)
+# enddef get_kg_classification_Trewartha_Array
+
 
 def get_kg_classification_Cannon(arguments):
 
@@ -412,373 +538,898 @@ def get_kg_classification_Cannon(arguments):
     return kg_classification
 # enddef get_kg_classification_Cannon
 
-def get_maxminsum_Slice(mon_var, indx_l=None, indx_h=None):
+def get_kg_classification_Cannon_Array(arguments, KG_dict=None):
     """
+    Whole-array version of get_kg_classification_Cannon.
+
+    Each branch condition of the decision tree is evaluated once over the
+    whole array, the leaves are then selected with nested np.where.
 
     Parameters
     ----------
-    mon_var :
-    """
-    # obtain a variable with size 24 at first index, 11 or 23 is december, 0 or 12 is january
-    repeatedVar = np.r_[mon_var, mon_var]
-    slicedVar = repeatedVar[12 + indx_l:12 + indx_h, ...]
-    return ma.max(slicedVar, axis=0), ma.min(slicedVar, axis=0), ma.sum(slicedVar, axis=0)
-
-
-# end def get_maxminsum_Slice
+    arguments : array of shape (11 or more, ...) with the predictors in the order of ARGS
+    KG_dict : dictionary label -> integer code, defaults to the Cannon code table
 
-def exchange_tabs(arr_a, arr_b):
-    arr_c = arr_b
-    arr_b = arr_a
-    arr_a = arr_c
-
-    del (arr_c)
-    return
-# end def exchange_tabs
-
-
-if __name__ == "__main__":
-	
-    typ_classification = "trewartha"
+    Returns
+    -------
+    uint8 array of shape arguments.shape[1:] with the codes of KG_dict.
+    """
+    if KG_dict is None:
+        KG_dict = CKG.get_KG_dict("cannon")
+    # endif
+    T_min = arguments[0]
+    T_max = arguments[1]
+    T_ann = arguments[3]
+    P_min = arguments[4]
+    P_ann = arguments[5]
+    P_smax= arguments[7]
+    P_wmin= arguments[8]
+    P_wmax= arguments[9]
 
-    print("This is Koeppen-Geiger classifications, version", __version__, "type == ", typ_classification)
+    def leaf(label):
+        return np.uint8(KG_dict.get(label, 0))
+    # enddef leaf
+
+    where = np.where
+
+    # T_ann >= 12, P_ann >= 1400
+    wet_hot = where(P_min >= 70.0,
+                    where(P_ann >= 2800.0,
+                          where(P_ann >= 3700.0, leaf("1WW"), leaf("1WD")),
+                          where(P_ann > 2000.0, leaf("1DW"), leaf("1DD"))),
+                    where(P_ann >= 2200.0,
+                          where(P_smax >= 590.0, leaf("2Ww"), leaf("2Wd")),
+                          where(P_min > 30.0,
+                                where(T_min >= 16.0, leaf("2Dh"), leaf("2Dc")),
+                                where(P_wmax >= 170.0, leaf("2Dw"), leaf("2Dd")))))
+
+    # T_ann >= 12, P_ann < 1400
+    dry_hot = where(P_ann >= 600.0,
+                    where(T_min >= 14.0,
+                          where(T_max >= 30.0, leaf("3hh"),
+                                where(P_ann >= 1000.0, leaf("3hW"), leaf("3hD"))),
+                          where(P_wmin >= 40.0, leaf("3cw"), leaf("3cd"))),
+                    where(T_ann >= 22,
+                          where(P_smax >= 60.0, leaf("3Hw"), leaf("3Hd")),
+                          where(T_ann >= 18.0, leaf("3CH"), leaf("3CC"))))
+
+    # -2 <= T_ann < 12
+    temperate = where(P_wmax >= 110.0,
+                      where(P_wmax >= 230, leaf("4Ww"), leaf("4Wd")),
+                      where(T_ann >= 5,
+                            where(P_ann >= 500, leaf("4HW"), leaf("4HD")),
+                            where(T_max >= 16.0, leaf("4Ch"), leaf("4Cc"))))
+
+    # T_ann < -2
+    cold = where(T_max >= 5,
+                 where(T_ann >= -9,
+                       where(T_max >= 13, leaf("5hh"), leaf("5hc")),
+                       leaf("5hC")),
+                 where(P_min >= 50, leaf("5cw"), leaf("5cd")))
+
+    return where(T_ann >= 12.0,
+                 where(P_ann >= 1400.0, wet_hot, dry_hot),
+                 where(T_ann >= -2.0, temperate, cold))
+# enddef get_kg_classification_Cannon_Array
+
+# Backend of get_kg_classification_Codes used by all the drivers, see set_classification_backend
+_codes_backend = "numpy"
+
+def set_classification_backend(backend="numpy"):
+    """
+    Backend of the classifications of all the drivers: "numpy" for the array
+    classifiers, "numba" for the compiled scalar rules of kg_jit (same codes).
+    """
+    global _codes_backend
+    if backend not in ("numpy", "numba"):
+        raise ValueError("Unknown backend: %s" % backend)
+    # endif
+    if backend == "numba":
+        import kg_jit
 
-    # ~ import regriding_to as RT
-    # ~ var_temp = "tas"
-    # ~ varOut = RT.reGrid_to(tas_File,var_temp,prc_File,varForGrid=var_Grid,outFile="/home/roche/Soft-Devel/scripts/python/iloveclim-and-clim/tas_pcmdi-metrics_Amon_ERAINT_198901-200911-clim-GPCPGrid.nc")
+        if not kg_jit.has_numba():
+            raise ImportError("The numba backend needs numba")
+        # endif
+    # endif
+    _codes_backend = backend
+# enddef set_classification_backend
 
-    dataset = "CRU"
+def get_kg_classification_Codes(arguments, typ_classification, backend=None):
+    """
+    uint8 class codes of all cells for one classification type.
 
-    if dataset == "ERA":
+    Parameters
+    ----------
+    arguments : array of shape (13, ...) with the predictors in the order of ARGS
+    typ_classification : "kottek", "peel", "cannon" or "trewartha"
+    backend : "numpy" or "numba", the one of set_classification_backend if None
 
-        # ========== ERA-INTERIM
+    Returns
+    -------
+    uint8 array of shape arguments.shape[1:], codes of create_KG_cmap.get_KG_dict(typ_classification)
+    """
+    if (backend or _codes_backend) == "numba":
+        import kg_jit
 
-        tas_File = "test-data/era-interim_t2m_monmean_1979-1999.nc"
-        prc_File = "test-data/era-interim_tp_monmean_1979-1999.nc"
+        return kg_jit.classify_codes(arguments, typ_classification, backend="numba")
+    # endif
+    match typ_classification:
+        case "kottek" | "peel":
+            return get_kg_classification_Array(arguments, vers=typ_classification)
+        case "cannon":
+            return get_kg_classification_Cannon_Array(arguments)
+        case "trewartha":
+            return get_kg_classification_Trewartha_Array(arguments)
+        case _:
+            raise ValueError("Unknown classification type: %s" % typ_classification)
+    #end match
+# enddef get_kg_classification_Codes
 
-        var_temp = "t2m"
-        var_Grid = 'tp'
+def get_summer_start(lats):
+    """
+    First month of the summer half-year of each latitude: april (3) in the
+    northern hemisphere, october (9) in the southern one (lats < 0).
 
-        liste_TAS, nc_TAS = lu.read_var_NC(tas_File, [var_temp, ])  # returns a list, in K
-        mon_TAS = ma.masked_equal(liste_TAS[0], liste_TAS[0]._FillValue) - 273.15
-        lats = nc_TAS.variables['latitude']
-        lons = nc_TAS.variables['longitude']
-        plot_lats = lats
+    Valid for ascending (CRU) as well as descending (ERA) latitudes. The result
+    has shape (ny, 1), one value per row broadcasting over the columns: a sum_strt
+    for get_predictors and the classify_* functions on a (12, ny, nx) grid.
+    """
+    return np.where(np.asarray(lats) < 0.0, 9, 3).astype(np.int8).reshape(-1, 1)
+# end def get_summer_start
 
-        liste_PRC, nc_PRC = lu.read_var_NC(prc_File, [var_Grid, ])  # returns a list, in
-        mon_PRC = ma.masked_equal(liste_PRC[0], 1e+20) * 12000.  # use a dummy value, no missing value in that file ...
+def _get_row_sum_strt(sum_strt, shape):
+    # A 1-D sum_strt of a (ny, nx) grid holds one value per latitude row, as (ny, 1)
+    if isinstance(sum_strt, str) or np.ndim(sum_strt) != 1 or len(shape) != 2:
+        return sum_strt
+    # endif
+    sum_strt = np.asarray(sum_strt)
+    if sum_strt.size != shape[0]:
+        raise ValueError("%d summer starts for the %d latitude rows of the grid" % (sum_strt.size, shape[0]))
+    # endif
+    return sum_strt[:, np.newaxis]
+# end def _get_row_sum_strt
 
+def get_cell_sum_strt(sum_strt, shape, index=None):
+    """
+    sum_strt of the cells of a (ny, nx) grid.
 
-    # ==========
-    elif dataset == "CRU":
-        # ========== CRU_TS / VASClimO
+    An integer or "dynamic" is returned as is. An array is one value per row
+    ((ny,) or (ny, 1)) or per cell ((ny, nx)), it is broadcast to shape and,
+    if index is given, taken at the flat indices of index (see get_valid_index).
+    """
+    if isinstance(sum_strt, str) or np.ndim(sum_strt) == 0:
+        return sum_strt
+    # endif
+    cell_sum_strt = np.broadcast_to(_get_row_sum_strt(sum_strt, shape), shape)
+    return cell_sum_strt if index is None else cell_sum_strt.reshape(-1)[index]
+# end def get_cell_sum_strt
 
-        tas_File = "test-data/cru_ts4.02.1951.2000.tmp.dat-ymonmean.nc"
-        prc_File = "test-data/dataPrcpClim-ymonmean.nc"
+def get_summer_start_dynamic(mon_TAS):
+    """
+    First month of the warmest six consecutive months of each cell.
 
-        var_temp = "tmp"
-        var_Grid = 'prcp'
+    The twelve circular 6-month sums are obtained by sliding one running sum
+    around the year (add the month entering, remove the month leaving), so only
+    a few arrays of the size of one month are allocated. Ties go to the earliest start.
 
-        liste_PRC, nc_PRC = lu.read_var_NC(prc_File, [var_Grid, ])  # returns a list, in
-        mon_PRC = ma.masked_equal(liste_PRC[0], liste_PRC[0]._FillValue)
-        lats_PRC = nc_PRC.variables['Y']
+    Parameters
+    ----------
+    mon_TAS : monthly temperatures, shape (12, ...)
 
-        max_lats = lats_PRC[-1]
-        min_lats = lats_PRC[0]
+    Returns
+    -------
+    int8 array of shape mon_TAS.shape[1:], a sum_strt for get_predictors
+    """
+    window_sum = np.zeros(mon_TAS.shape[1:])
+    for month in range(6):
+        window_sum += _get_month(mon_TAS, month)[0]
+    # end for
+    warmest_sum = window_sum.copy()
+    sum_strt = np.zeros(mon_TAS.shape[1:], dtype=np.int8)
+    for start in range(1, 12):
+        window_sum -= _get_month(mon_TAS, start - 1)[0]
+        window_sum += _get_month(mon_TAS, (start + 5) % 12)[0]
+        warmer = window_sum > warmest_sum
+        warmest_sum[warmer] = window_sum[warmer]
+        sum_strt[warmer] = start
+    # end for
+    return sum_strt
+# end def get_summer_start_dynamic
 
-        liste_TAS, nc_TAS = lu.read_var_NC(tas_File, [var_temp, ])  # returns a list, in K
-        lats = nc_TAS.variables['lat']
-        lons = nc_TAS.variables['lon']
-        mon_TAS = ma.masked_equal(liste_TAS[0], liste_TAS[0]._FillValue)[:,
-                  lu.find_closest(lats[:], min_lats):lu.find_closest(lats[:], max_lats) + 1, :]
-        plot_lats = lats[lu.find_closest(lats[:], min_lats):lu.find_closest(lats[:], max_lats) + 1]
+def get_sum_strt(season="hemisphere", lats=None):
+    """
+    sum_strt argument of get_predictors and the classify_* functions for a season mode.
 
-    # ==========
+    Parameters
+    ----------
+    season : "north"      summer from april to september everywhere
+             "hemisphere" april to september in the north, october to march in the south
+             "dynamic"    the warmest six months of each cell, see get_summer_start_dynamic
+    lats : latitudes of the rows of the grid, needed by "hemisphere"
+    """
+    match season:
+        case "north":
+            return 3
+        case "hemisphere":
+            return get_summer_start(lats)
+        case "dynamic":
+            return "dynamic"
+        case _:
+            raise ValueError("Unknown season mode: %s" % season)
+    #end match
+# end def get_sum_strt
 
-    # ==========
-    elif dataset == "subgrid":
-        # ========== CRU_TS / VASClimO
+def _init_seasonal_stats(stats):
+    # stats = P_smin, P_smax, P_ssum, P_wmin, P_wmax, P_wsum
+    for var, value in zip(stats, (np.inf, -np.inf, 0.0, np.inf, -np.inf, 0.0)):
+        var.fill(value)
+    # end for
+# end def _init_seasonal_stats
+
+def _add_seasonal_month(stats, prc, month, sum_strt):
+    # Fold one month of precipitation into the summer or winter statistics of each cell
+    P_smin, P_smax, P_ssum, P_wmin, P_wmax, P_wsum = stats
+    summer = np.asarray((month - sum_strt) % 12 < 6)
+    winter = ~summer
+    np.minimum(P_smin, prc, out=P_smin, where=summer)
+    np.maximum(P_smax, prc, out=P_smax, where=summer)
+    np.add(P_ssum, prc, out=P_ssum, where=summer)
+    np.minimum(P_wmin, prc, out=P_wmin, where=winter)
+    np.maximum(P_wmax, prc, out=P_wmax, where=winter)
+    np.add(P_wsum, prc, out=P_wsum, where=winter)
+# end def _add_seasonal_month
+
+def _get_month(mon_var, month):
+    # One month of a monthly stack as plain float32 data plus its validity
+    mon_slice = mon_var[month]
+    data = np.asarray(ma.getdata(mon_slice), dtype=np.float32)
+    return data, ~ma.getmaskarray(mon_slice) & np.isfinite(data)
+# end def _get_month
+
+def get_predictors(mon_TAS, mon_PRC, sum_strt=3, out=None):
+    """
+    All the rows of ARGS from the monthly stacks, in one pass over the months.
 
-        tas_File = "test-data/monthly_climatology.nc"
-        prc_File = "test-data/monthly_climatology.nc"
+    Each month of mon_TAS and mon_PRC is read once and folded into running
+    minima, maxima, sums and counts, so no full-size temporary is created.
 
-        var_temp = "Tann"
-        var_Grid = "Acc"
+    Parameters
+    ----------
+    mon_TAS : monthly temperatures, shape (12, ...), in C. Plain or masked array,
+              or anything returning arrays when indexed by month (netCDF variable, ...)
+    mon_PRC : monthly precipitation, same shape, in mm/month
+    sum_strt : index of the first month of the summer half-year (0 is january),
+               an integer or an integer array broadcastable to mon_TAS.shape[1:].
+               For a (12, ny, nx) grid, a 1-D array holds one value per latitude row.
+               3 gives summer from april to september, see get_summer_start for
+               the hemisphere of each latitude. "dynamic" uses the warmest six months
+               of each cell (get_summer_start_dynamic).
+    out : optional float32 array of shape (13,) + mon_TAS.shape[1:] to fill
+
+    Returns
+    -------
+    ARGS : float32 array of shape (13,) + mon_TAS.shape[1:], rows as in ARGS_names
+    valid : boolean array of shape mon_TAS.shape[1:], True where all twelve months
+            of both variables are present and finite. ARGS is meaningless elsewhere.
+
+    A cell with any missing month has no class (code 0 in the classify_* drivers).
+    Up to version 0.80 the masked-array statistics used the months present, counting
+    a missing month as both warm (T_mon) and dry (P_dry) and summing P_ann over fewer
+    than twelve months, which could not give a consistent class.
+    """
+    shape = mon_TAS.shape[1:]
+    if out is None:
+        out = np.empty((13,) + shape, dtype=np.float32)
+    # endif
+    if isinstance(sum_strt, str) and sum_strt == "dynamic":
+        sum_strt = get_summer_start_dynamic(mon_TAS)
+    # endif
+    sum_strt = _get_row_sum_strt(sum_strt, shape)
+    T_min, T_max, T_mon, T_ann, P_min, P_ann, P_smin, P_smax, P_wmin, P_wmax, P_th, P_wpro, P_dry = out
 
-        liste_PRC, nc_PRC = lu.read_var_NC(prc_File, [var_Grid, ])  # returns a list, in
-        mon_PRC = ma.masked_equal(liste_PRC[0], -99999.0) * 1000.
+    # P_th and P_wpro hold the summer and winter sums until the end
+    P_ssum = P_th
+    P_wsum = P_wpro
 
-        # Convert europe coord data:
-        # sed -e 's/ \+ /\t/g' europe-15min_coord.dat | sed -e 's/^\t//g' > europe-15min_coord-tabs.dat
-        #
-        data_array = lu.read_txt("test-data/europe-15min_coord-tabs.dat", cols=6)
+    seasonal_stats = (P_smin, P_smax, P_ssum, P_wmin, P_wmax, P_wsum)
+    _init_seasonal_stats(seasonal_stats)
 
-        # ~ lats_PRC = nc_PRC.variables['y']
+    T_min.fill(np.inf)
+    T_max.fill(-np.inf)
+    P_min.fill(np.inf)
+    for var in (T_mon, T_ann, P_ann, P_dry):
+        var.fill(0.0)
+    # end for
+    valid = np.ones(shape, dtype=bool)
 
-        # ~ max_lats = lats_PRC[-1]
-        # ~ min_lats = lats_PRC[0]
+    for month in range(12):
+        tas, tas_ok = _get_month(mon_TAS, month)
+        prc, prc_ok = _get_month(mon_PRC, month)
+        valid &= tas_ok
+        valid &= prc_ok
 
-        liste_TAS, nc_TAS = lu.read_var_NC(tas_File, [var_temp, ])  # returns a list, in  C
+        np.minimum(T_min, tas, out=T_min)
+        np.maximum(T_max, tas, out=T_max)
+        T_ann += tas
+        T_mon += tas >= 10.0  # Number of months above the 10°C threshold
 
-        # ~ lats = nc_TAS.variables['lat']
-        # ~ lons = nc_TAS.variables['lon']
+        np.minimum(P_min, prc, out=P_min)
+        P_ann += prc
+        P_dry += prc <= 60.0  # Number of dry months
 
-        lats = data_array[3, ::256]
-        lons = data_array[2, :256]
+        _add_seasonal_month(seasonal_stats, prc, month, sum_strt)
+    # end for
 
-        mon_TAS = ma.masked_less(liste_TAS[0],
-                                 -100.0)  #  [:,lu.find_closest(lats[:],min_lats):lu.find_closest(lats[:],max_lats)+1,:]
-        # ~ plot_lats = lats[lu.find_closest(lats[:],min_lats):lu.find_closest(lats[:],max_lats)+1]
-        plot_lats = lats
-    elif dataset == "AZ":
+    T_ann /= 12.0
 
-        # ~ tas_File = "test-data/AZ_datasets/pi_corr_tem_av-newtime-365_days-monmean.nc"
-        # ~ prc_File = "test-data/AZ_datasets/pi_corr_prc_av-newtime-365_days-monmean.nc"
-        
-        
-        # pi_raw has temperature variable == tem and not temp //  and lat/lon being latitude/longitude
-        # ~ tas_File = "test-data/AZ_datasets/pi_raw_tem_av-newtime-365_days-monmean.nc"
-        # ~ prc_File = "test-data/AZ_datasets/pi_raw_prc_av-newtime-365_days-monmean.nc"        
-        
-        
-        # ~ tas_File = "test-data/AZ_datasets/6k_corr_tem_av-newtime-365_days-monmean.nc"
-        # ~ prc_File = "test-data/AZ_datasets/6k_corr_prc_av-newtime-365_days-monmean.nc"
+    # Fractions of the annual precipitation, zero where there is no precipitation at all
+    # (infinite values of invalid cells give NaN silently, they have no class anyway)
+    wet = P_ann > 0.0
+    with np.errstate(invalid="ignore"):
+        np.divide(P_wsum, P_ann, out=P_wpro, where=wet)
+        P_spro = np.divide(P_ssum, P_ann, out=np.zeros(shape, dtype=np.float32), where=wet)
+    # end with
+    P_wpro[~wet] = 0.0
 
-        # ~ var_temp = "temp"
-        # ~ var_temp = "tem"
-        # ~ var_Grid = 'prc'
+    var_1 = np.where(P_wpro >= 2. / 3., 2. * T_ann, 0.0)
+    var_1 += np.where(P_spro >= 2. / 3., 2. * T_ann + 28.0, 0.0)
+    np.copyto(P_th, np.where(var_1 <= 0.0, 2 * T_ann + 14.0, var_1))
 
-        tas_File = "test-data/AZ_datasets/land_observations_down_tem_av-newtime-365_days-monmean.nc"
-        prc_File = "test-data/AZ_datasets/land_observations_down_prc_av-newtime-365_days-monmean.nc"
+    return out, valid
+# end def get_predictors
 
-        var_temp = "tas"
-        var_Grid = 'pr'
+def get_valid_mask(mon_TAS, mon_PRC):
+    """
+    Cells where all twelve months of both variables are present and finite,
+    the same criterion as the valid output of get_predictors.
+    """
+    valid = np.ones(mon_TAS.shape[1:], dtype=bool)
+    for month in range(12):
+        valid &= _get_month(mon_TAS, month)[1]
+        valid &= _get_month(mon_PRC, month)[1]
+    # end for
+    return valid
+# end def get_valid_mask
 
-        
+def get_valid_index(valid):
+    """
+    Flat indices of the valid cells of a grid, to gather them into dense columns.
 
-        liste_TAS, nc_TAS = lu.read_var_NC(tas_File, [var_temp, ])  # returns a list, in C
-        mon_TAS = ma.masked_equal(liste_TAS[0], liste_TAS[0]._FillValue)
-        
-        # ~ lats = nc_TAS.variables['latitude']
-        # ~ lons = nc_TAS.variables['longitude']
-        # ~ lats = nc_TAS.variables['lat']
-        # ~ lons = nc_TAS.variables['lon']
-        lats = nc_TAS.variables['y']
-        lons = nc_TAS.variables['x']
-        
-        
-        plot_lats = lats
+    The index only depends on the grid and its land / missing mask, it can be
+    kept (or saved with np.save) and reused for every run on the same grid.
+    """
+    valid = np.asarray(valid)
+    dtype = np.int32 if valid.size < np.iinfo(np.int32).max else np.int64
+    return np.flatnonzero(valid).astype(dtype, copy=False)
+# end def get_valid_index
 
-        liste_PRC, nc_PRC = lu.read_var_NC(prc_File, [var_Grid, ])  # returns a list, in mm.month-1
-        mon_PRC = ma.masked_equal(liste_PRC[0], liste_PRC[0]._FillValue) # use a dummy value, no missing value in that file ...
+def gather_cells(mon_var, index):
+    """
+    Dense float32 columns (12, index.size) of the cells of index, one month at a time.
+    Masked or non-finite values are returned as NaN.
+    """
+    out = np.empty((mon_var.shape[0], index.size), dtype=np.float32)
+    for month in range(mon_var.shape[0]):
+        data, ok = _get_month(mon_var, month)
+        out[month] = np.where(ok, data, np.nan).reshape(-1)[index]
+    # end for
+    return out
+# end def gather_cells
 
-        # Anhelina's datasets ...
-        
+def scatter_cells(codes, index, shape):
+    """
+    Masked uint8 class map of the given shape from the codes of the cells of index.
+    Cells outside index, or with code 0, are masked.
+    """
+    KG_map = np.zeros(int(np.prod(shape)), dtype=np.uint8)
+    KG_map[index] = codes
+    KG_map = KG_map.reshape(shape)
+    return ma.masked_array(KG_map, mask=(KG_map == 0))
+# end def scatter_cells
+
+def _stage(monitor, name):
+    # Timer of a stage of a kg_monitor.RunMonitor, nothing without monitor
+    return contextlib.nullcontext() if monitor is None else monitor.stage(name)
+# end def _stage
+
+def classify_grid(mon_TAS, mon_PRC, typ_classification, sum_strt=3, index=None, monitor=None):
+    """
+    Class map of a grid, computing predictors and classes on the valid cells only.
 
-    # ==========
+    Parameters
+    ----------
+    mon_TAS, mon_PRC, sum_strt : as in get_predictors
+    typ_classification : "kottek", "peel", "cannon" or "trewartha"
+    index : flat indices of the cells to classify, as returned by get_valid_index
+            on a previous run on the same grid. Computed from the data if None.
+    monitor : kg_monitor.RunMonitor receiving the stage timers and the cell / class counts
+
+    Returns
+    -------
+    KG_map : masked uint8 array of shape mon_TAS.shape[1:]
+    index : the index of the classified cells, to reuse on the same grid
+    """
+    shape = mon_TAS.shape[1:]
+    with _stage(monitor, "gather"):
+        if index is None:
+            index = get_valid_index(get_valid_mask(mon_TAS, mon_PRC))
+        # endif
+        cells_TAS, cells_PRC = gather_cells(mon_TAS, index), gather_cells(mon_PRC, index)
+    # end with
+    with _stage(monitor, "seasons"):
+        if isinstance(sum_strt, str) and sum_strt == "dynamic":
+            sum_strt = get_summer_start_dynamic(cells_TAS)
+        else:
+            sum_strt = get_cell_sum_strt(sum_strt, shape, index)
+        # endif
+    # end with
+
+    with _stage(monitor, "predictors"):
+        ARGS, ARGS_valid = get_predictors(cells_TAS, cells_PRC, sum_strt=sum_strt)
+    # end with
+    del cells_TAS, cells_PRC
+    with _stage(monitor, "classification"):
+        codes = get_kg_classification_Codes(ARGS, typ_classification)
+        codes[~ARGS_valid] = 0
+    # end with
+    if monitor is not None:
+        monitor.add_cells(np.prod(shape), np.count_nonzero(ARGS_valid))
+        monitor.add_classes(codes[ARGS_valid])
+    # endif
 
-    # end if on dataset
+    return scatter_cells(codes, index, shape), index
+# end def classify_grid
 
-    # Minimum Monthly mean temperature
-    T_min = ma.min(mon_TAS, axis=0)
+# Rough peak memory per grid cell of classify_grid on a tile: the two monthly
+# stacks as read (up to float64 plus mask), their float32 dense copies, ARGS and temporaries
+_BYTES_PER_CELL = 2 * 12 * 9 + 2 * 12 * 4 + 13 * 4 + 64
 
-    # Maximum Monthly mean temperature
-    T_max = ma.max(mon_TAS, axis=0)
+def iter_tiles(shape, max_memory=2**30, tile_shape=None):
+    """
+    Row and column slices covering a (ny, nx) grid with tiles that fit in max_memory bytes.
 
-    # Annual mean temperature
-    T_ann = ma.mean(mon_TAS, axis=0)
-    # Number of months above the 10°C threshold ...
-    T_mon = ma.sum(ma.masked_greater_equal(mon_TAS, 10.0).mask, axis=0)  #  T_mon no longer contains Monthly Temp.
+    Tiles span whole latitude rows when at least one row fits, and are split
+    along longitudes otherwise. tile_shape = (rows, cols) overrides the budget.
+    """
+    ny, nx = shape
+    if tile_shape is None:
+        cells = max(int(max_memory) // _BYTES_PER_CELL, 1)
+        if cells >= nx:
+            tile_shape = (min(cells // nx, ny), nx)
+        else:
+            tile_shape = (1, cells)
+        # endif
+    # endif
+    tile_rows, tile_cols = tile_shape
+    for row in range(0, ny, tile_rows):
+        for col in range(0, nx, tile_cols):
+            yield slice(row, min(row + tile_rows, ny)), slice(col, min(col + tile_cols, nx))
+        # end for
+    # end for
+# end def iter_tiles
+
+def _get_tile_sum_strt(sum_strt, rows, cols):
+    # sum_strt is an integer, "dynamic", one value per latitude row (ny,) or (ny, 1) or one per cell (ny, nx)
+    match np.ndim(sum_strt):
+        case 0:
+            return sum_strt
+        case 1:
+            return np.asarray(sum_strt)[rows, np.newaxis]
+        case _:
+            # (ny, 1) is one value per row, as returned by get_sum_strt
+            sum_strt = np.asarray(sum_strt)
+            return sum_strt[rows] if sum_strt.shape[1] == 1 else sum_strt[rows, cols]
+    #end match
+# end def _get_tile_sum_strt
 
-    # Precipitation of the dryest month
-    P_min = ma.min(mon_PRC, axis=0)
-    # Precipitation of the wettest month
-    P_max = ma.max(mon_PRC, axis=0)
-    # Annual sum of precipitation
-    P_ann = ma.sum(mon_PRC, axis=0)
+def classify_tile(mon_TAS, mon_PRC, typ_classification, rows, cols, sum_strt=3, monitor=None):
+    """
+    uint8 class codes of one tile of the grid, 0 for cells with no class.
+    Only the tile is read from mon_TAS and mon_PRC.
+    """
+    with _stage(monitor, "load"):
+        tile_TAS, tile_PRC = mon_TAS[:, rows, cols], mon_PRC[:, rows, cols]
+    # end with
+    KG_tile = classify_grid(tile_TAS, tile_PRC, typ_classification,
+                            sum_strt=_get_tile_sum_strt(sum_strt, rows, cols), monitor=monitor)[0]
+    return KG_tile.filled(0)
+# end def classify_tile
+
+def classify_tiled(mon_TAS, mon_PRC, typ_classification, sum_strt=3, max_memory=2**30, tile_shape=None, out=None,
+                   monitor=None):
+    """
+    Class map of a grid too large for memory, tile by tile.
 
-    P_dry = ma.sum(ma.masked_less_equal(mon_PRC, 60.0).mask, axis=0)  # Count number of dry months
+    Parameters
+    ----------
+    mon_TAS, mon_PRC : monthly stacks of shape (12, ny, nx), in C and mm/month. Anything
+                       that reads only the requested block when sliced: netCDF variables,
+                       np.memmap, ... Plain arrays work too.
+    typ_classification : "kottek", "peel", "cannon" or "trewartha"
+    sum_strt : first month of the summer half-year, an integer, one value per latitude
+               row (ny,) or one per cell (ny, nx). Each tile uses its own rows, so tiles
+               spanning the equator get the summer of each hemisphere.
+    max_memory : peak memory budget of one tile, in bytes
+    tile_shape : (rows, cols) of the tiles, overrides max_memory
+    out : (ny, nx) array receiving the uint8 codes tile by tile, for instance a
+          netCDF variable. A new array is created if None.
+    monitor : kg_monitor.RunMonitor receiving the stage timers, counts and the progress of the tiles
+
+    Returns
+    -------
+    out, with 0 where no class is defined
+    """
+    shape = mon_TAS.shape[1:]
+    if out is None:
+        out = np.zeros(shape, dtype=np.uint8)
+    # endif
+    tiles = list(iter_tiles(shape, max_memory=max_memory, tile_shape=tile_shape))
+    if monitor is not None:
+        monitor.set_tiles(len(tiles))
+    # endif
+    for rows, cols in tiles:
+        codes = classify_tile(mon_TAS, mon_PRC, typ_classification, rows, cols, sum_strt=sum_strt, monitor=monitor)
+        with _stage(monitor, "write"):
+            out[rows, cols] = codes
+        # end with
+        if monitor is not None:
+            monitor.tile_done()
+        # endif
+    # end for
+    return out
+# end def classify_tiled
 
-    print(ma.max(mon_PRC), T_mon.shape, P_dry.shape)
+# Inputs of the running classify_parallel call, inherited by the forked worker processes
+_parallel_job = {}
 
-    # lets define summer in northern hemisphere as 3->8 (april, september included)
-    # lets find the index of the equator ...
+def _classify_tile_shared(tile):
+    # Worker process: classify one tile and write it into the shared output array
+    from multiprocessing import shared_memory
 
-    indx_equ = lu.find_closest(lats[:], 0.0)
-    # indx_equ = 0
-    P_smin = ma.zeros(mon_PRC[0, ...].shape)
-    P_smax = ma.zeros(mon_PRC[0, ...].shape)
-    P_ssum = ma.zeros(mon_PRC[0, ...].shape)
-    P_wmin = ma.zeros(mon_PRC[0, ...].shape)
-    P_wmax = ma.zeros(mon_PRC[0, ...].shape)
-    P_wsum = ma.zeros(mon_PRC[0, ...].shape)
+    rows, cols = tile
+    job = _parallel_job
+    monitor = None
+    if job["monitor"]:
+        import kg_monitor
 
-    if dataset == "ERA":
+        monitor = kg_monitor.RunMonitor()
+    # endif
+    codes = classify_tile(job["mon_TAS"], job["mon_PRC"], job["typ_classification"], rows, cols,
+                          sum_strt=job["sum_strt"], monitor=monitor)
+    shm = shared_memory.SharedMemory(name=job["shm_name"])
+    try:
+        with _stage(monitor, "write"):
+            np.ndarray(job["shape"], dtype=np.uint8, buffer=shm.buf)[rows, cols] = codes
+        # end with
+    finally:
+        shm.close()
+    # end try
+    # Timers and counts of the tile, merged into the monitor of the parent
+    return None if monitor is None else monitor.get_counters()
+# end def _classify_tile_shared
+
+def _get_parallel_tile_shape(shape, workers, max_memory):
+    # Latitude bands within the memory budget, at least four per worker to balance the load
+    rows_budget = next(iter_tiles(shape, max_memory=max_memory))[0]
+    rows = min(rows_budget.stop - rows_budget.start, max(-(-shape[0] // (4 * workers)), 1))
+    if rows_budget.stop - rows_budget.start == 1:
+        cols = next(iter_tiles(shape, max_memory=max_memory))[1]
+        return 1, cols.stop - cols.start
+    # endif
+    return rows, shape[1]
+# end def _get_parallel_tile_shape
 
-        P_smax, P_smin, P_ssum = get_maxminsum_Slice(mon_PRC, indx_l=3, indx_h=9)  # N_Summer
-        P_wmax, P_wmin, P_wsum = get_maxminsum_Slice(mon_PRC, indx_l=-3, indx_h=3)  # N_Winter
+def classify_parallel(mon_TAS, mon_PRC, typ_classification, sum_strt=3, workers=None, max_memory=2**28,
+                      tile_shape=None, out=None, processes=False, monitor=None, io_lock=None):
+    """
+    Class map of a grid, tiles classified concurrently by several workers.
 
-        exchange_tabs(P_smax[indx_equ:, :],
-                      P_wmax[indx_equ:, :])  # exchange data south of the equator to match definition of arrays
-        exchange_tabs(P_smin[indx_equ:, :], P_wmin[indx_equ:, :])
-        exchange_tabs(P_ssum[indx_equ:, :], P_wsum[indx_equ:, :])
+    Parameters
+    ----------
+    mon_TAS, mon_PRC, typ_classification, sum_strt, tile_shape, out : as in classify_tiled
+    workers : number of workers, os.cpu_count() if None
+    max_memory : peak memory budget of one tile in bytes, the total is about workers * max_memory
+    processes : False uses a thread pool, the NumPy kernels releasing the GIL. The reads from
+                mon_TAS and mon_PRC and the writes to out all go through io_lock, one at a
+                time, as the HDF5 library behind netCDF is not thread-safe: netCDF inputs and
+                outputs are safe as long as any other thread using them holds io_lock too.
+                True forks worker processes that inherit the inputs and write into a
+                shared-memory output, nothing large is pickled. Only for in-memory arrays
+                or memmaps, on platforms with fork.
+    monitor : kg_monitor.RunMonitor, as in classify_tiled; its timers add up the time of all the workers
+    io_lock : lock serializing the input / output calls of the threads, a new one if None
+
+    Threads only pay off with several cores and when the predictors and classification
+    outweigh the serialized reads and writes (netCDF decompression and decoding happen
+    under io_lock), for instance with in-memory or memmap inputs. On a single core, or
+    when reading dominates, classify_tiled is as fast or faster: kg_bench --scaling
+    measures both on the machine at hand.
+
+    Returns
+    -------
+    out, with 0 where no class is defined
+    """
+    shape = mon_TAS.shape[1:]
+    workers = workers or os.cpu_count() or 1
+    if tile_shape is None:
+        tile_shape = _get_parallel_tile_shape(shape, workers, max_memory)
+    # endif
+    tiles = list(iter_tiles(shape, tile_shape=tile_shape))
+    if out is None:
+        out = np.zeros(shape, dtype=np.uint8)
+    # endif
+    if monitor is not None:
+        monitor.set_tiles(len(tiles))
+    # endif
 
-    elif dataset == "CRU" or dataset == "subgrid":
+    if processes:
+        import multiprocessing as mp
+        from multiprocessing import shared_memory
+
+        shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)), 1))
+        try:
+            _parallel_job.update(mon_TAS=mon_TAS, mon_PRC=mon_PRC, typ_classification=typ_classification,
+                                 sum_strt=sum_strt, shm_name=shm.name, shape=shape, monitor=monitor is not None)
+            with mp.get_context("fork").Pool(workers) as pool:
+                for counters in pool.imap_unordered(_classify_tile_shared, tiles):
+                    if monitor is not None:
+                        monitor.merge(counters)
+                        monitor.tile_done()
+                    # endif
+                # end for
+            # end with
+            with _stage(monitor, "write"):
+                out[...] = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+            # end with
+        finally:
+            _parallel_job.clear()
+            shm.close()
+            shm.unlink()
+        # end try
+        return out
+    # endif
 
-        P_smax, P_smin, P_ssum = get_maxminsum_Slice(mon_PRC, indx_l=3, indx_h=9)  # N_Summer
-        P_wmax, P_wmin, P_wsum = get_maxminsum_Slice(mon_PRC, indx_l=-3, indx_h=3)  # N_Winter
+    if io_lock is None:
+        io_lock = threading.Lock()
+    # endif
 
-        exchange_tabs(P_smax[:indx_equ, :],
-                      P_wmax[:indx_equ, :])  # exchange data south of the equator to match definition of arrays
-        exchange_tabs(P_smin[:indx_equ, :], P_wmin[:indx_equ, :])
-        exchange_tabs(P_ssum[:indx_equ, :], P_wsum[:indx_equ, :])
+    def classify_one(tile):
+        rows, cols = tile
+        with io_lock, _stage(monitor, "load"):
+            tile_TAS = mon_TAS[:, rows, cols]
+            tile_PRC = mon_PRC[:, rows, cols]
+        # end with
+        # The tile is in memory, classified directly so that it is loaded once, as in classify_tiled
+        codes = classify_grid(tile_TAS, tile_PRC, typ_classification,
+                              sum_strt=_get_tile_sum_strt(sum_strt, rows, cols), monitor=monitor)[0].filled(0)
+        with io_lock, _stage(monitor, "write"):
+            out[rows, cols] = codes
+        # end with
+        if monitor is not None:
+            monitor.tile_done()
+        # endif
+    # enddef classify_one
 
-    elif dataset == "AZ" : #  only Europe 
+    from concurrent.futures import ThreadPoolExecutor
 
-        P_smax, P_smin, P_ssum = get_maxminsum_Slice(mon_PRC, indx_l=3, indx_h=9)  # N_Summer
-        P_wmax, P_wmin, P_wsum = get_maxminsum_Slice(mon_PRC, indx_l=-3, indx_h=3)  # N_Winter
-		    
-    # end if
-    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in pool.map(classify_one, tiles):
+            pass
+        # end for
+    # end with
+    return out
+# end def classify_parallel
 
-    # end if
+def classify_windows(mon_TAS, mon_PRC, typ_classification, window=30, stride=1, sum_strt=3, index=None, out=None):
+    """
+    Class maps of the monthly climatologies of sliding windows of years.
 
-    # ~ #  Other version that includes finding the 6 warmest month ...
-    # ~ # T_smooth = lu.smoothD(mon_TAS,window_len=6,window='flat')
-    # ~ # np.roll(T_smooth[:,12,12],6)-T_smooth[:,12,12] gives the maximum difference (D.Paillard) of the shifted 6 months
-    # ~ # np.argmax(np.roll(T_smooth[:,12,12],6)-T_smooth[:,12,12]) gives summer/winter month (2 before, 3 after)
+    The climatologies are running sums over the years of the window, updated by
+    adding the years entering and removing the years leaving, so the cost of a
+    window does not grow with its length. Only the cells of index are kept in memory.
 
-    # ~ T_smooth = lu.smoothD(mon_TAS,window_len=6,window='flat')
+    Parameters
+    ----------
+    mon_TAS, mon_PRC : monthly data of shape (years, 12, ny, nx), in C and mm/month,
+                       or anything returning (12, ny, nx) arrays when indexed by year
+    typ_classification : "kottek", "peel", "cannon" or "trewartha"
+    window : number of years of each climatology
+    stride : number of years between the starts of two windows
+    sum_strt : as in get_predictors
+    index : flat indices of the cells to classify, by default the valid cells of the first year
+    out : (windows, ny, nx) array receiving the uint8 codes window by window (for instance
+          a zarr or NetCDF stack from kg_io.open_KG_output), created if None
+
+    Returns
+    -------
+    out, window i covering the years i*stride to i*stride+window-1, 0 where no class is defined
+    """
+    years = mon_TAS.shape[0]
+    shape = mon_TAS.shape[2:]
+    if window > years:
+        raise ValueError("Window of %d years longer than the %d years of data" % (window, years))
+    # endif
+    if index is None:
+        index = get_valid_index(get_valid_mask(mon_TAS[0], mon_PRC[0]))
+    # endif
+    sum_strt = get_cell_sum_strt(sum_strt, shape, index)
 
-    # ~ # Then, start of summer should be something like:
-    # ~ # ma.argmin(np.roll(T_smooth[:,i,j],6)-T_smooth[:,i,j])-2
-    # ~ # And the end of the summer should be three months afterwards:
-    # ~ # ma.argmin(np.roll(T_smooth[:,i,j],6)-T_smooth[:,i,j])+3
+    starts = range(0, years - window + 1, stride)
+    if out is None:
+        out = np.zeros((len(starts),) + shape, dtype=np.uint8)
+    # endif
+    KG_flat = np.zeros(int(np.prod(shape)), dtype=np.uint8)
+
+    # Running sums of the valid values and counts of the missing ones
+    sums = [np.zeros((12, index.size)) for _ in range(2)]
+    n_bad = np.zeros((12, index.size), dtype=np.int32)
+
+    def add_year(year, sign):
+        for var, mon_var in zip(sums, (mon_TAS, mon_PRC)):
+            cells = gather_cells(mon_var[year], index)
+            bad = np.isnan(cells)
+            cells[bad] = 0.0
+            var += sign * cells
+            n_bad[...] += sign * bad
+        # end for
+    # enddef add_year
+
+    for i_win, start in enumerate(starts):
+        if i_win == 0 or stride >= window:
+            for var in sums:
+                var.fill(0.0)
+            # end for
+            n_bad.fill(0)
+            entering = range(start, start + window)
+            leaving = range(0)
+        else:
+            entering = range(start + window - stride, start + window)
+            leaving = range(start - stride, start)
+        # endif
+        for year in leaving:
+            add_year(year, -1)
+        # end for
+        for year in entering:
+            add_year(year, 1)
+        # end for
+
+        clim_TAS, clim_PRC = [np.where(n_bad > 0, np.nan, var / window).astype(np.float32) for var in sums]
+        ARGS, ARGS_valid = get_predictors(clim_TAS, clim_PRC, sum_strt=sum_strt)
+        codes = get_kg_classification_Codes(ARGS, typ_classification)
+        codes[~ARGS_valid] = 0
+        KG_flat[index] = codes
+        out[i_win] = KG_flat.reshape(shape)
+    # end for
 
-    # ~ # Rewriting this in  slicing indexes:
+    return out
+# end def classify_windows
 
-    # ~ summer = ma.argmin(np.roll(T_smooth[:,:,:],6,axis=0)-T_smooth[:,:,:],axis=0)
-    # ~ sum_strt = summer-2
-    # ~ sum_endd = summer+4
+def classify_ensemble(mon_TAS, mon_PRC, typ_classification, sum_strt=3, index=None, member_chunk=4, out=None):
+    """
+    Class maps of all the members of an ensemble on a common grid.
 
-    # ~ summerMA = ma.masked_array(summer,mask=T_smooth[0,...].mask)
+    The valid-cell index and the summer half-year are computed once and shared by
+    all members. Members are processed member_chunk at a time along an extra
+    axis of the predictor block, so memory follows member_chunk, not the ensemble size.
 
-    # ~ var2plot = summerMA
+    Parameters
+    ----------
+    mon_TAS, mon_PRC : monthly data of shape (members, 12, ny, nx), in C and mm/month,
+                       or sequences of (12, ny, nx) members (netCDF variables, ...)
+    typ_classification : "kottek", "peel", "cannon" or "trewartha"
+    sum_strt : as in get_predictors
+    index : flat indices of the cells to classify, by default the valid cells of the first member
+    member_chunk : number of members classified together
+    out : (members, ny, nx) array receiving the uint8 codes, created if None
+
+    Returns
+    -------
+    out, with 0 where no class is defined
+    """
+    members = len(mon_TAS)
+    shape = mon_TAS[0].shape[1:]
+    if index is None:
+        index = get_valid_index(get_valid_mask(mon_TAS[0], mon_PRC[0]))
+    # endif
+    if not isinstance(sum_strt, str) and np.ndim(sum_strt) > 0:
+        # Cells along the last axis of the (12, members, cells) chunks
+        sum_strt = get_cell_sum_strt(sum_strt, shape, index)[np.newaxis]
+    # endif
+    if out is None:
+        out = np.zeros((members,) + shape, dtype=np.uint8)
+    # endif
 
-    # ~ fig = plt.figure(figsize=(10,10))
-    # ~ ax = plt.axes(projection=ccrs.PlateCarree())
+    for first in range(0, members, member_chunk):
+        chunk = range(first, min(first + member_chunk, members))
+        # (12, members of the chunk, cells)
+        chunk_TAS = np.stack([gather_cells(mon_TAS[member], index) for member in chunk], axis=1)
+        chunk_PRC = np.stack([gather_cells(mon_PRC[member], index) for member in chunk], axis=1)
+        ARGS, ARGS_valid = get_predictors(chunk_TAS, chunk_PRC, sum_strt=sum_strt)
+        del chunk_TAS, chunk_PRC
+        codes = get_kg_classification_Codes(ARGS, typ_classification)
+        codes[~ARGS_valid] = 0
+        for i_chunk, member in enumerate(chunk):
+            KG_flat = np.zeros(int(np.prod(shape)), dtype=np.uint8)
+            KG_flat[index] = codes[i_chunk]
+            out[member] = KG_flat.reshape(shape)
+        # end for
+    # end for
+    return out
+# end def classify_ensemble
 
-    # ~ mesh = ax.pcolormesh(lons[:], plot_lats[:], var2plot, transform=ccrs.PlateCarree())
-    # ~ plt.colorbar(mesh, orientation='horizontal', shrink=0.75)
-    # ~ ax.gridlines()
-    # ~ ax.coastlines()
+def plot_KG_map(KG_map, lons, lats, typ_classification, path=None):
+    """
+    Map of the classes with the colors and labels of the classification type.
+    Shown on screen, or saved to path if given.
+    """
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs
 
-    P_th = ma.zeros(mon_TAS[0, ...].shape)
+    var2plot = ma.masked_equal(KG_map, 0)
 
-    P_wpro = P_wsum / P_ann
-    P_spro = P_ssum / P_ann
+    # Labels and colors are only needed for the plot
+    the_chosen_map = CKG.get_KG_cmap(typ_classification)
+    KG_labels = CKG.get_KG_labels(typ_classification)
 
-    var_1 = ma.where(P_wpro >= 2. / 3., 2. * T_ann, 0.0)
-    var_2 = ma.where(P_spro >= 2. / 3., 2. * T_ann + 28.0, 0.0)
+    fig = plt.figure(figsize=(10, 10))
+    ax = plt.axes(projection=ccrs.PlateCarree())
+    varmin = min(KG_labels.keys())-0.5
+    varmax = max(KG_labels.keys())+0.5
 
-    P_th = ma.where((var_1 + var_2) <= 0.0, 2 * T_ann + 14.0, var_1 + var_2)
+    mesh = ax.pcolormesh(lons[:], lats[:], var2plot, cmap=the_chosen_map, transform=ccrs.PlateCarree(),vmin=varmin, vmax=varmax)
+    cbar = plt.colorbar(mesh, orientation='horizontal', shrink=1.25)
 
-    KG_map = ma.zeros(P_th.shape, np.int)
-    KG_map.mask = True  #  (T_max.mask+P_max.mask)
+    cbar.set_ticks(sorted(KG_labels.keys()))
+    cbar.set_ticklabels([KG_labels[code] for code in sorted(KG_labels.keys())], fontsize=8, weight='bold')
 
+    ax.gridlines()
+    ax.coastlines()
 
-    match typ_classification:
-        case "kottek":
-           # ~ Colormap for KG in Kottek et al., 2007
-           KG_dict, the_chosen_map = CKG.KG_cmap_2006()           
-        case "peel":
-           # ~ Colormap for KG in Peel et al., 2007
-           KG_dict, the_chosen_map = CKG.KG_cmap_2007() 
-        case "cannon":
-           # ~ Colormap for KG in Cannon, 2012
-           KG_dict, the_chosen_map = CKG.KG_cmap_2012()
-        case "trewartha":
-           # ~ Colormap for Trewartha in Belda, 2014
-           KG_dict, the_chosen_map = CKG.KG_cmap_2014()
-        case _:
-           sys.exit('Unkown classification request')   
-    #end match
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path)
+        plt.close(fig)
+    # endif
+# end def plot_KG_map
 
-    # ~ widgets = [PB.Bar('>'), ' ', PB.ETA(), ' ', PB.ReverseBar('<')]
-    # ~ widgets = [PB.SimpleProgress()]
-    # ~ widgets = ['Test: ', PB.Percentage(), ' ', PB.Bar(marker=PB.RotatingMarker()),' ', PB.ETA(), ' ', PB.FileTransferSpeed()]
-    widgets = [PB.Percentage(), PB.Bar()]
 
-    init_shape = T_min.shape
+if __name__ == "__main__":
+	
+    typ_classification = "trewartha"
 
-    Asize = T_min.size
+    print("This is Koeppen-Geiger classifications, version", __version__, "type == ", typ_classification)
 
-    ARGS = ma.zeros((13, Asize))
+    # ~ import regriding_to as RT
+    # ~ var_temp = "tas"
+    # ~ varOut = RT.reGrid_to(tas_File,var_temp,prc_File,varForGrid=var_Grid,outFile="/home/roche/Soft-Devel/scripts/python/iloveclim-and-clim/tas_pcmdi-metrics_Amon_ERAINT_198901-200911-clim-GPCPGrid.nc")
 
-    ARGS[0, :] = T_min.flatten()
-    ARGS[1, :] = T_max.flatten()
-    ARGS[2, :] = T_mon.flatten()
-    ARGS[3, :] = T_ann.flatten()
-    ARGS[4, :] = P_min.flatten()
-    ARGS[5, :] = P_ann.flatten()
-    ARGS[6, :] = P_smin.flatten()
-    ARGS[7, :] = P_smax.flatten()
-    ARGS[8, :] = P_wmin.flatten()
-    ARGS[9, :] = P_wmax.flatten()
-    ARGS[10, :] = P_th.flatten()
-    ARGS[11, :] = P_wpro.flatten()
-    ARGS[12, :] = P_dry.flatten()
+    import kg_io
 
-    KG_MAP = KG_map.flatten()
+    dataset = "CRU"  # or "ERA", "subgrid", "AZ", see the profiles directory
 
-    pbar = PB.ProgressBar(widgets=widgets, maxval=Asize).start()
+    # Monthly inputs are lazy views, read tile by tile in C and mm/month
+    profile = kg_io.read_profile("profiles/%s.json" % dataset)
+    mon_TAS, mon_PRC, lats, lons, season = kg_io.open_profile(profile)
+    plot_lats = lats
 
     start_time = time.time()
 
-    for i in range(Asize):
-        if  not ARGS.mask[4,i] and not ARGS.mask[0,i] :
-            match typ_classification:
-                case "kottek":
-                    # ~ Koeppen-Geiger in the Peel or Kottek versions
-                    KG_MAP[i] = KG_dict[get_kg_classification(ARGS[:, i], vers=typ_classification)]
-                case "peel":
-                    # ~ Koeppen-Geiger in the Peel or Kottek versions
-                    KG_MAP[i] = KG_dict[get_kg_classification(ARGS[:, i], vers=typ_classification)]
-                case "cannon":			
-                    # ~ Cannon verified -- 2022-02-17
-                    KG_MAP[i] = KG_dict[get_kg_classification_Cannon(ARGS[:,i])]
-                case "trewartha":
-                    # ~ Trewartha verified -- 2022-02-17
-                    KG_MAP[i] = KG_dict[get_kg_classification_Trewartha(ARGS[:, i])]
-            #end match
-        # endif
-        pbar.update(i)
-    # end for
+    if typ_classification not in CKG.KG_schemes:
+        sys.exit('Unkown classification request')
+    # endif
 
-    KG_map = KG_MAP.reshape(init_shape)
+    # First month of the summer half-year of each row (or cell) for the season mode
+    sum_strt = get_sum_strt(season, plot_lats[:])
 
-    pbar.finish()
+    # Predictors and classes tile by tile, on the valid cells only
+    tile_shape = kg_io.get_aligned_tile_shape(mon_TAS.shape[1:], mon_TAS.chunks, max_memory=2**30)
+    KG_map = classify_tiled(mon_TAS, mon_PRC, typ_classification, sum_strt=sum_strt, tile_shape=tile_shape)
+    KG_map = ma.masked_equal(KG_map, 0)
 
     print("--- %s seconds ---" % (time.time() - start_time))
 
-    var2plot = KG_map
-
-    fig = plt.figure(figsize=(10, 10))
-    ax = plt.axes(projection=ccrs.PlateCarree())
-    varmin = np.min(np.array(list(KG_dict.values())))-0.5
-    varmax = np.max(np.array(list(KG_dict.values())))+0.5
-    
-    mesh = ax.pcolormesh(lons[:], plot_lats[:], var2plot, cmap=the_chosen_map, transform=ccrs.PlateCarree(),vmin=varmin, vmax=varmax)
-    # ~ mesh = ax.pcolormesh(lons[:], plot_lats[:], P_wpro , transform=ccrs.PlateCarree())
-    cbar = plt.colorbar(mesh, orientation='horizontal', shrink=1.25)
-
-    cbar.set_ticks(np.arange(len(KG_dict.values()))+1.0)
-    cbar.set_ticklabels(KG_dict.keys(), fontsize=8, weight='bold')
-		
-    ax.gridlines()
-    ax.coastlines()
-
-    plt.show()
+    plot_KG_map(KG_map, lons, plot_lats, typ_classification)
 # endif on main
 
 # The End of All Things (op. cit.)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# The modules of the repository are flat, importable from its root
+
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+# endif
+
+
+def write_era_like(directory, ny=37, nx=72, seed=0):
+    """
+    ERA-interim-like monthly inputs in directory: t2m in K and tp in m/day, chunked and
+    compressed, descending latitudes, a few missing values. Returns the path of their profile.
+    """
+    import netCDF4
+
+    rng = np.random.default_rng(seed)
+    lats = np.linspace(90.0, -90.0, ny)
+    lons = np.arange(nx) * 360.0 / nx
+    t2m = 273.15 + rng.uniform(-40.0, 30.0, (ny, nx)) + rng.uniform(-15.0, 15.0, (12, ny, nx))
+    tp = rng.uniform(0.0, 1.0, (12, ny, nx)) ** 2 * rng.uniform(0.0, 0.04, (ny, nx))
+    tp[:, :2, :3] = 1e+20
+    for name, data in (("t2m", t2m), ("tp", tp)):
+        with netCDF4.Dataset(os.path.join(directory, name + ".nc"), "w") as dataset:
+            dataset.createDimension("time", 12)
+            dataset.createDimension("latitude", ny)
+            dataset.createDimension("longitude", nx)
+            dataset.createVariable("latitude", "f8", ("latitude",))[:] = lats
+            dataset.createVariable("longitude", "f8", ("longitude",))[:] = lons
+            dataset.createVariable(name, "f4", ("time", "latitude", "longitude"), zlib=True,
+                                   chunksizes=(1, 8, 24))[:] = data
+        # end with
+    # end for
+    profile = {
+        "name": "E",
+        "tas": {"path": os.path.join(directory, "t2m.nc"), "var": "t2m", "lat": "latitude", "lon": "longitude",
+                "offset": -273.15},
+        "prc": {"path": os.path.join(directory, "tp.nc"), "var": "tp", "fill_value": 1e+20, "scale": 12000.0},
+        "season": "hemisphere",
+    }
+    path = os.path.join(directory, "E.json")
+    with open(path, "w") as profile_file:
+        json.dump(profile, profile_file)
+    # end with
+    return path
+# end def write_era_like
+
+@pytest.fixture
+def era_profile(tmp_path):
+    pytest.importorskip("netCDF4")
+    return write_era_like(str(tmp_path))
+# end def era_profile
+
+# The End of All Things (op. cit.)
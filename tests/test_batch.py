@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import kg_batch
+import kg_io
+import koeppen_geiger as KG
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_FORMAT_MODULES = {"nc": "netCDF4", "zarr": "zarr", "tif": "rasterio", "npz": None}
+
+
+def read_KG_output(path):
+    # uint8 class map of a file written by kg_batch, rows as in the inputs
+    match os.path.splitext(path)[1]:
+        case ".nc":
+            import netCDF4
+
+            with netCDF4.Dataset(path) as dataset:
+                return np.ma.filled(dataset["KG"][:], 0)
+            # end with
+        case ".zarr":
+            import zarr
+
+            return np.asarray(zarr.open_group(path, mode="r")["KG"][:])
+        case ".tif":
+            import rasterio
+
+            with rasterio.open(path) as dataset:
+                return dataset.read(1)
+            # end with
+        case ".npz":
+            with np.load(path) as data:
+                return data["KG_map"]
+            # end with
+    #end match
+    raise ValueError(path)
+# end def read_KG_output
+
+def _expected(profile_path, typ_classification):
+    mon_TAS, mon_PRC, lats, lons, season = kg_io.open_profile(kg_io.read_profile(profile_path))
+    try:
+        return KG.classify_tiled(mon_TAS, mon_PRC, typ_classification, sum_strt=KG.get_sum_strt(season, lats))
+    finally:
+        mon_TAS.close()
+        mon_PRC.close()
+    # end try
+# end def _expected
+
+def test_parse_run():
+    assert kg_batch.parse_run("a/b.json:peel,cannon") == ("a/b.json", ["peel", "cannon"])
+# end def test_parse_run
+
+@pytest.mark.parametrize("output_format", sorted(_FORMAT_MODULES))
+def test_cli_with_several_workers(era_profile, tmp_path, output_format):
+    if _FORMAT_MODULES[output_format]:
+        pytest.importorskip(_FORMAT_MODULES[output_format])
+    # endif
+    output_dir = str(tmp_path / "out")
+    # Small tiles, so that the threads read and write many times concurrently
+    command = [sys.executable, os.path.join(ROOT, "kg_batch.py"), era_profile + ":peel,cannon", "-o", output_dir,
+               "--workers", "3", "--max-memory", "0.02", "--format", output_format,
+               "--metrics", str(tmp_path / "metrics.json")]
+    subprocess.run(command, cwd=str(tmp_path), env=dict(os.environ, PYTHONPATH=ROOT), check=True,
+                   capture_output=True, text=True)
+    for typ_classification in ("peel", "cannon"):
+        got = read_KG_output(os.path.join(output_dir, "E_%s.%s" % (typ_classification, output_format)))
+        np.testing.assert_array_equal(got, _expected(era_profile, typ_classification))
+    # end for
+    assert os.path.exists(tmp_path / "metrics.json")
+# end def test_cli_with_several_workers
+
+def test_run_profile_serial(era_profile, tmp_path):
+    written = kg_batch.run_profile(kg_io.read_profile(era_profile), ["kottek"], output_dir=str(tmp_path),
+                                   output_format="npz")
+    assert written == [os.path.join(str(tmp_path), "E_kottek.npz")]
+    KG_map = read_KG_output(written[0])
+    np.testing.assert_array_equal(KG_map, _expected(era_profile, "kottek"))
+    assert (KG_map[:2, :3] == 0).all()
+# end def test_run_profile_serial
+
+def test_shared_times_counted_once(era_profile, tmp_path):
+    monitors = []
+    kg_batch.run_profile(kg_io.read_profile(era_profile), ["kottek", "peel", "cannon"], output_dir=str(tmp_path),
+                         output_format="npz", monitors=monitors)
+    assert [monitor.typ_classification for monitor in monitors] == ["kottek", "peel", "cannon"]
+    # Same runs on the same inputs, but only the first one opens the profile
+    for name in ("load", "seasons"):
+        calls = [monitor.stages[name][1] for monitor in monitors]
+        assert calls == [calls[1] + 1, calls[1], calls[1]]
+    # end for
+# end def test_shared_times_counted_once
+
+def test_runs_file_comments(era_profile, tmp_path):
+    runs_path = str(tmp_path / "runs.txt")
+    with open(runs_path, "w") as runs_file:
+        runs_file.write("# ERA-interim\n\n    # indented comment\n  %s:kottek  \n" % era_profile)
+    # end with
+    output_dir = str(tmp_path / "out")
+    assert kg_batch.main(["--runs-file", runs_path, "-o", output_dir, "--format", "npz"]) == 0
+    assert os.listdir(output_dir) == ["E_kottek.npz"]
+# end def test_runs_file_comments
+
+# The End of All Things (op. cit.)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import json
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import kg_bench
+import koeppen_geiger as KG
+
+
+def test_synthetic_blocks_are_consistent():
+    mon_TAS, mon_PRC, lats, lons = kg_bench.synthetic_climatology(36, 72, seed=1)
+    assert mon_TAS.shape == mon_PRC.shape == (12, 36, 72)
+    TAS = mon_TAS[:]
+    assert TAS.dtype == np.float32
+    # The same cell gets the same value, whatever the slicing
+    np.testing.assert_array_equal(mon_TAS[3, 5:20:3, ::-2], TAS[3, 5:20:3, ::-2])
+    np.testing.assert_array_equal(mon_TAS[..., 7], TAS[..., 7])
+    np.testing.assert_array_equal(mon_PRC[:, 10], mon_PRC[:][:, 10])
+    np.testing.assert_array_equal(kg_bench.synthetic_climatology(36, 72, seed=1)[1][:], mon_PRC[:])
+    ocean = np.isnan(TAS[0])
+    assert 0.25 < ocean.mean() < 0.35
+    np.testing.assert_array_equal(np.isnan(mon_PRC[5]), ocean)
+    assert (mon_PRC[:][:, ~ocean] >= 0).all()
+    assert lats[0] > 0 > lats[-1] and lons[0] < 0 < lons[-1]
+# end def test_synthetic_blocks_are_consistent
+
+@pytest.mark.parametrize("typ_classification", ["kottek", "peel", "cannon", "trewartha"])
+def test_every_class_is_reached_at_1_deg(typ_classification):
+    mon_TAS, mon_PRC, lats, lons = kg_bench.synthetic_climatology(180, 360)
+    KG_map = KG.classify_tiled(mon_TAS, mon_PRC, typ_classification, sum_strt=KG.get_sum_strt("hemisphere", lats))
+    assert kg_bench.get_missing_classes(KG_map, typ_classification) == []
+# end def test_every_class_is_reached_at_1_deg
+
+def test_sizes_and_worker_counts():
+    assert kg_bench.parse_size("1") == ("1deg", 180, 360)
+    assert kg_bench.parse_size("0.25") == ("0.25deg", 720, 1440)
+    assert kg_bench.parse_size("1km") == ("1km", 21600, 43200)
+    assert kg_bench.get_worker_counts(1) == [1]
+    assert kg_bench.get_worker_counts(8) == [1, 2, 4, 8]
+    assert kg_bench.get_worker_counts(6) == [1, 2, 4, 6]
+# end def test_sizes_and_worker_counts
+
+def test_measure():
+    calls = []
+
+    def ones(n):
+        calls.append(tracemalloc.is_tracing())
+        return np.ones(n)
+    # end def ones
+
+    result, elapsed, peak = kg_bench.measure(ones, 2**20)
+    assert result.size == 2**20 and elapsed >= 0
+    assert peak >= result.nbytes
+    # Timed call untraced, traced call apart, tracing stopped as found
+    assert calls == [False, True] and not tracemalloc.is_tracing()
+    tracemalloc.start()
+    try:
+        peak = kg_bench.measure(ones, 2**20)[2]
+        assert tracemalloc.is_tracing()
+        assert result.nbytes <= peak < 2 * result.nbytes
+    finally:
+        tracemalloc.stop()
+    # end try
+# end def test_measure
+
+def test_fits_in_memory():
+    assert kg_bench.fits_in_memory((18, 36), 2**30)
+    assert not kg_bench.fits_in_memory((18, 36), 2**10)
+# end def test_fits_in_memory
+
+def test_writers_timed_beyond_max_memory():
+    pytest.importorskip("netCDF4")
+    lines = []
+    records = kg_bench.bench_size("10", ["trewartha"], ["tiled"], ["npz", "nc"], max_memory=2**16, report=lines.append)
+    assert [entry["benchmark"] for entry in records] == ["write_nc", "tiled_trewartha"]
+    assert 0 < records[0]["seconds"] and records[0]["cells"] == 18 * 36
+    assert any("write_npz" in line and "skipped" in line for line in lines)
+    # Columns aligned, whatever the length of the names
+    timed = [line for line in lines if "cells/s" in line]
+    assert len(timed) == 2 and len({line.index(" cells ") for line in timed}) == 1
+# end def test_writers_timed_beyond_max_memory
+
+def test_compare():
+    baseline = [{"size": "1deg", "benchmark": "tiled_kottek", "cells_per_second": 100.0},
+                {"size": "1deg", "benchmark": "predictors", "cells_per_second": 100.0}]
+    records = [{"size": "1deg", "benchmark": "tiled_kottek", "cells_per_second": 79.0},
+               {"size": "1deg", "benchmark": "predictors", "cells_per_second": 81.0},
+               {"size": "1deg", "benchmark": "write_nc", "cells_per_second": 1.0}]
+    assert kg_bench.compare(records, baseline) == [(records[0], baseline[0])]
+    assert kg_bench.compare(records, baseline, tolerance=0.5) == []
+# end def test_compare
+
+def test_main_json_and_baseline(tmp_path):
+    path = str(tmp_path / "bench.json")
+    argv = ["--sizes", "10", "--schemes", "kottek", "--writers", "npz", "--workers", "2", "--json", path]
+    assert kg_bench.main(argv) == 0
+    with open(path) as json_file:
+        results = json.load(json_file)
+    # end with
+    benchmarks = [entry["benchmark"] for entry in results["records"]]
+    assert "predictors" in benchmarks and "write_npz" in benchmarks
+    assert "tiled_kottek" in benchmarks and "parallel_kottek" in benchmarks
+    assert all(entry["shape"] == [18, 36] for entry in results["records"])
+    # A baseline infinitely faster is a regression
+    for entry in results["records"]:
+        entry["cells_per_second"] = float("inf")
+    # end for
+    with open(path, "w") as json_file:
+        json.dump(results, json_file)
+    # end with
+    assert kg_bench.main(["--sizes", "10", "--schemes", "kottek", "--writers", "", "--engines", "tiled",
+                          "--baseline", path]) == 1
+# end def test_main_json_and_baseline
+
+# The End of All Things (op. cit.)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+
+import kg_cache
+import kg_monitor
+import koeppen_geiger as KG
+
+
+def _climatology(seed=0):
+    rng = np.random.default_rng(seed)
+    mon_TAS = (rng.uniform(-20.0, 28.0, (20, 30)) + rng.uniform(-15.0, 15.0, (12, 20, 30))).astype(np.float32)
+    mon_PRC = (rng.uniform(0.0, 1.0, (12, 20, 30)) ** 2 * rng.uniform(0.0, 600.0, (20, 30))).astype(np.float32)
+    mon_TAS[:, :3, :4] = np.nan
+    return mon_TAS, mon_PRC
+# end def _climatology
+
+def test_file_checksums_follow_size_and_mtime(tmp_path, monkeypatch):
+    data_path = tmp_path / "data.bin"
+    data_path.write_bytes(b"0123456789")
+    cache = kg_cache.KGCache(str(tmp_path / "cache"))
+    calls = []
+    monkeypatch.setattr(kg_cache, "hash_file", lambda path: calls.append(path) or "checksum%d" % len(calls))
+    assert cache.hash_file(str(data_path)) == "checksum1"
+    assert kg_cache.KGCache(str(tmp_path / "cache")).hash_file(str(data_path)) == "checksum1"
+    assert len(calls) == 1
+    os.utime(data_path, ns=(0, 10**9))
+    assert cache.hash_file(str(data_path)) == "checksum2"
+    data_path.write_bytes(b"01234567890")
+    os.utime(data_path, ns=(0, 10**9))
+    assert cache.hash_file(str(data_path)) == "checksum3"
+# end def test_file_checksums_follow_size_and_mtime
+
+def test_profile_hash_uses_the_stored_checksums(era_profile, tmp_path):
+    import kg_io
+
+    profile = kg_io.read_profile(era_profile)
+    cache = kg_cache.KGCache(str(tmp_path / "cache"))
+    assert kg_cache.hash_profile(profile, hash_file=cache.hash_file) == kg_cache.hash_profile(profile)
+    assert os.path.exists(tmp_path / "cache" / kg_cache.KGCache.CHECKSUMS)
+# end def test_profile_hash_uses_the_stored_checksums
+
+def test_cache_hit_reports_the_counts_of_the_run(tmp_path):
+    mon_TAS, mon_PRC = _climatology()
+    cache = kg_cache.KGCache(str(tmp_path))
+    monitors = [kg_monitor.RunMonitor(typ_classification="cannon") for _ in range(2)]
+    maps = [cache.classify(mon_TAS, mon_PRC, "cannon", monitor=monitor) for monitor in monitors]
+    np.testing.assert_array_equal(maps[0], KG.classify_tiled(mon_TAS, mon_PRC, "cannon"))
+    np.testing.assert_array_equal(maps[1], maps[0])
+    first, second = (monitor.to_dict() for monitor in monitors)
+    assert first["cells"] == second["cells"]
+    assert first["classes"] == second["classes"]
+    assert first["cells"] == {"total": 600, "valid": 588, "masked": 12, "unclassified": 0}
+    assert "classification" in first["stages"] and "classification" not in second["stages"]
+# end def test_cache_hit_reports_the_counts_of_the_run
+
+# The End of All Things (op. cit.)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import create_KG_cmap as CKG
+import kg_verify
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_times(module):
+    # {module: cumulative import time in seconds} of a cold import of module, from python -X importtime
+    probe = subprocess.run([sys.executable, "-X", "importtime", "-c", "import %s" % module], cwd=ROOT,
+                           capture_output=True, text=True, check=True,
+                           env=dict(os.environ, PYTHONPATH=ROOT))
+    times = {}
+    for line in probe.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        # endif
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative_us) / 1e6
+    # end for
+    return times
+# end def _import_times
+
+@pytest.mark.parametrize("module", ["koeppen_geiger", "create_KG_cmap"])
+def test_core_imports_nothing_heavy(module):
+    times = _import_times(module)
+    assert module in times
+    heavy = set(kg_verify.HEAVY_MODULES)
+    loaded = [name for name in times if name in heavy or name.split(".")[0] in heavy]
+    assert loaded == []
+    assert "kg_io" not in times
+# end def test_core_imports_nothing_heavy
+
+def test_core_import_time():
+    # Best of three cold imports, NumPy included
+    best = min(_import_times("koeppen_geiger")["koeppen_geiger"] for _ in range(3))
+    assert best <= kg_verify.IMPORT_BUDGET
+# end def test_core_import_time
+
+@pytest.mark.parametrize("KG_cmap, KG_dict", [(CKG.KG_cmap_2006, CKG.KG_dict_2006), (CKG.KG_cmap_2007, CKG.KG_dict_2007),
+                                              (CKG.KG_cmap_2012, CKG.KG_dict_2012), (CKG.KG_cmap_2014, CKG.KG_dict_2014)])
+def test_colormap_dicts_are_copies(monkeypatch, KG_cmap, KG_dict):
+    # No matplotlib needed, the colormap is a plain list of colors
+    monkeypatch.setattr(CKG, "_ListedColormap", lambda colors, **kwargs: colors)
+    expected = dict(KG_dict)
+    returned = KG_cmap()[0]
+    assert returned == expected and returned is not KG_dict
+    returned.clear()
+    assert KG_dict == expected
+# end def test_colormap_dicts_are_copies
+
+# The End of All Things (op. cit.)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+import pytest
+
+import kg_io
+import kg_monitor
+
+netCDF4 = pytest.importorskip("netCDF4")
+
+
+@pytest.fixture
+def packed_file(tmp_path):
+    # (12, 10, 8) int16 variable with scale_factor, add_offset and _FillValue, chunked by month
+    path = str(tmp_path / "packed.nc")
+    rng = np.random.default_rng(0)
+    decoded = rng.uniform(-30.0, 30.0, (12, 10, 8)).astype(np.float32)
+    with netCDF4.Dataset(path, "w") as dataset:
+        dataset.createDimension("time", 12)
+        dataset.createDimension("lat", 10)
+        dataset.createDimension("lon", 8)
+        dataset.createVariable("lat", "f8", ("lat",))[:] = np.linspace(-45.0, 45.0, 10)
+        dataset.createVariable("lon", "f8", ("lon",))[:] = np.arange(8) * 45.0
+        var = dataset.createVariable("tas", "i2", ("time", "lat", "lon"), fill_value=-32767, chunksizes=(1, 5, 8))
+        var.scale_factor = 0.01
+        var.add_offset = 273.15
+        var.set_auto_maskandscale(False)
+        packed = np.round((decoded + 273.15 - 273.15) / 0.01).astype(np.int16)
+        packed[3, 2, 1] = -32767
+        var[:] = packed
+    # end with
+    expected = packed.astype(np.float32) * np.float32(0.01) + np.float32(273.15) - np.float32(273.15)
+    expected[3, 2, 1] = np.nan
+    return path, expected
+# end def packed_file
+
+def test_ncvar_is_lazy_and_decodes(packed_file):
+    path, expected = packed_file
+    with kg_io.NCVar(path, "tas", lat_name="lat", lon_name="lon", offset=-273.15) as mon_TAS:
+        assert mon_TAS._dataset is None
+        assert mon_TAS.shape == (12, 10, 8)
+        assert mon_TAS.chunks == (1, 5, 8)
+        np.testing.assert_allclose(mon_TAS[:], expected, atol=1e-4)
+        assert np.isnan(mon_TAS[3, 2, 1])
+        np.testing.assert_allclose(mon_TAS[5, 2:7:2, ::-1], expected[5, 2:7:2, ::-1], atol=1e-4)
+        np.testing.assert_allclose(mon_TAS[..., 3], expected[..., 3], atol=1e-4)
+        assert mon_TAS[0].dtype == np.float32
+    # end with
+    assert mon_TAS._dataset is None
+# end def test_ncvar_is_lazy_and_decodes
+
+def test_ncvar_selections(packed_file):
+    path, expected = packed_file
+    mon_TAS = kg_io.NCVar(path, "tas", lat_name="lat", lon_name="lon", lat_range=(-25.0, 25.0),
+                          months=[11, 0, 1], offset=-273.15, valid_min=253.155)
+    try:
+        # Rows of the latitudes closest to -25 and 25: -25 and 25 on the 10-degree grid
+        np.testing.assert_array_equal(mon_TAS.lats, np.linspace(-45.0, 45.0, 10)[2:8])
+        assert mon_TAS.shape == (3, 6, 8)
+        selected = expected[[11, 0, 1], 2:8]
+        # valid_min applies to the decoded Kelvin, before the unit conversion
+        selected[selected < -19.995] = np.nan
+        np.testing.assert_allclose(mon_TAS[:], selected, atol=1e-4)
+        np.testing.assert_allclose(mon_TAS[1], selected[1], atol=1e-4)
+    finally:
+        mon_TAS.close()
+    # end try
+# end def test_ncvar_selections
+
+def test_ncvar_conversion_is_timed(era_profile):
+    profile = kg_io.read_profile(era_profile)
+    mon_TAS, mon_PRC, lats, lons, season = kg_io.open_profile(profile)
+    try:
+        monitor = kg_monitor.RunMonitor()
+        mon_PRC.monitor = monitor
+        prc = mon_PRC[:]
+        assert monitor.stages["convert"][1] == 1
+        assert np.isnan(prc[:, :2, :3]).all() and not np.isnan(prc[:, 2:]).any()
+        assert lats[0] == 90.0 and lons.size == mon_TAS.shape[2]
+        assert season == "hemisphere"
+        assert profile["name"] == os.path.splitext(os.path.basename(era_profile))[0]
+    finally:
+        mon_TAS.close()
+        mon_PRC.close()
+    # end try
+# end def test_ncvar_conversion_is_timed
+
+def test_aligned_tile_shape():
+    # Whole bands of a multiple of the 8 chunk rows, within the memory budget
+    assert kg_io.get_aligned_tile_shape((100, 72), None, max_memory=2**20) == (34, 72)
+    assert kg_io.get_aligned_tile_shape((100, 72), (1, 8, 24), max_memory=2**20) == (32, 72)
+    # Bands thinner than a chunk, or the whole grid, are kept as they are
+    assert kg_io.get_aligned_tile_shape((100, 72), (1, 50, 24), max_memory=2**20) == (34, 72)
+    assert kg_io.get_aligned_tile_shape((100, 72), (1, 8, 24), max_memory=2**30) == (100, 72)
+# end def test_aligned_tile_shape
+
+# The End of All Things (op. cit.)
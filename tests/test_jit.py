@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import ast
+
+import numpy as np
+import pytest
+
+import kg_jit
+import kg_verify
+import koeppen_geiger as KG
+
+SCHEMES = ("kottek", "peel", "cannon", "trewartha")
+
+
+def test_float32_scalars_follow_numpy_2():
+    assert kg_jit.FLOAT32_SCALARS == (np.lib.NumpyVersion(np.__version__) >= "2.0.0")
+# end def test_float32_scalars_follow_numpy_2
+
+def test_numpy_fallback():
+    ARGS = kg_jit.edge_predictors(2000, seed=1)
+    np.testing.assert_array_equal(kg_jit.classify_codes(ARGS, "cannon", backend="numpy"),
+                                  KG.get_kg_classification_Codes(ARGS, "cannon", backend="numpy"))
+    with pytest.raises(ValueError):
+        kg_jit.classify_codes(ARGS, "cannon", backend="fortran")
+    # end with
+# end def test_numpy_fallback
+
+@pytest.mark.parametrize("typ_classification", SCHEMES)
+def test_numba_matches_numpy_on_edge_grids(typ_classification):
+    pytest.importorskip("numba")
+    ARGS = kg_jit.edge_predictors(50000, seed=2)
+    np.testing.assert_array_equal(kg_jit.classify_codes(ARGS, typ_classification, backend="numba"),
+                                  KG.get_kg_classification_Codes(ARGS, typ_classification, backend="numpy"))
+    mon_TAS, mon_PRC = kg_verify.edge_climatology(60, 80, seed=3)
+    ARGS, valid = KG.get_predictors(mon_TAS, mon_PRC, sum_strt=KG.get_sum_strt("hemisphere", np.linspace(89, -89, 60)))
+    np.testing.assert_array_equal(kg_jit.classify_codes(ARGS[:, valid], typ_classification, backend="numba"),
+                                  KG.get_kg_classification_Codes(ARGS[:, valid], typ_classification, backend="numpy"))
+# end def test_numba_matches_numpy_on_edge_grids
+
+def test_broken_rewrite_is_detected(monkeypatch):
+    pytest.importorskip("numba")
+
+    class Float64Constants(ast.NodeTransformer):
+        # Constants left as Python floats: numba computes in float64
+        pass
+    # end class Float64Constants
+
+    monkeypatch.setattr(kg_jit, "_compiled", {})
+    monkeypatch.setattr(kg_jit, "_Float32Constants", Float64Constants)
+    with pytest.raises(RuntimeError, match="differ from the array classifiers"):
+        kg_jit.classify_codes(kg_jit.edge_predictors(10, seed=4), "kottek", backend="numba")
+    # end with
+    # The verification harness reports it as a failed check
+    assert not kg_verify.check_classifiers("kottek", n=100, seed=4)
+# end def test_broken_rewrite_is_detected
+
+def test_kernel_blocks_cover_every_cell(monkeypatch):
+    pytest.importorskip("numba")
+    kernel, table = kg_jit._get_kernel("cannon")
+    received = []
+
+    def recording_kernel(ARGS, labels, codes, out):
+        received.append(ARGS)
+        kernel(ARGS, labels, codes, out)
+    # end def recording_kernel
+
+    monkeypatch.setitem(kg_jit._compiled, "cannon", (recording_kernel, table))
+    # Two whole blocks and a partial one
+    n_cells = 2 * kg_jit._BLOCK_CELLS + 7
+    ARGS = kg_jit.edge_predictors(n_cells, seed=5)
+    np.testing.assert_array_equal(kg_jit.classify_codes(ARGS.reshape(13, 1, n_cells), "cannon", backend="numba"),
+                                  KG.get_kg_classification_Codes(ARGS, "cannon", backend="numpy").reshape(1, n_cells))
+    assert received[0].shape == (13, n_cells) and received[0].flags.c_contiguous
+# end def test_kernel_blocks_cover_every_cell
+
+# The End of All Things (op. cit.)
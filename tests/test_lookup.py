@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+import kg_lookup
+
+
+def _rotated_grid(ny, nx, pole_lat=40.0):
+    # Cell centres of a rotated-pole grid, 2-D latitudes and longitudes
+    rotated_lats, rotated_lons = np.meshgrid(np.linspace(-60.0, 60.0, ny), np.linspace(-100.0, 100.0, nx),
+                                             indexing="ij")
+    points = kg_lookup._to_unit_vectors(rotated_lats, rotated_lons)
+    angle = np.radians(90.0 - pole_lat)
+    rotation = np.array([[np.cos(angle), 0.0, np.sin(angle)], [0.0, 1.0, 0.0], [-np.sin(angle), 0.0, np.cos(angle)]])
+    points = points @ rotation.T
+    lats = np.degrees(np.arcsin(np.clip(points[..., 2], -1.0, 1.0)))
+    return lats, np.degrees(np.arctan2(points[..., 1], points[..., 0]))
+# end def _rotated_grid
+
+def _brute_force(lats, lons, query_lats, query_lons):
+    # Flat index of the nearest centre of each query
+    centres = kg_lookup._to_unit_vectors(lats, lons).reshape(-1, 3)
+    queries = kg_lookup._to_unit_vectors(query_lats, query_lons)
+    return np.linalg.norm(queries[:, np.newaxis] - centres[np.newaxis], axis=-1).argmin(axis=1)
+# end def _brute_force
+
+def test_regular_axes():
+    lats = np.linspace(89.5, -89.5, 180)
+    lons = np.arange(0.5, 360.0, 1.0)
+    KG_map = np.arange(180 * 360).reshape(180, 360) % 30 + 1
+    lookup = kg_lookup.KGLookup(KG_map, lats, lons)
+    np.testing.assert_array_equal(lookup.lookup([48.85, -33.9, 89.9], [2.35, -18.4 + 360.0, 359.9]),
+                                  KG_map[[41, 123, 0], [2, 341, 359]])
+# end def test_regular_axes
+
+def test_curvilinear_grid_nearest_centre():
+    lats, lons = _rotated_grid(30, 50)
+    KG_map = (np.arange(30 * 50).reshape(30, 50) % 250 + 1).astype(np.uint8)
+    lookup = kg_lookup.KGLookup(KG_map, lats, lons)
+    rng = np.random.default_rng(0)
+    query_lats = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, 3000)))
+    query_lons = rng.uniform(-180.0, 180.0, 3000)
+    rows, cols, inside = lookup.index(query_lats, query_lons)
+    assert 0 < inside.sum() < inside.size
+    nearest = _brute_force(lats, lons, query_lats, query_lons)
+    np.testing.assert_array_equal(np.ravel_multi_index((rows, cols), KG_map.shape)[inside], nearest[inside])
+    codes = lookup.lookup(query_lats, query_lons)
+    assert (codes[~inside] == 0).all()
+    np.testing.assert_array_equal(codes[inside], KG_map.reshape(-1)[nearest[inside]])
+    # Cell centres fall on their own cell, longitudes in any convention
+    np.testing.assert_array_equal(lookup.lookup(lats, lons + 360.0), KG_map)
+# end def test_curvilinear_grid_nearest_centre
+
+def test_curvilinear_grid_save_load(tmp_path):
+    lats, lons = _rotated_grid(12, 16)
+    KG_map = np.ma.masked_equal(np.arange(12 * 16).reshape(12, 16) % 5, 0)
+    lookup = kg_lookup.KGLookup(KG_map, lats, lons, "kottek")
+    lookup.save(str(tmp_path / "lookup.npz"))
+    loaded = kg_lookup.KGLookup.load(str(tmp_path / "lookup.npz"))
+    assert loaded.lats.shape == (12, 16)
+    np.testing.assert_array_equal(loaded.lookup(lats, lons), KG_map.filled(0))
+    assert loaded.labels(lats[0, 0], lons[0, 0]) == ""
+# end def test_curvilinear_grid_save_load
+
+@pytest.mark.parametrize("grid", ["regular", "irregular", "curvilinear"])
+def test_load_does_not_rebuild_the_index(tmp_path, monkeypatch, grid):
+    if grid == "curvilinear":
+        lats, lons = _rotated_grid(30, 50)
+    else:
+        lats, lons = np.linspace(60.0, -60.0, 30), np.arange(-100.0, 100.0, 4.0)
+        if grid == "irregular":
+            lats = np.sin(np.radians(lats)) * 60.0
+        # endif
+    # endif
+    KG_map = (np.arange(30 * 50).reshape(30, 50) % 30 + 1).astype(np.uint8)
+    lookup = kg_lookup.KGLookup(KG_map, lats, lons, "kottek")
+    if grid != "curvilinear":
+        assert lookup._lat_axis.regular == (grid == "regular")
+    # endif
+    lookup.save(str(tmp_path / "lookup.npz"))
+
+    def rebuild(*args, **kwargs):
+        raise AssertionError("index rebuilt by load")
+    # end def rebuild
+
+    monkeypatch.setattr(kg_lookup._Axis, "__init__", rebuild)
+    monkeypatch.setattr(kg_lookup._CellIndex, "__init__", rebuild)
+    loaded = kg_lookup.KGLookup.load(str(tmp_path / "lookup.npz"))
+    rng = np.random.default_rng(1)
+    query_lats, query_lons = rng.uniform(-70.0, 70.0, 2000), rng.uniform(-180.0, 180.0, 2000)
+    for expected, result in zip(lookup.index(query_lats, query_lons), loaded.index(query_lats, query_lons)):
+        np.testing.assert_array_equal(result, expected)
+    # end for
+    np.testing.assert_array_equal(loaded.lats, lookup.lats)
+    assert loaded.labels(query_lats, query_lons).tolist() == lookup.labels(query_lats, query_lons).tolist()
+# end def test_load_does_not_rebuild_the_index
+
+def test_load_of_a_file_of_the_map_and_axes(tmp_path):
+    lats, lons = np.linspace(89.5, -89.5, 180), np.arange(0.5, 360.0, 1.0)
+    KG_map = (np.arange(180 * 360).reshape(180, 360) % 30 + 1).astype(np.uint8)
+    np.savez(str(tmp_path / "lookup.npz"), KG_map=KG_map, lats=lats, lons=lons, typ_classification=np.array(""))
+    loaded = kg_lookup.KGLookup.load(str(tmp_path / "lookup.npz"))
+    assert loaded.typ_classification is None
+    np.testing.assert_array_equal(loaded.lookup(lats[:, None], lons[None, :]), KG_map)
+# end def test_load_of_a_file_of_the_map_and_axes
+
+@pytest.mark.parametrize("lat_shape, lon_shape", [((12, 16), (16,)), ((16, 12), (16, 12)), ((12,), (12, 16))])
+def test_mismatched_coordinates_are_rejected(lat_shape, lon_shape):
+    with pytest.raises(ValueError, match="1-D axes"):
+        kg_lookup.KGLookup(np.zeros((12, 16), dtype=np.uint8), np.zeros(lat_shape), np.zeros(lon_shape))
+    # end with
+# end def test_mismatched_coordinates_are_rejected
+
+# The End of All Things (op. cit.)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import json
+import tracemalloc
+
+import numpy as np
+
+import kg_monitor
+import koeppen_geiger as KG
+
+
+def _climatology():
+    rng = np.random.default_rng(0)
+    mon_TAS = (rng.uniform(-20.0, 28.0, (30, 40)) + rng.uniform(-15.0, 15.0, (12, 30, 40))).astype(np.float32)
+    mon_PRC = (rng.uniform(0.0, 1.0, (12, 30, 40)) ** 2 * rng.uniform(0.0, 600.0, (30, 40))).astype(np.float32)
+    mon_PRC[:, 0, :5] = np.nan
+    return mon_TAS, mon_PRC
+# end def _climatology
+
+def test_stages_and_counts():
+    mon_TAS, mon_PRC = _climatology()
+    monitor = kg_monitor.RunMonitor("test", typ_classification="peel")
+    KG_map = KG.classify_tiled(mon_TAS, mon_PRC, "peel", tile_shape=(10, 40), monitor=monitor)
+    monitor.stop()
+    metrics = monitor.to_dict()
+    assert metrics["cells"] == {"total": 1200, "valid": 1195, "masked": 5, "unclassified": 0}
+    assert sum(metrics["classes"].values()) == np.count_nonzero(KG_map)
+    assert {"load", "gather", "predictors", "classification"} <= set(metrics["stages"])
+    assert metrics["stages"]["load"]["calls"] == 3
+    assert metrics["tiles"] == 3
+    assert metrics["traced_peak_bytes"] is None
+    json.dumps(metrics)
+# end def test_stages_and_counts
+
+def test_traced_peak_is_per_run():
+    mon_TAS, mon_PRC = _climatology()
+    was_tracing = tracemalloc.is_tracing()
+    big = kg_monitor.RunMonitor("big", trace_memory=True)
+    block = np.ones(2**22)
+    del block
+    big.stop()
+    small = kg_monitor.RunMonitor("small", trace_memory=True)
+    KG.classify_tiled(mon_TAS, mon_PRC, "kottek", tile_shape=(10, 40), monitor=small)
+    small.stop()
+    assert big.to_dict()["traced_peak_bytes"] >= 8 * 2**22
+    assert 0 < small.to_dict()["traced_peak_bytes"] < 8 * 2**22
+    assert small.to_dict()["process_peak_rss_bytes"] >= big.to_dict()["process_peak_rss_bytes"]
+    assert tracemalloc.is_tracing() == was_tracing
+# end def test_traced_peak_is_per_run
+
+# The End of All Things (op. cit.)
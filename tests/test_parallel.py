@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+
+import koeppen_geiger as KG
+import kg_bench
+import kg_monitor
+
+
+class _LockCheckedOutput:
+    # Output failing if two threads write at once or a write happens outside io_lock
+
+    def __init__(self, shape, io_lock):
+        self.data = np.zeros(shape, dtype=np.uint8)
+        self.io_lock = io_lock
+    # end def __init__
+
+    def __setitem__(self, key, codes):
+        assert self.io_lock.locked()
+        self.data[key] = codes
+    # end def __setitem__
+# end class _LockCheckedOutput
+
+@pytest.fixture(scope="module")
+def climatology():
+    mon_TAS, mon_PRC, lats, lons = kg_bench.synthetic_climatology(45, 90)
+    return mon_TAS[:], mon_PRC[:], KG.get_sum_strt("hemisphere", lats)
+# end def climatology
+
+def test_threads_match_tiled(climatology):
+    mon_TAS, mon_PRC, sum_strt = climatology
+    expected = KG.classify_tiled(mon_TAS, mon_PRC, "peel", sum_strt=sum_strt)
+    got = KG.classify_parallel(mon_TAS, mon_PRC, "peel", sum_strt=sum_strt, workers=3, tile_shape=(4, 90))
+    np.testing.assert_array_equal(got, expected)
+# end def test_threads_match_tiled
+
+def test_threads_count_one_load_per_tile(climatology):
+    mon_TAS, mon_PRC, sum_strt = climatology
+    stages = []
+    for classify, kwargs in ((KG.classify_tiled, {}), (KG.classify_parallel, {"workers": 2})):
+        monitor = kg_monitor.RunMonitor()
+        classify(mon_TAS, mon_PRC, "cannon", sum_strt=sum_strt, tile_shape=(12, 90), monitor=monitor, **kwargs)
+        stages.append({name: calls for name, (seconds, calls) in monitor.stages.items()})
+    # end for
+    assert stages[0]["load"] == 4
+    assert stages[1] == stages[0]
+# end def test_threads_count_one_load_per_tile
+
+def test_threads_write_under_the_io_lock(climatology):
+    mon_TAS, mon_PRC, sum_strt = climatology
+    io_lock = threading.Lock()
+    out = _LockCheckedOutput(mon_TAS.shape[1:], io_lock)
+    KG.classify_parallel(mon_TAS, mon_PRC, "kottek", sum_strt=sum_strt, workers=4, tile_shape=(3, 45), out=out,
+                         io_lock=io_lock)
+    np.testing.assert_array_equal(out.data, KG.classify_tiled(mon_TAS, mon_PRC, "kottek", sum_strt=sum_strt))
+# end def test_threads_write_under_the_io_lock
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_processes_match_tiled(climatology):
+    mon_TAS, mon_PRC, sum_strt = climatology
+    expected = KG.classify_tiled(mon_TAS, mon_PRC, "cannon", sum_strt=sum_strt)
+    got = KG.classify_parallel(mon_TAS, mon_PRC, "cannon", sum_strt=sum_strt, workers=2, tile_shape=(12, 90),
+                               processes=True)
+    np.testing.assert_array_equal(got, expected)
+# end def test_processes_match_tiled
+
+def test_scaling_records():
+    records = kg_bench.bench_scaling("10", "peel", workers=3, report=lambda message: None)
+    assert [entry["benchmark"] for entry in records] == ["threads%d_%s_peel" % (n, inputs)
+                                                         for inputs in ("lazy", "memory") for n in (1, 2, 3)]
+    assert all(entry["speedup_over_tiled"] > 0 for entry in records)
+# end def test_scaling_records
+
+# The End of All Things (op. cit.)
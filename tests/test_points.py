@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import sys
+
+import numpy as np
+import pytest
+
+import create_KG_cmap as CKG
+import kg_points
+import koeppen_geiger as KG
+
+READERS = ["pyarrow", "csv"]
+
+
+def _records(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(-80.0, 80.0, n).round(3)
+    mon_TAS = (rng.uniform(-20.0, 28.0, n) + rng.uniform(-15.0, 15.0, (12, n))).round(2).astype(np.float32)
+    mon_PRC = (rng.uniform(0.0, 1.0, (12, n)) ** 2 * rng.uniform(0.0, 600.0, n)).round(2).astype(np.float32)
+    return lats, mon_TAS, mon_PRC
+# end def _records
+
+def _write_csv(path, lats, mon_TAS, mon_PRC, lat_fields=None):
+    columns = kg_points.PointColumns()
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["station"] + columns.used())
+        for i_rec in range(lats.size):
+            lat = lat_fields.get(i_rec, lats[i_rec]) if lat_fields else lats[i_rec]
+            writer.writerow(["s%d" % i_rec, lat] + ["%g" % value for value in mon_TAS[:, i_rec]]
+                            + ["%g" % value for value in mon_PRC[:, i_rec]])
+        # end for
+    # end with
+# end def _write_csv
+
+@pytest.fixture(params=READERS)
+def reader(request, monkeypatch):
+    if request.param == "pyarrow":
+        pytest.importorskip("pyarrow.csv")
+    else:
+        monkeypatch.setitem(sys.modules, "pyarrow.csv", None)
+    # endif
+    return request.param
+# end def reader
+
+def test_csv_batches_have_batch_size_records(tmp_path, reader):
+    # Over 1 MiB, so that pyarrow reads several blocks
+    lats, mon_TAS, mon_PRC = _records(12000)
+    _write_csv(tmp_path / "points.csv", lats, mon_TAS, mon_PRC)
+    batches = list(kg_points.iter_csv(str(tmp_path / "points.csv"), batch_size=2500))
+    assert [batch["lat"].size for batch in batches] == [2500] * 4 + [2000]
+    np.testing.assert_array_equal(np.concatenate([batch["lat"] for batch in batches]), lats)
+    np.testing.assert_array_equal(np.concatenate([batch["tas"] for batch in batches], axis=1), mon_TAS)
+    assert list(batches[-1]["keep"]["station"][-2:]) == ["s11998", "s11999"]
+# end def test_csv_batches_have_batch_size_records
+
+def test_records_without_latitude_are_not_classified(tmp_path, reader):
+    lats, mon_TAS, mon_PRC = _records(50, seed=1)
+    _write_csv(tmp_path / "points.csv", lats, mon_TAS, mon_PRC, lat_fields={3: "", 7: "nan", 8: ""})
+    output = str(tmp_path / "classes.csv")
+    assert kg_points.stream_points(kg_points.iter_csv(str(tmp_path / "points.csv"), batch_size=20), ["kottek"],
+                                   output) == 50
+    with open(output, newline="") as csv_file:
+        labels = [row["kottek"] for row in csv.DictReader(csv_file)]
+    # end with
+    assert [labels[i_rec] for i_rec in (3, 7, 8)] == ["", "", ""]
+    expected = KG.get_kg_classification_Codes(KG.get_predictors(mon_TAS, mon_PRC,
+                                                                sum_strt=KG.get_summer_start(lats).reshape(-1))[0],
+                                              "kottek")
+    classified = [i_rec for i_rec in range(50) if i_rec not in (3, 7, 8)]
+    assert all(labels[i_rec] for i_rec in classified)
+    KG_labels = CKG.get_KG_labels("kottek")
+    assert [labels[i_rec] for i_rec in classified] == [KG_labels[expected[i_rec]] for i_rec in classified]
+# end def test_records_without_latitude_are_not_classified
+
+def test_classify_points_masks_nan_latitudes():
+    lats, mon_TAS, mon_PRC = _records(30, seed=2)
+    lats[[0, 5]] = np.nan
+    for season in ("hemisphere", "north", "dynamic"):
+        codes = kg_points.classify_points(mon_TAS, mon_PRC, lats, ["peel", "cannon"], season=season)
+        for typ_classification in ("peel", "cannon"):
+            assert (codes[typ_classification][[0, 5]] == 0).all()
+            assert (np.delete(codes[typ_classification], [0, 5]) != 0).all()
+        # end for
+    # end for
+# end def test_classify_points_masks_nan_latitudes
+
+def test_output_column_names(tmp_path):
+    lats, mon_TAS, mon_PRC = _records(20, seed=4)
+    _write_csv(tmp_path / "points.csv", lats, mon_TAS, mon_PRC)
+    with open(tmp_path / "points.csv") as csv_file:
+        text = csv_file.read()
+    # end with
+    # Latitude named "latitude", station names in a column named like a classification
+    with open(tmp_path / "points.csv", "w") as csv_file:
+        csv_file.write(text.replace("station,lat,", "kottek,latitude,", 1))
+    # end with
+    output = str(tmp_path / "classes.csv")
+    assert kg_points.main([str(tmp_path / "points.csv"), "-o", output, "--lat", "latitude", "--schemes", "peel"]) == 0
+    with open(output, newline="") as csv_file:
+        reader = csv.DictReader(csv_file)
+        rows = list(reader)
+    # end with
+    assert reader.fieldnames == ["kottek", "latitude", "peel"]
+    assert [float(row["latitude"]) for row in rows] == lats.tolist()
+    with pytest.raises(ValueError, match="kottek"):
+        kg_points.main([str(tmp_path / "points.csv"), "-o", output, "--lat", "latitude", "--schemes", "kottek"])
+    # end with
+# end def test_output_column_names
+
+def test_parquet_batches(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    lats, mon_TAS, mon_PRC = _records(1000, seed=3)
+    columns = kg_points.PointColumns()
+    table = pa.table(dict({columns.lat: lats}, **{name: mon_TAS[i_mon] for i_mon, name in enumerate(columns.tas)},
+                          **{name: mon_PRC[i_mon] for i_mon, name in enumerate(columns.prc)}))
+    pq.write_table(table, str(tmp_path / "points.parquet"), row_group_size=300)
+    batches = list(kg_points.iter_parquet(str(tmp_path / "points.parquet"), batch_size=400))
+    assert [batch["lat"].size for batch in batches] == [400, 400, 200]
+    np.testing.assert_array_equal(np.concatenate([batch["prc"] for batch in batches], axis=1), mon_PRC)
+# end def test_parquet_batches
+
+# The End of All Things (op. cit.)
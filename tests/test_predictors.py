@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from numpy import ma
+
+import koeppen_geiger as KG
+
+
+def _climatology(n, seed=0):
+    rng = np.random.default_rng(seed)
+    mon_TAS = (rng.uniform(-30.0, 30.0, n) + rng.uniform(-15.0, 15.0, (12, n))).astype(np.float32)
+    mon_PRC = rng.uniform(0.0, 250.0, (12, n)).astype(np.float32)
+    return mon_TAS, mon_PRC
+# end def _climatology
+
+def test_predictors_of_complete_cells():
+    mon_TAS, mon_PRC = _climatology(500)
+    ARGS, valid = KG.get_predictors(mon_TAS, mon_PRC, sum_strt=3)
+    assert valid.all()
+    summer = mon_PRC[3:9]
+    winter = mon_PRC[np.r_[9:12, 0:3]]
+    np.testing.assert_array_equal(ARGS[0], mon_TAS.min(axis=0))
+    np.testing.assert_array_equal(ARGS[1], mon_TAS.max(axis=0))
+    np.testing.assert_array_equal(ARGS[2], (mon_TAS >= 10.0).sum(axis=0))
+    np.testing.assert_allclose(ARGS[3], mon_TAS.mean(axis=0, dtype=np.float64), rtol=1e-5, atol=1e-4)
+    np.testing.assert_array_equal(ARGS[4], mon_PRC.min(axis=0))
+    np.testing.assert_allclose(ARGS[5], mon_PRC.sum(axis=0, dtype=np.float64), rtol=1e-5)
+    np.testing.assert_array_equal(ARGS[6], summer.min(axis=0))
+    np.testing.assert_array_equal(ARGS[7], summer.max(axis=0))
+    np.testing.assert_array_equal(ARGS[8], winter.min(axis=0))
+    np.testing.assert_array_equal(ARGS[9], winter.max(axis=0))
+    np.testing.assert_allclose(ARGS[11], winter.sum(axis=0, dtype=np.float64) / mon_PRC.sum(axis=0, dtype=np.float64),
+                               rtol=1e-5)
+    np.testing.assert_array_equal(ARGS[12], (mon_PRC <= 60.0).sum(axis=0))
+# end def test_predictors_of_complete_cells
+
+def test_cell_with_a_missing_month_has_no_class():
+    # Since version 0.81 a missing month drops the cell, the masked-array statistics used the months present
+    mon_TAS, mon_PRC = _climatology(6, seed=1)
+    mon_TAS[4, 1] = np.nan
+    mon_PRC = ma.masked_array(mon_PRC)
+    mon_PRC[7, 3] = ma.masked
+    mon_PRC[0, 5] = np.inf
+
+    valid = KG.get_predictors(mon_TAS, mon_PRC)[1]
+    np.testing.assert_array_equal(valid, [True, False, True, False, True, False])
+    np.testing.assert_array_equal(KG.get_valid_mask(mon_TAS, mon_PRC), valid)
+
+    KG_map = KG.classify_grid(mon_TAS[:, np.newaxis], mon_PRC[:, np.newaxis], "kottek")[0]
+    np.testing.assert_array_equal(KG_map.mask[0], ~valid)
+    np.testing.assert_array_equal(KG.classify_tiled(mon_TAS[:, np.newaxis], mon_PRC[:, np.newaxis], "kottek")[0] == 0,
+                                  ~valid)
+# end def test_cell_with_a_missing_month_has_no_class
+
+def test_dry_cells_have_no_winter_fraction():
+    mon_TAS, mon_PRC = _climatology(3, seed=2)
+    mon_PRC[:, 1] = 0.0
+    ARGS, valid = KG.get_predictors(mon_TAS, mon_PRC)
+    assert valid.all()
+    assert ARGS[11, 1] == 0.0
+    assert np.isfinite(ARGS[:, 1]).all()
+# end def test_dry_cells_have_no_winter_fraction
+
+# The End of All Things (op. cit.)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+import koeppen_geiger as KG
+
+
+def _grid(ny, nx, ascending, seed=0):
+    rng = np.random.default_rng(seed)
+    lats = np.linspace(-80.0, 80.0, ny)
+    if not ascending:
+        lats = lats[::-1]
+    # endif
+    mon_TAS = (rng.uniform(-20.0, 28.0, (ny, nx)) + rng.uniform(-15.0, 15.0, (12, ny, nx))).astype(np.float32)
+    mon_PRC = (rng.uniform(0.0, 1.0, (12, ny, nx)) ** 2 * rng.uniform(0.0, 600.0, (ny, nx))).astype(np.float32)
+    return lats, mon_TAS, mon_PRC
+# end def _grid
+
+def _reference(mon_TAS, mon_PRC, lats, typ_classification):
+    # Cell by cell, each with the summer of its own latitude
+    ny, nx = mon_TAS.shape[1:]
+    cell_sum_strt = np.repeat(np.where(lats < 0.0, 9, 3), nx)
+    ARGS, valid = KG.get_predictors(mon_TAS.reshape(12, -1), mon_PRC.reshape(12, -1), sum_strt=cell_sum_strt)
+    codes = KG.get_kg_classification_Codes(ARGS, typ_classification)
+    codes[~valid] = 0
+    return codes.reshape(ny, nx)
+# end def _reference
+
+@pytest.mark.parametrize("ascending", [True, False])
+@pytest.mark.parametrize("ny, nx", [(17, 29), (29, 17), (30, 30)])
+def test_hemisphere_summer_on_all_drivers(ny, nx, ascending):
+    lats, mon_TAS, mon_PRC = _grid(ny, nx, ascending)
+    expected = _reference(mon_TAS, mon_PRC, lats, "kottek")
+    for sum_strt in (KG.get_sum_strt("hemisphere", lats), KG.get_summer_start(lats).reshape(-1)):
+        ARGS, valid = KG.get_predictors(mon_TAS, mon_PRC, sum_strt=sum_strt)
+        np.testing.assert_array_equal(KG.get_kg_classification_Codes(ARGS, "kottek"), expected)
+        np.testing.assert_array_equal(KG.classify_grid(mon_TAS, mon_PRC, "kottek", sum_strt=sum_strt)[0].filled(0),
+                                      expected)
+        np.testing.assert_array_equal(KG.classify_tiled(mon_TAS, mon_PRC, "kottek", sum_strt=sum_strt,
+                                                        tile_shape=(4, 7)), expected)
+        np.testing.assert_array_equal(KG.classify_parallel(mon_TAS, mon_PRC, "kottek", sum_strt=sum_strt, workers=2,
+                                                           tile_shape=(5, 6)), expected)
+        np.testing.assert_array_equal(KG.classify_windows(mon_TAS[np.newaxis], mon_PRC[np.newaxis], "kottek",
+                                                          window=1, sum_strt=sum_strt)[0], expected)
+        np.testing.assert_array_equal(KG.classify_ensemble(mon_TAS[np.newaxis], mon_PRC[np.newaxis], "kottek",
+                                                           sum_strt=sum_strt)[0], expected)
+    # end for
+# end def test_hemisphere_summer_on_all_drivers
+
+def test_summer_start_is_one_value_per_row():
+    lats = np.array([60.0, 10.0, -0.5, -45.0])
+    sum_strt = KG.get_summer_start(lats)
+    assert sum_strt.shape == (4, 1)
+    np.testing.assert_array_equal(sum_strt[:, 0], [3, 3, 9, 9])
+    np.testing.assert_array_equal(KG.get_cell_sum_strt(sum_strt, (4, 3)), np.repeat(sum_strt, 3, axis=1))
+    np.testing.assert_array_equal(KG.get_cell_sum_strt(sum_strt[:, 0], (4, 3), index=np.array([0, 5, 11])),
+                                  [3, 3, 9])
+    assert KG.get_cell_sum_strt("dynamic", (4, 3)) == "dynamic"
+    with pytest.raises(ValueError):
+        KG.get_cell_sum_strt(np.zeros(3, dtype=np.int8), (4, 3))
+    # end with
+# end def test_summer_start_is_one_value_per_row
+
+def test_dynamic_summer_is_the_warmest_half_year():
+    rng = np.random.default_rng(3)
+    mon_TAS = rng.uniform(-10.0, 30.0, (12, 50)).astype(np.float32)
+    sums = np.array([mon_TAS[np.arange(start, start + 6) % 12].sum(axis=0, dtype=np.float64) for start in range(12)])
+    np.testing.assert_array_equal(KG.get_summer_start_dynamic(mon_TAS), sums.argmax(axis=0))
+# end def test_dynamic_summer_is_the_warmest_half_year
+
+# The End of All Things (op. cit.)
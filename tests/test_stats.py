@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+import create_KG_cmap as CKG
+import kg_stats
+
+
+def _maps(n_maps, ny=20, nx=30, typ_classification="kottek", seed=0):
+    rng = np.random.default_rng(seed)
+    n_codes = kg_stats.get_n_codes(typ_classification)
+    return rng.integers(0, n_codes, (n_maps, ny, nx)).astype(np.uint8)
+# end def _maps
+
+def test_transition_matrix_counts_pairs():
+    KG_from, KG_to = _maps(2)
+    n_codes = kg_stats.get_n_codes("kottek")
+    assert n_codes == max(CKG.get_KG_dict("kottek").values()) + 1
+    matrix = kg_stats.transition_matrix(KG_from, KG_to, "kottek")
+    expected = np.zeros((n_codes, n_codes), dtype=np.int64)
+    np.add.at(expected, (KG_from.reshape(-1), KG_to.reshape(-1)), 1)
+    np.testing.assert_array_equal(matrix, expected)
+    assert np.trace(matrix) == KG_from.size - kg_stats.changed_cells(KG_from, KG_to).sum()
+    assert kg_stats.transition_matrix(KG_from, KG_to).shape == (256, 256)
+# end def test_transition_matrix_counts_pairs
+
+def test_transition_matrix_masked_and_weighted():
+    KG_from, KG_to = _maps(2, seed=1)
+    lats = np.linspace(85.0, -85.0, 20)
+    masked = np.ma.masked_array(KG_from, mask=np.zeros(KG_from.shape, dtype=bool))
+    masked.mask[3, :5] = True
+    matrix = kg_stats.transition_matrix(masked, KG_to, "kottek", lats=lats)
+    assert matrix.dtype == np.float64
+    weights = np.cos(np.deg2rad(lats))[:, None] * np.ones(KG_from.shape)
+    filled = np.where(masked.mask, 0, KG_from)
+    np.testing.assert_allclose(matrix.sum(axis=1), np.bincount(filled.reshape(-1), weights=weights.reshape(-1),
+                                                               minlength=matrix.shape[0]))
+    np.testing.assert_allclose(matrix[0].sum(), weights[filled == 0].sum())
+# end def test_transition_matrix_masked_and_weighted
+
+def test_transition_errors():
+    KG_from, KG_to = _maps(2)
+    with pytest.raises(ValueError, match="cells"):
+        kg_stats.transition_matrix(KG_from, KG_to[:10])
+    # end with
+    with pytest.raises(ValueError, match="beyond"):
+        kg_stats.transition_matrix(np.full((2, 2), 250, dtype=np.uint8), np.zeros((2, 2), dtype=np.uint8), "kottek")
+    # end with
+# end def test_transition_errors
+
+def test_transition_series():
+    KG_stack = _maps(4, seed=2)
+    series = kg_stats.transition_series(KG_stack, "kottek")
+    assert series.shape[0] == 3
+    for i_pair in range(3):
+        np.testing.assert_array_equal(series[i_pair],
+                                      kg_stats.transition_matrix(KG_stack[i_pair], KG_stack[i_pair + 1], "kottek"))
+    # end for
+    lats = np.linspace(85.0, -85.0, 20)
+    series = kg_stats.transition_series(KG_stack, "kottek", lats=lats, pairs=[(0, 3), (3, 0)])
+    np.testing.assert_allclose(series[0], kg_stats.transition_matrix(KG_stack[0], KG_stack[3], "kottek", lats=lats))
+    np.testing.assert_allclose(series[1], series[0].T)
+# end def test_transition_series
+
+def test_transition_labels():
+    KG_dict = CKG.get_KG_dict("kottek")
+    KG_from = np.array([[KG_dict["Cfb"], KG_dict["Cfb"], 0]], dtype=np.uint8)
+    KG_to = np.array([[KG_dict["Cfa"], KG_dict["Cfb"], KG_dict["BWh"]]], dtype=np.uint8)
+    matrix = kg_stats.transition_matrix(KG_from, KG_to, "kottek")
+    assert kg_stats.get_transition_labels(matrix, "kottek") == {("Cfb", "Cfa"): 1, ("Cfb", "Cfb"): 1,
+                                                                ("", "BWh"): 1}
+# end def test_transition_labels
+
+def test_cell_areas_cover_the_sphere():
+    lats = np.linspace(89.5, -89.5, 180)
+    lons = np.arange(0.5, 360.0, 1.0)
+    areas = kg_stats.get_cell_areas(lats, lons)
+    assert areas.shape == (180, 360)
+    np.testing.assert_allclose(areas.sum(), 4 * np.pi * kg_stats.EARTH_RADIUS ** 2, rtol=1e-12)
+    np.testing.assert_allclose(areas[0], areas[-1])
+    # Ascending latitudes, on a sphere of radius 1
+    np.testing.assert_allclose(kg_stats.get_cell_areas(lats[::-1], lons, radius=1.0).sum(), 4 * np.pi)
+# end def test_cell_areas_cover_the_sphere
+
+def test_zonal_stats_against_masked_sums(tmp_path):
+    lats = np.linspace(85.0, -85.0, 20)
+    lons = np.linspace(-174.0, 174.0, 30)
+    rng = np.random.default_rng(3)
+    regions = rng.integers(-1, 4, (20, 30))
+    KG_maps = _maps(2, seed=4)
+    zonal = kg_stats.ZonalStats(regions, lats, lons, "kottek", region_names=["a", "b", "c", "d"])
+    cell_areas = kg_stats.get_cell_areas(lats, lons)
+    for KG_map in KG_maps:
+        areas = zonal.areas(KG_map)
+        assert areas.shape == (4, kg_stats.get_n_codes("kottek"))
+        for region in range(4):
+            for code in (0, 5, 17):
+                in_cells = (regions == region) & (KG_map == code)
+                np.testing.assert_allclose(areas[region, code], cell_areas[in_cells].sum())
+            # end for
+        # end for
+        fractions = zonal.fractions(KG_map)
+        assert (fractions[:, 0] == 0).all()
+        np.testing.assert_allclose(fractions.sum(axis=1), 1.0)
+    # end for
+    zonal.save(str(tmp_path / "zonal.npz"))
+    loaded = kg_stats.ZonalStats.load(str(tmp_path / "zonal.npz"))
+    np.testing.assert_array_equal(loaded.areas(KG_maps[0]), zonal.areas(KG_maps[0]))
+    assert loaded.to_dict(KG_maps[0]) == zonal.to_dict(KG_maps[0])
+    labels = CKG.get_KG_labels("kottek")
+    as_dict = zonal.to_dict(KG_maps[0], fractions=False)
+    assert sorted(as_dict) == ["a", "b", "c", "d"]
+    assert as_dict["b"][labels[5]] == pytest.approx(zonal.areas(KG_maps[0])[1, 5])
+# end def test_zonal_stats_against_masked_sums
+
+def test_zonal_stats_errors():
+    lats, lons = np.linspace(85.0, -85.0, 20), np.linspace(-174.0, 174.0, 30)
+    with pytest.raises(ValueError, match="Region raster"):
+        kg_stats.ZonalStats(np.zeros((30, 20), dtype=int), lats, lons)
+    # end with
+    zonal = kg_stats.ZonalStats(np.ma.masked_less(np.zeros((20, 30), dtype=int), 0), lats, lons)
+    with pytest.raises(ValueError, match="cells"):
+        zonal.areas(np.zeros((10, 30), dtype=np.uint8))
+    # end with
+    with pytest.raises(ValueError, match="No classification type"):
+        zonal.to_dict(np.zeros((20, 30), dtype=np.uint8))
+    # end with
+    # A region without any classified cell has NaN fractions
+    assert np.isnan(zonal.fractions(np.zeros((20, 30), dtype=np.uint8))).all()
+# end def test_zonal_stats_errors
+
+def test_rasterize_regions():
+    pytest.importorskip("rasterio")
+    lats = np.linspace(-85.0, 85.0, 18)
+    lons = np.linspace(-175.0, 175.0, 36)
+    box = {"type": "Polygon", "coordinates": [[(0.0, 0.0), (40.0, 0.0), (40.0, 40.0), (0.0, 40.0), (0.0, 0.0)]]}
+    regions = kg_stats.rasterize_regions([(box, 2)], lats, lons)
+    assert regions.shape == (18, 36)
+    # Cell centres at 5, 15, 25, 35 in both directions fall in the box, the rows being ascending
+    inside = (lats > 0) & (lats < 40)
+    expected = np.where(inside[:, None] & ((lons > 0) & (lons < 40))[None, :], 2, -1)
+    np.testing.assert_array_equal(regions, expected)
+    np.testing.assert_array_equal(kg_stats.rasterize_regions([(box, 2)], lats[::-1], lons), expected[::-1])
+# end def test_rasterize_regions
+
+# The End of All Things (op. cit.)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import numpy.ma as ma
+import pytest
+
+import kg_jit
+import kg_verify
+import koeppen_geiger as KG
+
+
+def test_predictors_match_the_masked_array_statistics():
+    assert kg_verify.check_predictors(n=20000, seed=1)
+# end def test_predictors_match_the_masked_array_statistics
+
+def test_baseline_predictors_follow_the_summer_start():
+    mon_TAS, mon_PRC = (var.reshape(12, -1) for var in kg_verify.edge_climatology(1, 500, seed=2))
+    north, south = (kg_verify.baseline_predictors(mon_TAS, mon_PRC, sum_strt=start) for start in (3, 9))
+    P_smin, P_wmin = KG.ARGS_names.index("P_smin"), KG.ARGS_names.index("P_wmin")
+    np.testing.assert_array_equal(ma.getdata(north[P_smin]), ma.getdata(south[P_wmin]))
+    per_cell = kg_verify.baseline_predictors(mon_TAS, mon_PRC, sum_strt=np.full(500, 9))
+    np.testing.assert_array_equal(ma.getdata(per_cell), ma.getdata(south))
+# end def test_baseline_predictors_follow_the_summer_start
+
+@pytest.mark.skipif(not kg_jit.FLOAT32_SCALARS, reason="the scalar functions round as the array ones with NumPy >= 2")
+@pytest.mark.parametrize("typ_classification", ["kottek", "peel", "cannon", "trewartha"])
+def test_array_classifiers_match_the_scalar_functions(typ_classification, capsys):
+    assert kg_verify.check_classifiers(typ_classification, n=20000, seed=9)
+    assert "FAILED" not in capsys.readouterr().out
+# end def test_array_classifiers_match_the_scalar_functions
+
+def test_scalar_codes_of_repeated_cells():
+    ARGS = kg_verify.edge_predictors(300, seed=3)
+    repeated = ARGS[:, np.random.default_rng(0).integers(0, 300, 3000)]
+    expected = np.array([kg_verify.scalar_codes(repeated[:, [cell]], "kottek")[0] for cell in range(0, 3000, 97)])
+    np.testing.assert_array_equal(kg_verify.scalar_codes(repeated, "kottek")[::97], expected)
+# end def test_scalar_codes_of_repeated_cells
+
+def test_scalar_reference_evaluates_each_column_once(monkeypatch):
+    ARGS = kg_verify.edge_predictors(2000, seed=8)
+    reference = kg_verify.ScalarReference("trewartha")
+    expected = reference.codes(ARGS[:, :1500])
+    assert reference.evaluated == len(np.unique(ARGS[:, :1500], axis=1).T)
+    evaluated = reference.evaluated
+    codes = reference.codes(ARGS[:, ::-1])
+    assert reference.evaluated - evaluated == len(np.unique(ARGS[:, 1500:], axis=1).T)
+    np.testing.assert_array_equal(codes[::-1][:1500], expected)
+    # Every column sharing one key: all looked up columns are evaluated again, none is mistaken for another
+    monkeypatch.setattr(kg_verify, "_hash_columns", lambda bits: np.zeros(bits.shape[0], dtype=np.uint64))
+    np.testing.assert_array_equal(kg_verify.ScalarReference("trewartha").codes(ARGS), codes[::-1])
+# end def test_scalar_reference_evaluates_each_column_once
+
+def test_pool_bounds_the_distinct_climates():
+    mon_TAS, mon_PRC = kg_verify.edge_climatology(40, 50, seed=4, pool=30)
+    complete = np.isfinite(mon_TAS).all(axis=0) & np.isfinite(mon_PRC).all(axis=0)
+    assert len(np.unique(mon_TAS[:, complete], axis=1).T) <= 30
+    years_TAS, years_PRC = kg_verify.edge_years(5, 40, 50, seed=4, pool=30)
+    assert years_TAS.shape == years_PRC.shape == (5, 12, 40, 50)
+    # Grids drawn from one pool share its climates
+    pool = kg_verify.edge_pool(30, seed=4)
+    first, second = (kg_verify.edge_climatology(40, 50, seed=seed, pool=pool)[0] for seed in (5, 6))
+    columns = [set(map(tuple, grid[:, np.isfinite(grid).all(axis=0)].T.tolist())) for grid in (first, second)]
+    assert len(columns[0] | columns[1]) <= 30
+# end def test_pool_bounds_the_distinct_climates
+
+def test_dynamic_summer_reference():
+    mon_TAS, _ = kg_verify.edge_climatology(30, 40, seed=5)
+    complete = np.isfinite(mon_TAS).all(axis=0)
+    np.testing.assert_array_equal(kg_verify.summer_start_reference(mon_TAS)[complete],
+                                  KG.get_summer_start_dynamic(mon_TAS)[complete])
+# end def test_dynamic_summer_reference
+
+def test_engines(capsys):
+    for typ_classification in ("peel", "cannon"):
+        assert kg_verify.check_engines(typ_classification, ny=24, nx=30, seed=6, pool=200)
+    # end for
+    assert "FAILED" not in capsys.readouterr().out
+# end def test_engines
+
+def test_engines_tell_the_ensemble_members_apart(monkeypatch):
+    classify_ensemble = KG.classify_ensemble
+
+    def first_member_only(mon_TAS, mon_PRC, *args, **kwargs):
+        return classify_ensemble(np.stack([mon_TAS[0]] * len(mon_TAS)), np.stack([mon_PRC[0]] * len(mon_PRC)),
+                                 *args, **kwargs)
+    # end def first_member_only
+
+    monkeypatch.setattr(KG, "classify_ensemble", first_member_only)
+    assert not kg_verify.check_engines("kottek", ny=12, nx=20, seed=7, pool=100)
+# end def test_engines_tell_the_ensemble_members_apart
+
+def test_main_sampled(capsys):
+    assert kg_verify.main(["--schemes", "cannon", "--grid", "12x20", "--cells", "2000", "--pool", "100"]) == 0
+    out = capsys.readouterr().out
+    assert "engines cannon: " in out and "FAILED" not in out
+# end def test_main_sampled
+
+# The End of All Things (op. cit.)